@@ -5,6 +5,7 @@
 1. wastewater_treatment_calc - 核心计算引擎
 2. excel_handler - Excel 数据处理和分析
 3. xlwings_integration - Excel 交互式功能
+4. plant_model - 多个并联处理单元的流量分配与批量检查
 
 快速开始：
 ---------
@@ -34,6 +35,12 @@ from xlwings_integration import WastewaterExcelFunctions
 
 functions = WastewaterExcelFunctions()
 result = functions.check_safety(3500, 100)
+
+# 多单元流量分配
+from plant_model import PlantModel, ClarifierUnit
+
+plant = PlantModel([ClarifierUnit('1#', area=100), ClarifierUnit('2#', area=100)])
+result = plant.evaluate(plant_flow=200, mlss=3500)
 """
 
 __version__ = "1.0.0"
@@ -41,9 +48,12 @@ __all__ = [
     'WastewaterCalculator',
     'ExcelDataHandler',
     'WastewaterExcelFunctions',
+    'PlantModel',
+    'ClarifierUnit',
 ]
 
 from excel_handler import ExcelDataHandler
+from plant_model import ClarifierUnit, PlantModel
 from wastewater_treatment_calc import WastewaterCalculator
 from xlwings_integration import WastewaterExcelFunctions
 
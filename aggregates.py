@@ -0,0 +1,354 @@
+"""
+运行历史的滚动统计 - 按小时/天增量汇总 SLR
+
+对每个处理单元、每个时间窗口（小时、天）增量维护：
+- 样本数、均值、标准差（Welford 算法，每个样本 O(1)）
+- 最小值、最大值
+- 分位数（对数分桶草图，固定桶数、相对误差可控、可合并）
+- 各状态区间（optimal / normal / too_low / too_high）的时间占比（按样本数计）
+
+既可逐个样本 add()，也可用 backfill() 对批量数组一次向量化汇总。
+
+使用示例：
+    agg = RollingAggregator(utc_offset=8 * 3600)    # 按北京时间划分天
+    agg.add(ts, '1#', slr)
+    agg.backfill(timestamps, unit_ids, slr_values)
+    for row in agg.results('hour', unit='1#'):
+        print(row['window_start'], row['mean'], row['p95'], row['time_in_band'])
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from historian import to_epoch_seconds
+from wastewater_treatment_calc import STATUS_CODES, STATUS_NAMES, WastewaterCalculator
+
+# 窗口名称 -> 长度（秒）
+WINDOWS = {
+    'hour': 3600,
+    'day': 86400,
+}
+
+# 每个单元每种窗口默认保留的窗口数（小时窗口约 31 天，天窗口约 2 年）
+DEFAULT_MAX_WINDOWS = 744
+
+
+class LogHistogram:
+    """
+    对数分桶的分位数草图布局
+
+    桶边界按 gamma = (1 + α) / (1 - α) 等比划分，任一分位数的相对误差不超过 α。
+    低于 min_value 的值（含 0 和负数）计入第一个桶，高于 max_value 的值计入最后一个桶，
+    因此桶数固定、内存有界。各窗口只保存一个计数数组，布局共享。
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 0.01,
+                 max_value: float = 1000.0):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('relative_accuracy 必须在 (0, 1) 之间')
+        if not 0 < min_value < max_value:
+            raise ValueError('取值范围无效')
+
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.max_value = max_value
+        self._offset = math.ceil(math.log(min_value) / self._log_gamma)
+        # 下溢桶 + 正常桶 + 上溢桶
+        self.n_bins = math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 3
+
+    def index(self, value: float) -> int:
+        """单个值所在的桶"""
+        if not value > self.min_value:
+            return 0
+        if value > self.max_value:
+            return self.n_bins - 1
+        return math.ceil(math.log(value) / self._log_gamma) - self._offset + 1
+
+    def index_batch(self, values) -> np.ndarray:
+        """批量计算所在的桶"""
+        values = np.asarray(values, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            idx = np.ceil(np.log(values) / self._log_gamma) - self._offset + 1
+        idx = np.where(values > self.min_value, idx, 0)
+        idx = np.where(values > self.max_value, self.n_bins - 1, idx)
+        return idx.astype(np.intp)
+
+    def bin_value(self, index: int) -> float:
+        """桶的代表值（使相对误差最小）"""
+        if index <= 0:
+            return self.min_value
+        if index >= self.n_bins - 1:
+            return self.max_value
+        upper = self.gamma ** (index + self._offset - 1)
+        return 2 * upper / (self.gamma + 1)
+
+    def quantile(self, counts: np.ndarray, q: float) -> float:
+        """
+        从计数数组估计分位数
+
+        Args:
+            counts: 各桶计数
+            q: 分位数 (0-1)
+        """
+        total = counts.sum()
+        if total == 0:
+            return float('nan')
+        rank = q * (total - 1)
+        index = int(np.searchsorted(np.cumsum(counts), rank, side='right'))
+        return self.bin_value(min(index, self.n_bins - 1))
+
+
+class _Bucket:
+    """单个窗口的统计状态"""
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max', 'band_counts', 'sketch')
+
+    def __init__(self, n_bins: int):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.band_counts = [0] * len(STATUS_NAMES)
+        self.sketch = np.zeros(n_bins, dtype=np.int64)
+
+    def add(self, value: float, band: int, bin_index: int) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.band_counts[band] += 1
+        self.sketch[bin_index] += 1
+
+    def merge(self, count: int, mean: float, m2: float, vmin: float, vmax: float,
+              band_counts: Sequence[int], sketch: np.ndarray) -> None:
+        """合并另一组统计（Chan 并行方差公式）"""
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+        self.min = min(self.min, vmin)
+        self.max = max(self.max, vmax)
+        for band, n in enumerate(band_counts):
+            self.band_counts[band] += int(n)
+        self.sketch += sketch
+
+
+class RollingAggregator:
+    """按单元和时间窗口增量汇总 SLR 统计"""
+
+    def __init__(self, windows: Sequence[str] = ('hour', 'day'), calculator: WastewaterCalculator = None,
+                 quantiles: Sequence[float] = (0.5, 0.95), relative_accuracy: float = 0.01,
+                 value_range: tuple = (0.01, 1000.0), max_windows: Optional[int] = DEFAULT_MAX_WINDOWS,
+                 utc_offset: int = 0):
+        """
+        初始化汇总器
+
+        Args:
+            windows: 统计窗口（'hour'、'day'）
+            calculator: 判定 SLR 状态区间的计算器，默认 WastewaterCalculator()
+            quantiles: 输出的分位数
+            relative_accuracy: 分位数的相对误差
+            value_range: 分位数草图覆盖的 SLR 范围 (最小值, 最大值)
+            max_windows: 每个单元每种窗口最多保留的窗口数（超出时丢弃最早的），
+                None 为不限（内存随时间跨度无限增长）；早于保留范围的样本不再计入，
+                计数见 self.expired
+            utc_offset: 窗口对齐使用的时区偏移（秒），如北京时间为 8 * 3600
+        """
+        unknown = [w for w in windows if w not in WINDOWS]
+        if unknown:
+            raise ValueError(f'未知统计窗口: {unknown}')
+
+        self.windows = tuple(windows)
+        self.calculator = calculator or WastewaterCalculator(area=1.0)
+        self.quantiles = tuple(quantiles)
+        self.histogram = LogHistogram(relative_accuracy, *value_range)
+        if max_windows is not None and max_windows <= 0:
+            raise ValueError('max_windows 必须为正整数')
+        self.max_windows = max_windows
+        # 因早于保留范围而未计入的样本数（按窗口类型分别计数）
+        self.expired = {window: 0 for window in self.windows}
+        self.utc_offset = utc_offset
+        # {(窗口, 单元): {窗口起点: _Bucket}}
+        self._buckets: Dict[tuple, Dict[int, _Bucket]] = {}
+
+    def _window_start(self, timestamp: int, size: int) -> int:
+        return (timestamp + self.utc_offset) // size * size - self.utc_offset
+
+    def _bucket(self, window: str, unit_id, start: int) -> Optional[_Bucket]:
+        """取窗口的统计状态；窗口早于保留范围时返回 None"""
+        series = self._buckets.setdefault((window, unit_id), {})
+        bucket = series.get(start)
+        if bucket is None:
+            if self.max_windows is not None and len(series) >= self.max_windows:
+                oldest = min(series)
+                if start < oldest:
+                    return None
+                # 先丢弃最早的窗口再插入，不会丢弃刚创建的窗口
+                del series[oldest]
+            bucket = series[start] = _Bucket(self.histogram.n_bins)
+        return bucket
+
+    def _band(self, slr: float) -> int:
+        return STATUS_CODES[self.calculator.validate_parameter('slr', slr)['status']]
+
+    def add(self, timestamp, unit_id, slr: float) -> None:
+        """
+        增量加入一个样本（每个窗口 O(1)）
+
+        Args:
+            timestamp: 时间戳（见 historian.to_epoch_seconds）
+            unit_id: 单元编号（统一按字符串保存）
+            slr: 固体负荷率 (kg/h/m²)
+        """
+        slr = float(slr)
+        if math.isnan(slr):
+            return
+        unit_id = str(unit_id)
+        ts = int(to_epoch_seconds(timestamp))
+        band = self._band(slr)
+        bin_index = self.histogram.index(slr)
+        for window in self.windows:
+            start = self._window_start(ts, WINDOWS[window])
+            bucket = self._bucket(window, unit_id, start)
+            if bucket is None:
+                self.expired[window] += 1
+                continue
+            bucket.add(slr, band, bin_index)
+
+    def backfill(self, timestamps, unit_ids, slr) -> None:
+        """
+        批量加入样本，一次向量化汇总后合并到已有窗口
+
+        Args:
+            timestamps: 时间戳数组
+            unit_ids: 单元编号（单个值或与数据等长的数组）
+            slr: SLR 数组 (kg/h/m²)，NaN 会被忽略
+        """
+        ts = np.atleast_1d(to_epoch_seconds(timestamps))
+        values = np.broadcast_to(np.asarray(slr, dtype=np.float64), ts.shape)
+        units = np.broadcast_to(np.asarray(unit_ids).astype(str), ts.shape)
+
+        valid = ~np.isnan(values)
+        if not valid.all():
+            ts, values, units = ts[valid], values[valid], units[valid]
+        if len(ts) == 0:
+            return
+
+        unit_names, unit_codes = np.unique(units, return_inverse=True)
+        unit_names = unit_names.tolist()
+        unit_codes = unit_codes.reshape(-1)
+
+        bands = self.calculator.classify_batch('slr', values).astype(np.intp)
+        bins = self.histogram.index_batch(values)
+        n_bands = len(STATUS_NAMES)
+        n_bins = self.histogram.n_bins
+
+        for window in self.windows:
+            size = WINDOWS[window]
+            starts = (ts + self.utc_offset) // size * size - self.utc_offset
+            keys = np.stack([unit_codes, starts], axis=1)
+            group_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            n_groups = len(group_keys)
+
+            count = np.bincount(inverse, minlength=n_groups)
+            mean = np.bincount(inverse, weights=values, minlength=n_groups) / count
+            m2 = np.bincount(inverse, weights=(values - mean[inverse]) ** 2, minlength=n_groups)
+            vmin = np.full(n_groups, np.inf)
+            vmax = np.full(n_groups, -np.inf)
+            np.minimum.at(vmin, inverse, values)
+            np.maximum.at(vmax, inverse, values)
+            band_counts = np.bincount(inverse * n_bands + bands,
+                                      minlength=n_groups * n_bands).reshape(n_groups, n_bands)
+            sketches = np.bincount(inverse * n_bins + bins,
+                                   minlength=n_groups * n_bins).reshape(n_groups, n_bins)
+
+            # 按窗口起点从新到旧合并，保留范围已满时较旧的窗口被跳过而不是挤掉较新的
+            for g in np.argsort(-group_keys[:, 1], kind='stable').tolist():
+                unit_code, start = group_keys[g].tolist()
+                bucket = self._bucket(window, unit_names[unit_code], start)
+                if bucket is None:
+                    self.expired[window] += int(count[g])
+                    continue
+                bucket.merge(int(count[g]), float(mean[g]), float(m2[g]), float(vmin[g]),
+                             float(vmax[g]), band_counts[g], sketches[g])
+
+    def backfill_historian(self, store, start=None, end=None) -> None:
+        """
+        从运行点历史库批量汇总
+
+        Args:
+            store: historian.OperatingHistorian
+            start: 起始时间（含）
+            end: 结束时间（不含）
+        """
+        data = store.read(start, end, columns=['timestamp', 'unit', 'slr'])
+        unit_names = np.asarray(store.units, dtype=object)
+        self.backfill(data['timestamp'], unit_names[data['unit']], data['slr'])
+
+    def units(self, window: str = None) -> List[str]:
+        """已有统计的单元编号"""
+        return sorted({unit for w, unit in self._buckets if window is None or w == window})
+
+    def results(self, window: str = 'hour', unit=None, start=None, end=None) -> List[dict]:
+        """
+        输出统计结果
+
+        Args:
+            window: 'hour' 或 'day'
+            unit: 只输出该单元（字符串），默认全部
+            start: 只输出窗口起点不早于该时间的结果
+            end: 只输出窗口起点早于该时间的结果
+
+        Returns:
+            按单元、窗口起点排序的结果列表，每项包含：
+                unit, window, window_start, count, mean, std, min, max,
+                p50/p95/...（按 quantiles）, time_in_band {状态: 百分比}
+        """
+        if window not in self.windows:
+            raise ValueError(f'未统计该窗口: {window}')
+        lo = None if start is None else int(to_epoch_seconds(start))
+        hi = None if end is None else int(to_epoch_seconds(end))
+
+        rows = []
+        for (w, unit_id), series in sorted(self._buckets.items(), key=lambda item: item[0][1]):
+            if w != window or (unit is not None and unit_id != unit):
+                continue
+            for window_start in sorted(series):
+                if (lo is not None and window_start < lo) or (hi is not None and window_start >= hi):
+                    continue
+                rows.append(self._row(window, unit_id, window_start, series[window_start]))
+        return rows
+
+    def _row(self, window: str, unit_id, window_start: int, bucket: _Bucket) -> dict:
+        row = {
+            'unit': unit_id,
+            'window': window,
+            'window_start': window_start,
+            'count': bucket.count,
+            'mean': bucket.mean,
+            'std': math.sqrt(bucket.m2 / (bucket.count - 1)) if bucket.count > 1 else 0.0,
+            'min': bucket.min,
+            'max': bucket.max,
+        }
+        for q in self.quantiles:
+            estimate = self.histogram.quantile(bucket.sketch, q)
+            row[f'p{q * 100:g}'] = min(max(estimate, bucket.min), bucket.max)
+        row['time_in_band'] = {
+            name: bucket.band_counts[code] * 100.0 / bucket.count
+            for code, name in enumerate(STATUS_NAMES)
+        }
+        return row
+
@@ -0,0 +1,285 @@
+"""
+性能基准测试 - 计算器、表格解析、分析报告和 Excel 导出的热点路径
+
+生成指定规模的合成 MLSS 浓度表和运行点数据，对各热点函数计时，
+结果写成 JSON，并可与保存的基线比较，超过阈值的变慢视为性能回退。
+
+使用方法（从工程根目录运行）：
+    python benchmarks/run_benchmarks.py                           # 默认规模
+    python benchmarks/run_benchmarks.py --points 100000 --grid 200x100
+    python benchmarks/run_benchmarks.py --save-baseline            # 保存为基线
+    python benchmarks/run_benchmarks.py --threshold 0.25           # 与基线比较
+
+退出码：
+    0 - 无回退（或未找到基线）
+    1 - 存在超过阈值的回退
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import openpyxl
+from openpyxl import Workbook
+
+# 添加工程根目录到路径，以便导入模块
+tool_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(tool_dir))
+
+from excel_handler import ExcelDataHandler
+from wastewater_treatment_calc import WastewaterCalculator
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_OUTPUT = BENCH_DIR / "results.json"
+
+
+# ============================================================================
+# 合成数据
+# ============================================================================
+
+def make_operating_points(count: int, seed: int = 0):
+    """
+    生成随机运行点，覆盖安全范围内外
+
+    Returns:
+        (mlss 数组, flow 数组)
+    """
+    rng = np.random.default_rng(seed)
+    mlss = rng.uniform(1500, 6000, count)
+    flow = rng.uniform(40, 200, count)
+    return mlss, flow
+
+
+def make_mlss_workbook(path: Path, n_flow: int, n_mlss: int, area: float = 1.0) -> None:
+    """
+    按 parse_mlss_table 期望的布局生成合成 MLSS 浓度表
+
+    第一行为 MLSS 标题，第二行为副标题，第一列为等效流量。
+    """
+    calc = WastewaterCalculator(area=area)
+    mlss_values = np.linspace(2000, 5400, n_mlss).round(0)
+    flow_values = np.linspace(60, 170, n_flow).round(1)
+    slr = np.round(calc.calculate_slr_batch(mlss_values[None, :], flow_values[:, None]), 2)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("MLSS浓度表")
+    ws.append(['Solids Loading Rate (kg/h/m2)'] + mlss_values.tolist())
+    ws.append(['Equivalent (L/s)'])
+    for flow, row in zip(flow_values.tolist(), slr.tolist()):
+        ws.append([flow] + row)
+    wb.save(str(path))
+
+
+def make_variations(count: int, seed: int = 1) -> Dict:
+    """生成 create_comparison_excel 使用的场景字典"""
+    mlss, flow = make_operating_points(count, seed)
+    return {f'场景{i}': {'mlss': float(m), 'flow': float(f)}
+            for i, (m, f) in enumerate(zip(mlss.round(0), flow.round(1)))}
+
+
+# ============================================================================
+# 计时
+# ============================================================================
+
+def time_call(func: Callable, repeat: int) -> Dict:
+    """重复运行并记录耗时（屏蔽被测函数的打印输出）"""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'repeat': repeat,
+    }
+
+
+def run_suite(points: int, n_flow: int, n_mlss: int, scenarios: int,
+              repeat: int, workdir: Path) -> Dict:
+    """
+    运行全部基准项
+
+    Returns:
+        {基准名: {'min', 'median', 'repeat', 'items'}}
+    """
+    calc = WastewaterCalculator(area=1.0)
+    mlss, flow = make_operating_points(points)
+    mlss_list, flow_list = mlss.tolist(), flow.tolist()
+
+    workbook = workdir / "synthetic_mlss.xlsx"
+    make_mlss_workbook(workbook, n_flow, n_mlss)
+
+    handler = ExcelDataHandler()
+    with contextlib.redirect_stdout(io.StringIO()):
+        handler.load_excel(str(workbook))
+
+    variations = make_variations(scenarios)
+    grid = n_flow * n_mlss
+
+    # 增量报告：先整体生成一次，之后每次改动一个点再增量更新（修补工作表 XML）
+    incremental = ExcelDataHandler()
+    incremental_report = str(workdir / "report_incremental.xlsx")
+    with contextlib.redirect_stdout(io.StringIO()):
+        incremental.load_excel(str(workbook))
+        incremental.generate_analysis_report(incremental_report, incremental=True)
+
+    def incremental_update():
+        row = list(incremental.df[2])
+        row[1] = row[1] + 0.01 if isinstance(row[1], float) else 1.0
+        incremental.df[2] = tuple(row)
+        incremental.generate_analysis_report(incremental_report, incremental=True,
+                                             changed_only=True)
+
+    def scalar_slr():
+        for m, f in zip(mlss_list, flow_list):
+            calc.calculate_slr(m, f)
+
+    def scalar_check():
+        for m, f in zip(mlss_list, flow_list):
+            calc.check_operating_point(m, f)
+
+    benches = [
+        ('calculate_slr', scalar_slr, points),
+        ('calculate_slr_batch', lambda: calc.calculate_slr_batch(mlss, flow), points),
+        ('check_operating_point', scalar_check, points),
+        ('check_operating_points', lambda: calc.check_operating_points(mlss, flow), points),
+        ('load_excel', lambda: handler.load_excel(str(workbook)), grid),
+        ('parse_mlss_table', handler.parse_mlss_table, grid),
+        ('generate_analysis_report', handler.generate_analysis_report, grid),
+        ('generate_analysis_report_xlsx',
+         lambda: handler.generate_analysis_report(str(workdir / "report.xlsx")), grid),
+        ('generate_analysis_report_patch', incremental_update, 1),
+        ('iter_analysis_chunks',
+         lambda: sum(c['mlss'].size for c in handler.iter_analysis_chunks(str(workbook))), grid),
+        ('create_comparison_excel',
+         lambda: handler.create_comparison_excel(str(workdir / "comparison.xlsx"), variations),
+         scenarios),
+        ('create_sensitivity_analysis',
+         lambda: handler.create_sensitivity_analysis(str(workdir / "sensitivity.xlsx")), 1),
+    ]
+
+    results = {}
+    for name, func, items in benches:
+        stats = time_call(func, repeat)
+        stats['items'] = items
+        results[name] = stats
+        print(f"  {name:<32} min {stats['min'] * 1000:10.2f} ms   "
+              f"median {stats['median'] * 1000:10.2f} ms   ({items} 项)")
+    return results
+
+
+# ============================================================================
+# 基线比较
+# ============================================================================
+
+def compare_with_baseline(results: Dict, baseline: Dict, threshold: float) -> list:
+    """
+    与基线比较（使用最小耗时，受系统噪声影响最小）
+
+    Args:
+        results: 本次结果
+        baseline: 基线结果
+        threshold: 允许的相对变慢比例，如 0.2 表示 20%
+
+    Returns:
+        回退列表 [(基准名, 基线耗时, 本次耗时, 比例)]
+    """
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base or base.get('items') != stats['items'] or base['min'] <= 0:
+            continue
+        ratio = stats['min'] / base['min']
+        marker = '✗ 回退' if ratio > 1 + threshold else '✓'
+        print(f"  {name:<32} {ratio:6.2f}x  {marker}")
+        if ratio > 1 + threshold:
+            regressions.append((name, base['min'], stats['min'], ratio))
+    return regressions
+
+
+def parse_grid(value: str):
+    """解析 '行x列' 形式的网格规模"""
+    try:
+        rows, cols = value.lower().split('x')
+        return int(rows), int(cols)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'网格规模格式应为 行x列，例如 50x40: {value}')
+
+
+def main(argv: Optional[list] = None) -> int:
+    """主函数"""
+    parser = argparse.ArgumentParser(description='WasteWaterTool 性能基准测试')
+    parser.add_argument('--points', type=int, default=10000, help='运行点数量（默认 10000）')
+    parser.add_argument('--grid', type=parse_grid, default=(50, 40),
+                        help='合成 MLSS 表规模 流量行x MLSS列（默认 50x40）')
+    parser.add_argument('--scenarios', type=int, default=200, help='对比分析场景数（默认 200）')
+    parser.add_argument('--repeat', type=int, default=5, help='每项重复次数（默认 5）')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help='结果 JSON 路径')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help='基线 JSON 路径')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='判定回退的相对变慢阈值（默认 0.2 即 20%%）')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果保存为基线')
+    args = parser.parse_args(argv)
+
+    n_flow, n_mlss = args.grid
+    print("=" * 70)
+    print("WasteWaterTool 性能基准测试")
+    print(f"  运行点: {args.points}  网格: {n_flow}x{n_mlss}  场景: {args.scenarios}  重复: {args.repeat}")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run_suite(args.points, n_flow, n_mlss, args.scenarios, args.repeat, Path(tmp))
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'openpyxl': openpyxl.__version__,
+            'points': args.points,
+            'grid': [n_flow, n_mlss],
+            'scenarios': args.scenarios,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"\n✓ 结果已保存: {args.output}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"✓ 基线已保存: {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"⚠️ 未找到基线文件，跳过比较: {args.baseline}")
+        return 0
+
+    print(f"\n与基线比较（阈值 {args.threshold:.0%}）:")
+    baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+    regressions = compare_with_baseline(results, baseline.get('results', {}), args.threshold)
+    if regressions:
+        print(f"\n✗ {len(regressions)} 项性能回退")
+        return 1
+    print("\n✓ 无性能回退")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+运行包络热力图导出 - 数值网格 + 工作表级条件格式
+
+generate_operating_range_table 输出的是格式化字符串网格，逐格着色时每个单元格都带
+独立的样式。本模块把 SLR 网格按数值写入一次（只写模式流式写出），颜色由整张表上的
+少数几条条件格式规则给出：
+
+    bands：cell-is 规则按安全范围分段着色（过低 / 正常 / 最优 / 过高）
+    scale：三色色阶，安全下限 - 最优区间中点 - 安全上限
+
+单元格本身不带样式，百万级网格的文件也很小、打开很快。表格布局与 MLSS 浓度表相同
+（第一行 MLSS，第二行副标题，第一列为等效流量），可直接用 parse_mlss_table 读回。
+
+可选输出 PNG 热力图（仅用标准库 zlib 编码，无需 matplotlib），颜色与 bands 规则一致。
+
+使用示例：
+    write_envelope_workbook('运行包络.xlsx', WastewaterCalculator(area=141),
+                            mlss=(2000, 5400, 10), flow=(60, 170, 0.5), png='运行包络.png')
+"""
+
+import struct
+import zlib
+from typing import Dict, Optional
+
+import numpy as np
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule, ColorScaleRule
+from openpyxl.styles import PatternFill, Font, Alignment
+from openpyxl.utils import get_column_letter
+
+from profiling import stage
+from reference_table import (DEFAULT_FLOW_RANGE, DEFAULT_MLSS_RANGE, FLOW_TITLE, TABLE_TITLE,
+                             axis_values)
+from wastewater_treatment_calc import STATUS_CODES, WastewaterCalculator
+
+ENVELOPE_SHEET = '运行包络'
+LEGEND_SHEET = '图例'
+ENVELOPE_STYLES = ('bands', 'scale')
+
+# 各状态的颜色（条件格式和 PNG 共用）
+BAND_COLORS = {
+    'too_low': 'BDD7EE',
+    'normal': 'FFEB9C',
+    'optimal': 'C6EFCE',
+    'too_high': 'FFC7CE',
+    'invalid': 'D9D9D9',
+}
+
+BAND_LABELS = {
+    'too_low': '过低',
+    'normal': '正常',
+    'optimal': '最优',
+    'too_high': '过高',
+}
+
+
+def envelope_grid(calculator: WastewaterCalculator = None, mlss=DEFAULT_MLSS_RANGE,
+                  flow=DEFAULT_FLOW_RANGE) -> Dict[str, np.ndarray]:
+    """
+    计算运行包络的 SLR 网格
+
+    Args:
+        calculator: 提供面积和安全范围的计算器
+        mlss: MLSS 列，(起点, 终点, 步长) 或取值序列
+        flow: 流量行，(起点, 终点, 步长) 或取值序列
+
+    Returns:
+        {'mlss_values', 'flow_values', 'slr' (流量数, MLSS 数), 'slr_status' (int8，同形状)}
+    """
+    calculator = calculator or WastewaterCalculator(area=1.0)
+    mlss_values = axis_values(mlss)
+    flow_values = axis_values(flow)
+    slr = calculator.calculate_slr_batch(mlss_values[None, :], flow_values[:, None])
+    return {
+        'mlss_values': mlss_values,
+        'flow_values': flow_values,
+        'slr': slr,
+        'slr_status': calculator.classify_batch('slr', slr),
+    }
+
+
+def _fill(color: str) -> PatternFill:
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+
+def _add_rules(ws, cell_range: str, ranges: dict, style: str) -> None:
+    """在整个数据区域上添加条件格式规则"""
+    low, high = ranges['min'], ranges['max']
+    opt_low, opt_high = ranges['optimal']
+    if style == 'scale':
+        ws.conditional_formatting.add(cell_range, ColorScaleRule(
+            start_type='num', start_value=low, start_color=BAND_COLORS['too_low'],
+            mid_type='num', mid_value=(opt_low + opt_high) / 2, mid_color=BAND_COLORS['optimal'],
+            end_type='num', end_value=high, end_color=BAND_COLORS['too_high']))
+        return
+    # 先添加的规则优先级高：越界 > 最优 > 正常
+    ws.conditional_formatting.add(cell_range, CellIsRule(
+        operator='lessThan', formula=[repr(low)], fill=_fill(BAND_COLORS['too_low'])))
+    ws.conditional_formatting.add(cell_range, CellIsRule(
+        operator='greaterThan', formula=[repr(high)], fill=_fill(BAND_COLORS['too_high'])))
+    ws.conditional_formatting.add(cell_range, CellIsRule(
+        operator='between', formula=[repr(opt_low), repr(opt_high)],
+        fill=_fill(BAND_COLORS['optimal'])))
+    ws.conditional_formatting.add(cell_range, CellIsRule(
+        operator='between', formula=[repr(low), repr(high)], fill=_fill(BAND_COLORS['normal'])))
+
+
+def _header(ws, value, fill: str, color: Optional[str] = None) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws, value=value)
+    cell.fill = _fill(fill)
+    cell.font = Font(bold=True, color=color)
+    cell.alignment = Alignment(horizontal="center", vertical="center")
+    return cell
+
+
+def write_envelope_workbook(output_file: str, calculator: WastewaterCalculator = None,
+                            mlss=DEFAULT_MLSS_RANGE, flow=DEFAULT_FLOW_RANGE,
+                            decimals: int = 2, style: str = 'bands',
+                            png: str = None) -> Dict:
+    """
+    导出运行包络热力图工作簿
+
+    Args:
+        output_file: 输出文件路径
+        calculator: 提供面积和安全范围的计算器，默认 WastewaterCalculator()
+        mlss: MLSS 列，(起点, 终点, 步长) 或取值序列
+        flow: 流量行，(起点, 终点, 步长) 或取值序列
+        decimals: SLR 保留的小数位数
+        style: 'bands'（按安全范围分段）或 'scale'（三色色阶）
+        png: 同时输出的 PNG 文件路径（可选）
+
+    Returns:
+        {'rows': 流量行数, 'columns': MLSS 列数, 'rules': 条件格式规则数}
+    """
+    if style not in ENVELOPE_STYLES:
+        raise ValueError(f'未知样式: {style}，可选 {ENVELOPE_STYLES}')
+    calculator = calculator or WastewaterCalculator(area=1.0)
+    grid = envelope_grid(calculator, mlss, flow)
+    mlss_values, flow_values = grid['mlss_values'], grid['flow_values']
+    ranges = calculator.SAFETY_RANGES['slr']
+
+    with stage('write_envelope_workbook', category='export', rows=grid['slr'].size):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(ENVELOPE_SHEET)
+        ws.column_dimensions['A'].width = 20
+        ws.freeze_panes = 'B3'
+        last = f'{get_column_letter(len(mlss_values) + 1)}{len(flow_values) + 2}'
+        _add_rules(ws, f'B3:{last}', ranges, style)
+
+        ws.append([_header(ws, TABLE_TITLE, "4472C4", "FFFFFF")]
+                  + [_header(ws, m, "4472C4", "FFFFFF") for m in mlss_values.tolist()])
+        ws.append([_header(ws, FLOW_TITLE, "D9E1F2")])
+        slr = np.round(grid['slr'], decimals)
+        for flow_val, row in zip(flow_values.tolist(), slr.tolist()):
+            ws.append([flow_val] + row)
+
+        legend = wb.create_sheet(LEGEND_SHEET)
+        legend.append([_header(legend, '状态', "4472C4", "FFFFFF"),
+                       _header(legend, 'SLR (kg/h/m²)', "4472C4", "FFFFFF")])
+        opt_low, opt_high = ranges['optimal']
+        spans = {
+            'too_low': f"< {ranges['min']}",
+            'normal': f"{ranges['min']} - {ranges['max']}",
+            'optimal': f"{opt_low} - {opt_high}",
+            'too_high': f"> {ranges['max']}",
+        }
+        for name, label in BAND_LABELS.items():
+            legend.append([_header(legend, label, BAND_COLORS[name]), spans[name]])
+        legend.append([])
+        legend.append(['面积 (m²)', calculator.area])
+        wb.save(str(output_file))
+
+    print(f"✓ 运行包络已导出: {output_file}（{len(flow_values)} × {len(mlss_values)}）")
+    if png:
+        render_envelope_png(png, grid['slr_status'])
+    return {'rows': len(flow_values), 'columns': len(mlss_values),
+            'rules': 1 if style == 'scale' else 4}
+
+
+def _hex_rgb(color: str) -> tuple:
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def render_envelope_png(output_file: str, slr_status: np.ndarray, cell_px: int = None) -> None:
+    """
+    把状态网格渲染为 PNG（行为流量、列为 MLSS，颜色同 BAND_COLORS）
+
+    Args:
+        output_file: 输出文件路径
+        slr_status: envelope_grid 返回的 'slr_status'
+        cell_px: 每个网格单元的像素边长，默认按网格大小取 1-16
+    """
+    status = np.asarray(slr_status)
+    if status.ndim != 2 or status.size == 0:
+        raise ValueError('状态网格必须是非空二维数组')
+    if cell_px is None:
+        cell_px = int(np.clip(800 // max(status.shape), 1, 16))
+
+    palette = np.zeros((len(STATUS_CODES), 3), dtype=np.uint8)
+    for name, code in STATUS_CODES.items():
+        palette[code] = _hex_rgb(BAND_COLORS[name])
+    image = palette[status]
+    image = np.repeat(np.repeat(image, cell_px, axis=0), cell_px, axis=1)
+    height, width = image.shape[:2]
+
+    # 每行前加滤波类型字节 0，整体 zlib 压缩
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8),
+                          image.reshape(height, width * 3)], axis=1).tobytes()
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (struct.pack('>I', len(data)) + tag + data
+                + struct.pack('>I', zlib.crc32(tag + data) & 0xFFFFFFFF))
+
+    with open(output_file, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw, 6)))
+        f.write(chunk(b'IEND', b''))
+    print(f"✓ 运行包络图已保存: {output_file}（{width} × {height} 像素）")
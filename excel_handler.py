@@ -8,29 +8,70 @@
 4. 支持 xlwings 集成（可选）
 """
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterator, Optional
+
+import numpy as np
 
 from openpyxl import Workbook, load_workbook
+from openpyxl.formatting.formatting import ConditionalFormattingList
+from openpyxl.formatting.rule import CellIsRule
 from openpyxl.styles import PatternFill, Font, Alignment
 from openpyxl.utils import get_column_letter
 
-from wastewater_treatment_calc import WastewaterCalculator
+from incremental_reports import (changed_rows, context_fingerprint, estimate_patch_seconds,
+                                 estimate_rebuild_seconds, load_sidecar, patch_workbook,
+                                 row_fingerprints, save_sidecar)
+from profiling import stage
+from wastewater_treatment_calc import STATUS_NAMES, WastewaterCalculator
+
+# 敏感性分析的参数变化范围
+SENSITIVITY_MLSS_RANGE = range(2000, 5500, 500)
+SENSITIVITY_FLOW_RANGE = range(60, 175, 10)
+
+# 内存受限分析模式：默认每块点数，以及每个点的估算内存开销（字节，含计算中间数组）
+ANALYSIS_CHUNK_SIZE = 65536
+ANALYSIS_BYTES_PER_POINT = 64
+NAN = float('nan')
+
+# 分析报告的列
+ANALYSIS_HEADERS = ['MLSS (mg/L)', 'Equivalent (L/s)', 'SLR (kg/h/m²)',
+                    'MLSS Status', 'Flow Status', 'SLR Status', 'Overall Safe']
+
+# 报告类型、默认文件名与名称
+REPORT_TYPES = ('analysis', 'comparison', 'sensitivity')
+REPORT_FILENAMES = {
+    'analysis': '分析报告.xlsx',
+    'comparison': '参数对比分析.xlsx',
+    'sensitivity': '敏感性分析.xlsx',
+}
+REPORT_TITLES = {
+    'analysis': '分析报告',
+    'comparison': '对比分析 Excel',
+    'sensitivity': '敏感性分析 Excel',
+}
 
 
 class ExcelDataHandler:
     """Excel 数据处理类"""
 
-    def __init__(self, excel_path: str = None):
+    def __init__(self, excel_path: str = None, results_store=None, unit: str = None):
         """
         初始化处理器
 
         Args:
             excel_path: Excel 文件路径
+            results_store: 结果库（ResultsStore），指定时生成的报告结果同时写入数据库
+            unit: 写入结果库时记录的处理单元编号
         """
         self.excel_path = excel_path
         self.df = None
         self.calculator = WastewaterCalculator(area=1.0)
+        self.results_store = results_store
+        self.unit = unit
+        # 最近一次增量更新的摘要（见 _update_report）
+        self.last_update: Optional[Dict] = None
 
         if excel_path and Path(excel_path).exists():
             self.load_excel(excel_path)
@@ -45,11 +86,13 @@ class ExcelDataHandler:
         Returns:
             列表形式的数据
         """
-        wb = load_workbook(excel_path)
-        ws = wb.active
-        self.df = []
-        for row in ws.iter_rows(values_only=True):
-            self.df.append(row)
+        with stage('load_excel', category='load') as s:
+            wb = load_workbook(excel_path)
+            ws = wb.active
+            self.df = []
+            for row in ws.iter_rows(values_only=True):
+                self.df.append(row)
+            s.rows = len(self.df)
         self.excel_path = excel_path
         print(f"✓ 加载 Excel 文件: {excel_path}")
         return self.df
@@ -61,6 +104,14 @@ class ExcelDataHandler:
         Returns:
             包含解析后的表格结构和数据的字典
         """
+        with stage('parse_mlss_table', category='parse') as s:
+            table_info = self._parse_mlss_table()
+            if 'error' not in table_info:
+                s.rows = table_info['shape'][0] * table_info['shape'][1]
+        return table_info
+
+    def _parse_mlss_table(self) -> Dict:
+        """parse_mlss_table 的实际解析逻辑"""
         if self.df is None:
             return {'error': '未加载 Excel 文件'}
 
@@ -107,62 +158,367 @@ class ExcelDataHandler:
         except Exception as e:
             return {'error': str(e)}
 
-    def generate_analysis_report(self, output_file: str = None) -> list:
+    def _analysis_inputs(self, table_info: Dict) -> tuple:
+        """
+        按报告顺序展开表格中的每个点
+
+        Args:
+            table_info: parse_mlss_table 的返回值
+
+        Returns:
+            (MLSS 列表, 流量列表, 表格 SLR 列表)
+        """
+        equivalent_values = table_info['equivalent_values']
+        mlss_values = table_info['mlss_values']
+        slr_data = table_info['slr_data']
+
+        # 重复的流量值沿用第一次出现的数据行
+        first_index = {}
+        for idx, eq in enumerate(equivalent_values):
+            first_index.setdefault(eq, idx)
+
+        points_mlss, points_eq, points_slr = [], [], []
+        for eq in equivalent_values:
+            eq_idx = first_index[eq]
+            if eq_idx >= len(slr_data):
+                continue
+            row = slr_data[eq_idx]
+            for mlss, slr in zip(mlss_values, row):
+                points_mlss.append(mlss)
+                points_eq.append(eq)
+                points_slr.append(slr)
+        return points_mlss, points_eq, points_slr
+
+    def _analysis_points(self, table_info: Dict) -> tuple:
+        """
+        按报告顺序展开表格中的每个点，并批量计算运行状态
+
+        Args:
+            table_info: parse_mlss_table 的返回值
+
+        Returns:
+            (MLSS 列表, 流量列表, 表格 SLR 列表, check_operating_points 结果)
+        """
+        points_mlss, points_eq, points_slr = self._analysis_inputs(table_info)
+        check = self.calculator.check_operating_points(points_mlss, points_eq)
+        return points_mlss, points_eq, points_slr, check
+
+    def _analysis_rows(self, table_info: Dict, points: tuple = None) -> list:
+        """
+        生成分析报告的行
+
+        Args:
+            table_info: parse_mlss_table 的返回值
+            points: _analysis_points 的返回值（已计算时传入）
+
+        Returns:
+            报告行列表（与 generate_analysis_report 返回格式相同）
+        """
+        points_mlss, points_eq, points_slr, check = points or self._analysis_points(table_info)
+        mlss_status = check['mlss_status'].tolist()
+        flow_status = check['flow_status'].tolist()
+        slr_status = check['slr_status'].tolist()
+        overall_safe = check['overall_safe'].tolist()
+
+        results = []
+        for i, (mlss, eq, slr) in enumerate(zip(points_mlss, points_eq, points_slr)):
+            results.append({
+                'MLSS (mg/L)': int(mlss),
+                'Equivalent (L/s)': int(eq),
+                'SLR (kg/h/m²)': f'{slr:.2f}',
+                'MLSS Status': STATUS_NAMES[mlss_status[i]],
+                'Flow Status': STATUS_NAMES[flow_status[i]],
+                'SLR Status': STATUS_NAMES[slr_status[i]],
+                'Overall Safe': '✓' if overall_safe[i] else '✗',
+            })
+        return results
+
+    def _comparison_points(self, variations: Dict) -> tuple:
+        """
+        批量计算对比分析的每个场景
+
+        Returns:
+            (场景名列表, MLSS 列表, 流量列表, check_operating_points 结果)
+        """
+        names = list(variations)
+        mlss = [variations[name]['mlss'] for name in names]
+        flow = [variations[name]['flow'] for name in names]
+        return names, mlss, flow, self.calculator.check_operating_points(mlss, flow)
+
+    def _comparison_rows(self, variations: Dict, points: tuple = None) -> list:
+        """
+        生成对比分析的行
+
+        Args:
+            variations: 场景字典
+            points: _comparison_points 的返回值（已计算时传入）
+
+        Returns:
+            [(场景, MLSS, 流量, SLR, MLSS 状态, Flow 状态, SLR 状态, 是否安全)]
+        """
+        names, mlss, flow, check = points or self._comparison_points(variations)
+
+        slr = check['calculated_slr'].tolist()
+        mlss_status = check['mlss_status'].tolist()
+        flow_status = check['flow_status'].tolist()
+        slr_status = check['slr_status'].tolist()
+        overall_safe = check['overall_safe'].tolist()
+
+        return [
+            (name, mlss[i], flow[i], round(slr[i], 2), STATUS_NAMES[mlss_status[i]],
+             STATUS_NAMES[flow_status[i]], STATUS_NAMES[slr_status[i]], overall_safe[i])
+            for i, name in enumerate(names)
+        ]
+
+    def _sensitivity_rows(self, base_mlss: float, base_flow: float,
+                          mlss_values=SENSITIVITY_MLSS_RANGE,
+                          flow_values=SENSITIVITY_FLOW_RANGE) -> tuple:
+        """
+        计算敏感性分析数据
+
+        Args:
+            base_mlss: 基准 MLSS (mg/L)
+            base_flow: 基准流量 (L/s)
+            mlss_values: 需要计算的 MLSS 取值
+            flow_values: 需要计算的流量取值
+
+        Returns:
+            (MLSS 变化行, 流量变化行)，每行为 (参数值, SLR, 相对变化 %)
+        """
+        base_slr = self.calculator.calculate_slr(base_mlss, base_flow)
+
+        mlss_rows = []
+        for mlss in mlss_values:
+            slr = self.calculator.calculate_slr(mlss, base_flow)
+            change = ((slr - base_slr) / base_slr) * 100
+            mlss_rows.append((mlss, round(slr, 2), round(change, 2)))
+
+        flow_rows = []
+        for flow in flow_values:
+            slr = self.calculator.calculate_slr(base_mlss, flow)
+            change = ((slr - base_slr) / base_slr) * 100
+            flow_rows.append((flow, round(slr, 2), round(change, 2)))
+
+        return mlss_rows, flow_rows
+
+    def _record_analysis(self, points: tuple, output_file: str = None) -> None:
+        """分析结果写入结果库（未配置结果库时不做任何事）"""
+        if self.results_store is None:
+            return
+        with stage('record_analysis', category='export', rows=len(points[0])):
+            self.results_store.record('analysis', points[3], unit=self.unit,
+                                      area=self.calculator.area, source=self.excel_path,
+                                      output_file=output_file, slr=points[2])
+
+    def _record_comparison(self, points: tuple, output_file: str = None) -> None:
+        """对比分析结果写入结果库"""
+        if self.results_store is None:
+            return
+        self.results_store.record('comparison', points[3], unit=self.unit,
+                                  area=self.calculator.area, output_file=output_file,
+                                  labels=[str(name) for name in points[0]])
+
+    def _record_sensitivity(self, mlss_rows: list, flow_rows: list, base_mlss: float,
+                            base_flow: float, output_file: str = None) -> None:
+        """敏感性分析结果写入结果库"""
+        if self.results_store is None:
+            return
+        run_id = self.results_store.create_run(
+            'sensitivity', unit=self.unit, area=self.calculator.area, output_file=output_file,
+            meta={'base_mlss': base_mlss, 'base_flow': base_flow})
+        self.results_store.add_sensitivity(run_id, 'mlss', mlss_rows)
+        self.results_store.add_sensitivity(run_id, 'equivalent_flow', flow_rows)
+
+    def generate_analysis_report(self, output_file: str = None, incremental: bool = False,
+                                 changed_only: bool = False) -> list:
         """
         生成分析报告：计算每个点的运行状态
 
         Args:
             output_file: 输出文件路径（可选）
+            incremental: 增量模式，只改写输入变化的行（需要 output_file）；
+                本次改写了哪些行见 self.last_update
+            changed_only: 增量模式下只检查并返回本次写入工作簿的行（顺序同
+                self.last_update['rows']），省去未变化行的计算
 
         Returns:
-            列表格式的报告
+            列表格式的报告（增量模式下默认同样是完整报告）
         """
         table_info = self.parse_mlss_table()
         if 'error' in table_info:
             return []
+        if incremental and output_file:
+            return self._update_analysis_report(output_file, table_info, changed_only)
 
-        results = []
-
-        for eq in table_info['equivalent_values']:
-            for mlss_idx, mlss in enumerate(table_info['mlss_values']):
-                eq_idx = table_info['equivalent_values'].index(eq)
-                if eq_idx < len(table_info['slr_data']) and mlss_idx < len(table_info['slr_data'][eq_idx]):
-                    slr = table_info['slr_data'][eq_idx][mlss_idx]
-
-                    # 验证状态
-                    check = self.calculator.check_operating_point(mlss, eq)
-
-                    results.append({
-                        'MLSS (mg/L)': int(mlss),
-                        'Equivalent (L/s)': int(eq),
-                        'SLR (kg/h/m²)': f'{slr:.2f}',
-                        'MLSS Status': check['mlss']['status'],
-                        'Flow Status': check['equivalent_flow']['status'],
-                        'SLR Status': check['slr']['status'],
-                        'Overall Safe': '✓' if check['overall_safe'] else '✗',
-                    })
+        with stage('generate_analysis_report', category='analyse') as s:
+            points = self._analysis_points(table_info)
+            results = self._analysis_rows(table_info, points)
+            s.rows = len(results)
 
         if output_file:
-            # 保存为 Excel
-            wb = Workbook()
-            ws = wb.active
+            with stage('save_analysis_report', category='export', rows=len(results)):
+                write_analysis_workbook(output_file, results)
+            print(f"✓ 分析报告已保存: {output_file}")
+        self._record_analysis(points, output_file)
+
+        return results
+
+    def analysis_columns(self) -> Dict:
+        """
+        分析报告的列式数据（数值不格式化为字符串）
+
+        Returns:
+            check_operating_points 的结果，另含表格中的 SLR 'table_slr'；
+            浓度表无法解析时为 None
+        """
+        table_info = self.parse_mlss_table()
+        if 'error' in table_info:
+            return None
+        _, _, points_slr, check = self._analysis_points(table_info)
+        check['table_slr'] = np.asarray(points_slr, dtype=np.float64)
+        return check
+
+    def iter_analysis_chunks(self, excel_path: str = None, chunk_size: int = ANALYSIS_CHUNK_SIZE,
+                             memory_budget: int = None) -> Iterator[Dict]:
+        """
+        内存受限模式：以固定大小的列式块逐块产生分析结果
+
+        以只读流式方式读取工作簿，不填充 self.df，也不构造嵌套列表或报告字典，
+        峰值内存只与块大小有关，与表格规模无关。
+
+        表格布局与 parse_mlss_table 相同（第一行 MLSS 标题，第二行副标题，
+        第一列为等效流量）。流量无法解析的行被跳过，无法解析的 SLR 单元格记为 NaN。
+
+        Args:
+            excel_path: Excel 文件路径，默认为已加载的文件
+            chunk_size: 每块大约包含的点数（按整行划分，至少一行）
+            memory_budget: 每块的内存预算（字节），指定时覆盖 chunk_size
+
+        Yields:
+            列式结果块：
+                {
+                    'mlss': float32 数组,
+                    'equivalent_flow': float32 数组,
+                    'slr': float32 数组（表格中的 SLR 值）,
+                    'mlss_status': int8 数组,
+                    'flow_status': int8 数组,
+                    'slr_status': int8 数组,
+                    'overall_safe': bool 数组,
+                }
+        """
+        excel_path = excel_path or self.excel_path
+        if not excel_path:
+            raise ValueError('未指定 Excel 文件')
+        if memory_budget is not None:
+            chunk_size = chunk_size_for_budget(memory_budget)
+
+        wb = load_workbook(excel_path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            next(rows, None)  # 副标题行
+
+            mlss_columns, mlss_values = [], []
+            for col_idx in range(1, len(header or ())):
+                mlss_val = _to_float(header[col_idx])
+                if mlss_val is not None:
+                    mlss_columns.append(col_idx)
+                    mlss_values.append(mlss_val)
+            if not mlss_columns:
+                return
+
+            mlss_row = np.asarray(mlss_values, dtype=np.float64)
+            n_cols = len(mlss_columns)
+            rows_per_chunk = max(1, chunk_size // n_cols)
+
+            # 读取缓冲区在各块之间复用
+            eq_buf = np.empty(rows_per_chunk, dtype=np.float64)
+            slr_buf = np.empty((rows_per_chunk, n_cols), dtype=np.float32)
+            filled = 0
+
+            for row in rows:
+                eq_val = _to_float(row[0]) if row else None
+                if eq_val is None:
+                    continue
+                eq_buf[filled] = eq_val
+                slr_buf[filled] = [_to_float(row[c], NAN) if c < len(row) else NAN
+                                   for c in mlss_columns]
+                filled += 1
+                if filled == rows_per_chunk:
+                    yield self._analysis_chunk(mlss_row, eq_buf[:filled], slr_buf[:filled])
+                    filled = 0
+
+            if filled:
+                yield self._analysis_chunk(mlss_row, eq_buf[:filled], slr_buf[:filled])
+        finally:
+            wb.close()
+
+    def _analysis_chunk(self, mlss_row: np.ndarray, eq: np.ndarray, slr: np.ndarray) -> Dict:
+        """计算一个块的运行状态（状态按 float64 判定，结果以 float32/int8 保存）"""
+        with stage('analysis_chunk', category='analyse', rows=slr.size):
+            mlss = np.tile(mlss_row, len(eq))
+            flow = np.repeat(eq, len(mlss_row))
+            check = self.calculator.check_operating_points(mlss, flow)
+            return {
+                'mlss': mlss.astype(np.float32),
+                'equivalent_flow': flow.astype(np.float32),
+                'slr': slr.reshape(-1).copy(),
+                'mlss_status': check['mlss_status'],
+                'flow_status': check['flow_status'],
+                'slr_status': check['slr_status'],
+                'overall_safe': check['overall_safe'],
+            }
 
-            # 写入表头
-            headers = list(results[0].keys()) if results else []
-            for col_idx, header in enumerate(headers, start=1):
-                ws.cell(row=1, column=col_idx, value=header)
+    def save_analysis_report_streaming(self, output_file: str, excel_path: str = None,
+                                       chunk_size: int = ANALYSIS_CHUNK_SIZE,
+                                       memory_budget: int = None) -> Dict:
+        """
+        内存受限模式下生成分析报告 Excel
 
-            # 写入数据
-            for row_idx, item in enumerate(results, start=2):
-                for col_idx, value in enumerate(item.values(), start=1):
-                    ws.cell(row=row_idx, column=col_idx, value=value)
+        逐块计算并以 write-only 模式流式写出，列与 generate_analysis_report 相同。
 
+        Args:
+            output_file: 输出文件路径
+            excel_path: 输入 Excel 文件路径，默认为已加载的文件
+            chunk_size: 每块大约包含的点数
+            memory_budget: 每块的内存预算（字节）
+
+        Returns:
+            {'rows': 总点数, 'unsafe': 不安全点数}
+        """
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(ANALYSIS_HEADERS)
+
+        total = 0
+        unsafe = 0
+        run_id = None
+        if self.results_store is not None:
+            run_id = self.results_store.create_run(
+                'analysis', unit=self.unit, area=self.calculator.area,
+                source=excel_path or self.excel_path, output_file=output_file)
+        with stage('save_analysis_report_streaming', category='export') as s:
+            for chunk in self.iter_analysis_chunks(excel_path, chunk_size, memory_budget):
+                if run_id is not None:
+                    self.results_store.add_results(run_id, chunk, slr=chunk['slr'])
+                safe = chunk['overall_safe']
+                total += safe.size
+                unsafe += int(safe.size - np.count_nonzero(safe))
+                for mlss, eq, slr, m_status, f_status, s_status, ok in zip(
+                        chunk['mlss'].tolist(), chunk['equivalent_flow'].tolist(),
+                        chunk['slr'].tolist(), chunk['mlss_status'].tolist(),
+                        chunk['flow_status'].tolist(), chunk['slr_status'].tolist(),
+                        safe.tolist()):
+                    ws.append([int(mlss), int(eq), f'{slr:.2f}', STATUS_NAMES[m_status],
+                               STATUS_NAMES[f_status], STATUS_NAMES[s_status], '✓' if ok else '✗'])
             wb.save(output_file)
-            print(f"✓ 分析报告已保存: {output_file}")
+            s.rows = total
 
-        return results
+        print(f"✓ 分析报告已保存: {output_file}")
+        return {'rows': total, 'unsafe': unsafe}
 
-    def create_comparison_excel(self, output_file: str, variations: Dict) -> None:
+    def create_comparison_excel(self, output_file: str, variations: Dict,
+                                incremental: bool = False) -> None:
         """
         创建对比分析 Excel
 
@@ -174,55 +530,18 @@ class ExcelDataHandler:
                     '高流量': {'mlss': 3500, 'flow': 120},
                     '高浓度': {'mlss': 4000, 'flow': 100},
                 }
+            incremental: 增量模式，只重算并改写变化的场景
         """
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "参数对比"
-
-        # 表头
-        headers = ['场景', 'MLSS (mg/L)', 'Equivalent (L/s)', 'SLR (kg/h/m²)',
-                   'MLSS 状态', 'Flow 状态', 'SLR 状态', '整体安全']
-        for col_idx, header in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col_idx, value=header)
-            cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-
-        # 数据行
-        for row_idx, (scenario, params) in enumerate(variations.items(), start=2):
-            mlss = params['mlss']
-            flow = params['flow']
-            check = self.calculator.check_operating_point(mlss, flow)
-
-            ws.cell(row=row_idx, column=1, value=scenario)
-            ws.cell(row=row_idx, column=2, value=mlss)
-            ws.cell(row=row_idx, column=3, value=flow)
-            ws.cell(row=row_idx, column=4, value=round(check['calculated_slr'], 2))
-            ws.cell(row=row_idx, column=5, value=check['mlss']['status'])
-            ws.cell(row=row_idx, column=6, value=check['equivalent_flow']['status'])
-            ws.cell(row=row_idx, column=7, value=check['slr']['status'])
-            ws.cell(row=row_idx, column=8, value='✓' if check['overall_safe'] else '✗')
-
-            # 条件格式
-            for col in range(1, 9):
-                cell = ws.cell(row=row_idx, column=col)
-                cell.alignment = Alignment(horizontal="center")
-                if col == 8:  # 整体安全列
-                    if check['overall_safe']:
-                        cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-                    else:
-                        cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-
-        # 调整列宽
-        ws.column_dimensions['A'].width = 15
-        for col in range(2, 9):
-            ws.column_dimensions[get_column_letter(col)].width = 18
-
-        wb.save(output_file)
+        if incremental:
+            return self._update_comparison_excel(output_file, variations)
+        with stage('create_comparison_excel', category='export', rows=len(variations)):
+            points = self._comparison_points(variations)
+            write_comparison_workbook(output_file, self._comparison_rows(variations, points))
         print(f"✓ 对比分析 Excel 已保存: {output_file}")
+        self._record_comparison(points, output_file)
 
     def create_sensitivity_analysis(self, output_file: str, base_mlss: float = 3500,
-                                    base_flow: float = 100) -> None:
+                                    base_flow: float = 100, incremental: bool = False) -> None:
         """
         创建敏感性分析 - 显示参数变化对 SLR 的影响
 
@@ -230,58 +549,436 @@ class ExcelDataHandler:
             output_file: 输出文件路径
             base_mlss: 基准 MLSS (mg/L)
             base_flow: 基准流量 (L/s)
+            incremental: 增量模式，只重算并改写变化的行
         """
-        wb = Workbook()
+        if incremental:
+            return self._update_sensitivity_analysis(output_file, base_mlss, base_flow)
+        with stage('create_sensitivity_analysis', category='export'):
+            mlss_rows, flow_rows = self._sensitivity_rows(base_mlss, base_flow)
+            write_sensitivity_workbook(output_file, mlss_rows, flow_rows)
+        print(f"✓ 敏感性分析 Excel 已保存: {output_file}")
+        self._record_sensitivity(mlss_rows, flow_rows, base_mlss, base_flow, output_file)
 
-        # Sheet 1: MLSS 变化影响
-        ws1 = wb.active
-        ws1.title = "MLSS变化影响"
+    def _update_report(self, kind: str, output_file: str, context: str,
+                       sections: Dict[str, list], layout: list, rebuild, recompute) -> Dict:
+        """
+        增量更新报告的通用流程：比较行指纹，修补变化的行，必要时整体重新生成
 
-        mlss_variations = range(2000, 5500, 500)
-        ws1['A1'] = 'MLSS 敏感性分析'
-        ws1['A1'].font = Font(bold=True, size=14)
+        Args:
+            kind: 报告类型
+            output_file: 报告路径
+            context: 影响所有行的上下文指纹
+            sections: {区段名: 新的行指纹列表}，顺序与工作簿中的工作表一致
+            layout: 每个区段的 (第一条数据的行号, 列数, to_values)，to_values(行数据) 返回单元格值列表
+            rebuild: rebuild() 整体重新生成报告
+            recompute: recompute({区段名: 变化行下标}) -> {区段名: 新行数据}
 
-        ws1['A3'] = 'MLSS (mg/L)'
-        ws1['B3'] = 'SLR (kg/h/m²)'
-        ws1['C3'] = '相对变化 (%)'
+        Returns:
+            {'mode': 'full' 或 'patch', 'changed': 重写行数, 'removed': 删除行数,
+             'rows': {区段名: 重写的行下标}}，同时保存在 self.last_update
 
-        base_slr = self.calculator.calculate_slr(base_mlss, base_flow)
+        修补直接改写工作表 XML，耗时随文件大小增长；估算不比整体重新生成更快、
+        或工作表结构无法原地修补时整体重新生成。输入没有变化时不读写工作簿。
+        """
+        def full():
+            rebuild()
+            save_sidecar(output_file, kind, context, sections)
+            self.last_update = {'mode': 'full', 'changed': sum(map(len, sections.values())),
+                                'removed': 0,
+                                'rows': {name: list(range(len(fps)))
+                                         for name, fps in sections.items()}}
+            return self.last_update
+
+        old = load_sidecar(output_file, kind, context)
+        if (old is None or list(old) != list(sections)
+                or not all(old[name] for name in sections)):
+            return full()
+
+        changed = {name: changed_rows(old[name], fps) for name, fps in sections.items()}
+        removed = {name: max(len(old[name]) - len(fps), 0) for name, fps in sections.items()}
+        summary = {'mode': 'patch', 'changed': sum(map(len, changed.values())),
+                   'removed': sum(removed.values()), 'rows': changed}
+        if not summary['changed'] and not summary['removed']:
+            self.last_update = summary
+            return summary
+
+        n_cols = [n for _, n, _ in layout]
+        changed_cells = sum(len(changed[name]) * n for name, n in zip(sections, n_cols))
+        total_cells = sum(len(fps) * n for fps, n in zip(sections.values(), n_cols))
+        if estimate_patch_seconds(output_file, changed_cells) >= estimate_rebuild_seconds(total_cells):
+            return full()
+
+        rows = recompute({name: idx for name, idx in changed.items() if idx})
+        patches = [(sheet, first_row, changed[name], [to_values(r) for r in rows.get(name, [])],
+                    len(old[name]), len(sections[name]))
+                   for sheet, (name, (first_row, _, to_values)) in enumerate(zip(sections, layout))]
+        if not patch_workbook(output_file, patches):
+            return full()
+        save_sidecar(output_file, kind, context, sections)
+        self.last_update = summary
+        return summary
+
+    def _update_analysis_report(self, output_file: str, table_info: Dict,
+                                changed_only: bool = False) -> list:
+        """
+        增量更新分析报告
 
-        for row_idx, mlss in enumerate(mlss_variations, start=4):
-            slr = self.calculator.calculate_slr(mlss, base_flow)
-            change = ((slr - base_slr) / base_slr) * 100
+        changed_only 为 False 时返回完整报告（批量检查所有行，开销远小于写入工作簿）；
+        为 True 时只检查并格式化本次写入工作簿的行。
+        """
+        inputs = self._analysis_inputs(table_info)
+        fps = row_fingerprints(zip(*inputs))
+        computed = {}
+
+        def compute(indices=None):
+            if indices is None:
+                subset = inputs
+            else:
+                subset = tuple([column[i] for i in indices] for column in inputs)
+            check = self.calculator.check_operating_points(subset[0], subset[1])
+            computed['points'] = (*subset, check)
+            computed['rows'] = self._analysis_rows(table_info, computed['points'])
+            return computed['rows']
+
+        results = None if changed_only else compute()
+
+        def rebuild():
+            write_analysis_workbook(output_file, results if results is not None else compute())
+
+        def recompute(changed):
+            indices = changed.get('analysis', [])
+            if results is not None:
+                return {'analysis': [results[i] for i in indices]}
+            return {'analysis': compute(indices)}
+
+        with stage('update_analysis_report', category='export') as s:
+            summary = self._update_report(
+                'analysis', output_file, context_fingerprint(self.calculator), {'analysis': fps},
+                [(2, len(ANALYSIS_HEADERS), lambda item: list(item.values()))],
+                rebuild, recompute)
+            s.rows = summary['changed']
+        _print_update(REPORT_TITLES['analysis'], output_file, summary)
+        if summary['changed'] or summary['removed']:
+            self._record_analysis(computed['points'], output_file)
+        if results is not None:
+            return results
+        return computed.get('rows', [])
+
+    def _update_comparison_excel(self, output_file: str, variations: Dict) -> Dict:
+        """增量更新对比分析 Excel"""
+        names = list(variations)
+        fps = row_fingerprints((name, variations[name]['mlss'], variations[name]['flow'])
+                               for name in names)
+        recomputed = {}
+
+        def recompute_rows(indices):
+            if not indices:
+                return []
+            subset = {names[i]: variations[names[i]] for i in indices}
+            recomputed['points'] = self._comparison_points(subset)
+            return self._comparison_rows(subset, recomputed['points'])
+
+        def rebuild():
+            write_comparison_workbook(output_file, recompute_rows(range(len(names))))
+
+        with stage('update_comparison_excel', category='export') as s:
+            summary = self._update_report(
+                'comparison', output_file, context_fingerprint(self.calculator), {'comparison': fps},
+                [(2, 8, _comparison_values)], rebuild,
+                lambda changed: {'comparison': recompute_rows(changed.get('comparison', []))})
+            s.rows = summary['changed']
+        _print_update(REPORT_TITLES['comparison'], output_file, summary)
+        if 'points' in recomputed:
+            self._record_comparison(recomputed['points'], output_file)
+        return summary
+
+    def _update_sensitivity_analysis(self, output_file: str, base_mlss: float,
+                                     base_flow: float) -> Dict:
+        """增量更新敏感性分析 Excel（基准点变化时所有行的相对变化都会变化）"""
+        mlss_values = list(SENSITIVITY_MLSS_RANGE)
+        flow_values = list(SENSITIVITY_FLOW_RANGE)
+        sections = {
+            'mlss': row_fingerprints((v, base_mlss, base_flow) for v in mlss_values),
+            'flow': row_fingerprints((v, base_mlss, base_flow) for v in flow_values),
+        }
+        recomputed = {}
+
+        def recompute_rows(changed):
+            if not changed:
+                return {}
+            mlss_rows, flow_rows = self._sensitivity_rows(
+                base_mlss, base_flow,
+                [mlss_values[i] for i in changed.get('mlss', [])],
+                [flow_values[i] for i in changed.get('flow', [])])
+            recomputed['rows'] = (mlss_rows, flow_rows)
+            return {'mlss': mlss_rows, 'flow': flow_rows}
+
+        def rebuild():
+            rows = recompute_rows({'mlss': range(len(mlss_values)),
+                                   'flow': range(len(flow_values))})
+            write_sensitivity_workbook(output_file, rows['mlss'], rows['flow'])
+
+        with stage('update_sensitivity_analysis', category='export') as s:
+            summary = self._update_report(
+                'sensitivity', output_file, context_fingerprint(self.calculator), sections,
+                [(4, 3, list), (4, 3, list)],
+                rebuild, recompute_rows)
+            s.rows = summary['changed']
+        _print_update(REPORT_TITLES['sensitivity'], output_file, summary)
+        if 'rows' in recomputed:
+            self._record_sensitivity(*recomputed['rows'], base_mlss, base_flow, output_file)
+        return summary
+
+    def generate_reports(self, output_dir: str, reports=REPORT_TYPES, variations: Dict = None,
+                         base_mlss: float = 3500, base_flow: float = 100,
+                         max_workers: int = None, executor: str = 'process') -> Dict[str, str]:
+        """
+        一次性并发生成多个报告
 
-            ws1.cell(row=row_idx, column=1, value=mlss)
-            ws1.cell(row=row_idx, column=2, value=round(slr, 2))
-            ws1.cell(row=row_idx, column=3, value=round(change, 2))
+        表格只解析一次，各报告所需的数值结果先在当前进程批量算好，
+        再把 Excel 写入任务并发提交到线程池或进程池，总耗时接近最慢的单个报告。
 
-        # Sheet 2: 流量变化影响
-        ws2 = wb.create_sheet("流量变化影响")
+        Args:
+            output_dir: 输出目录（不存在时自动创建）
+            reports: 要生成的报告，可选 'analysis'、'comparison'、'sensitivity'
+            variations: 对比分析的场景字典（生成 'comparison' 时必需）
+            base_mlss: 敏感性分析的基准 MLSS (mg/L)
+            base_flow: 敏感性分析的基准流量 (L/s)
+            max_workers: 最大并发数，默认为报告数量
+            executor: 'process'（进程池，可真正并行）或 'thread'（线程池）
 
-        flow_variations = range(60, 175, 10)
-        ws2['A1'] = '流量敏感性分析'
-        ws2['A1'].font = Font(bold=True, size=14)
+        Returns:
+            {报告类型: 输出文件路径}
+        """
+        reports = list(dict.fromkeys(reports))
+        unknown = [r for r in reports if r not in REPORT_TYPES]
+        if unknown:
+            raise ValueError(f'未知报告类型: {unknown}')
+        if 'comparison' in reports and not variations:
+            raise ValueError('生成对比分析需要提供 variations')
+        if executor not in ('process', 'thread'):
+            raise ValueError(f'未知执行器: {executor}')
+
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
 
-        ws2['A3'] = 'Equivalent (L/s)'
-        ws2['B3'] = 'SLR (kg/h/m²)'
-        ws2['C3'] = '相对变化 (%)'
+        # 共享的数值结果：只解析、只计算一次
+        tasks = {}
+        points = {}
+        with stage('generate_reports', category='analyse') as s:
+            if 'analysis' in reports:
+                table_info = self.parse_mlss_table()
+                if 'error' in table_info:
+                    raise ValueError(f"无法解析 MLSS 浓度表: {table_info['error']}")
+                points['analysis'] = self._analysis_points(table_info)
+                tasks['analysis'] = (write_analysis_workbook,
+                                     (self._analysis_rows(table_info, points['analysis']),))
+            if 'comparison' in reports:
+                points['comparison'] = self._comparison_points(variations)
+                tasks['comparison'] = (write_comparison_workbook,
+                                       (self._comparison_rows(variations, points['comparison']),))
+            if 'sensitivity' in reports:
+                tasks['sensitivity'] = (write_sensitivity_workbook,
+                                        self._sensitivity_rows(base_mlss, base_flow))
+            s.rows = sum(len(args[0]) for _, args in tasks.values())
+
+        pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+        outputs = {}
+        with stage('generate_reports_write', category='export'):
+            with pool_class(max_workers=max_workers or len(tasks) or 1) as pool:
+                futures = {}
+                for report in reports:
+                    writer, args = tasks[report]
+                    output_file = str(output_dir / REPORT_FILENAMES[report])
+                    futures[report] = pool.submit(writer, output_file, *args)
+                    outputs[report] = output_file
+                for report, future in futures.items():
+                    future.result()
+                    print(f"✓ {REPORT_TITLES[report]} 已保存: {outputs[report]}")
+
+        # 报告全部写出后再记入结果库
+        if 'analysis' in outputs:
+            self._record_analysis(points['analysis'], outputs['analysis'])
+        if 'comparison' in outputs:
+            self._record_comparison(points['comparison'], outputs['comparison'])
+        if 'sensitivity' in outputs:
+            self._record_sensitivity(*tasks['sensitivity'][1], base_mlss, base_flow,
+                                     outputs['sensitivity'])
+
+        return outputs
+
+
+def chunk_size_for_budget(memory_budget: int) -> int:
+    """
+    根据内存预算计算每块点数
 
-        for row_idx, flow in enumerate(flow_variations, start=4):
-            slr = self.calculator.calculate_slr(base_mlss, flow)
-            change = ((slr - base_slr) / base_slr) * 100
+    Args:
+        memory_budget: 每块的内存预算（字节）
 
-            ws2.cell(row=row_idx, column=1, value=flow)
-            ws2.cell(row=row_idx, column=2, value=round(slr, 2))
-            ws2.cell(row=row_idx, column=3, value=round(change, 2))
+    Returns:
+        每块点数（至少为 1）
+    """
+    return max(1, int(memory_budget) // ANALYSIS_BYTES_PER_POINT)
+
+
+def _to_float(value, default=None):
+    """转换为浮点数，无法转换时返回 default"""
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _print_update(title: str, output_file: str, summary: Dict) -> None:
+    """输出增量更新结果"""
+    if summary['mode'] == 'full':
+        print(f"✓ {title} 已保存: {output_file}（全部重新生成 {summary['changed']} 行）")
+    elif summary['changed'] or summary['removed']:
+        print(f"✓ {title} 已增量更新: {output_file}"
+              f"（重写 {summary['changed']} 行，删除 {summary['removed']} 行）")
+    else:
+        print(f"✓ {title} 无变化: {output_file}")
 
-        # 格式化
-        for ws in [ws1, ws2]:
-            for row in range(3, 20):
-                for col in range(1, 4):
-                    ws.cell(row=row, column=col).alignment = Alignment(horizontal="center")
 
-        wb.save(output_file)
-        print(f"✓ 敏感性分析 Excel 已保存: {output_file}")
+def write_analysis_workbook(output_file: str, results: list) -> None:
+    """
+    写出分析报告 Excel
+
+    Args:
+        output_file: 输出文件路径
+        results: generate_analysis_report 格式的报告行
+    """
+    # 报告没有样式，用只写模式逐行流式写出
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet')
+
+    # 写入表头
+    if results:
+        ws.append(list(results[0].keys()))
+
+    # 写入数据
+    for item in results:
+        ws.append(list(item.values()))
+
+    wb.save(output_file)
+
+
+def write_comparison_workbook(output_file: str, rows: list) -> None:
+    """
+    写出对比分析 Excel
+
+    Args:
+        output_file: 输出文件路径
+        rows: ExcelDataHandler._comparison_rows 的返回值
+    """
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "参数对比"
+
+    # 表头
+    headers = ['场景', 'MLSS (mg/L)', 'Equivalent (L/s)', 'SLR (kg/h/m²)',
+               'MLSS 状态', 'Flow 状态', 'SLR 状态', '整体安全']
+    for col_idx, header in enumerate(headers, start=1):
+        cell = ws.cell(row=1, column=col_idx, value=header)
+        cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+
+    # 数据行
+    for row_idx, row in enumerate(rows, start=2):
+        _write_comparison_row(ws, row_idx, row)
+
+    # 整体安全列着色：整列两条条件格式规则，不再逐格设置填充
+    _add_comparison_rules(ws, len(rows))
+
+    # 调整列宽
+    ws.column_dimensions['A'].width = 15
+    for col in range(2, 9):
+        ws.column_dimensions[get_column_letter(col)].width = 18
+
+    wb.save(output_file)
+
+
+def _write_comparison_row(ws, row_idx: int, row: tuple) -> None:
+    """写入对比分析的一行"""
+    for col_idx, value in enumerate(_comparison_values(row), start=1):
+        ws.cell(row=row_idx, column=col_idx, value=value).alignment = Alignment(horizontal="center")
+
+
+def _comparison_values(row: tuple) -> list:
+    """对比分析一行的单元格值"""
+    *values, safe = row
+    return [*values, '✓' if safe else '✗']
+
+
+def _add_comparison_rules(ws, n_rows: int) -> None:
+    """整体安全列（H2 起 n_rows 行）的条件格式，替换工作表上已有的规则"""
+    ws.conditional_formatting = ConditionalFormattingList()
+    if not n_rows:
+        return
+    safe_range = f'H2:H{n_rows + 1}'
+    ws.conditional_formatting.add(safe_range, CellIsRule(
+        operator='equal', formula=['"✓"'],
+        fill=PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")))
+    ws.conditional_formatting.add(safe_range, CellIsRule(
+        operator='equal', formula=['"✗"'],
+        fill=PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")))
+
+
+def write_sensitivity_workbook(output_file: str, mlss_rows: list, flow_rows: list) -> None:
+    """
+    写出敏感性分析 Excel
+
+    Args:
+        output_file: 输出文件路径
+        mlss_rows: MLSS 变化行 [(MLSS, SLR, 相对变化 %)]
+        flow_rows: 流量变化行 [(流量, SLR, 相对变化 %)]
+    """
+    wb = Workbook()
+
+    # Sheet 1: MLSS 变化影响
+    ws1 = wb.active
+    ws1.title = "MLSS变化影响"
+
+    ws1['A1'] = 'MLSS 敏感性分析'
+    ws1['A1'].font = Font(bold=True, size=14)
+
+    ws1['A3'] = 'MLSS (mg/L)'
+    ws1['B3'] = 'SLR (kg/h/m²)'
+    ws1['C3'] = '相对变化 (%)'
+
+    for row_idx, row in enumerate(mlss_rows, start=4):
+        _write_sensitivity_row(ws1, row_idx, row)
+
+    # Sheet 2: 流量变化影响
+    ws2 = wb.create_sheet("流量变化影响")
+
+    ws2['A1'] = '流量敏感性分析'
+    ws2['A1'].font = Font(bold=True, size=14)
+
+    ws2['A3'] = 'Equivalent (L/s)'
+    ws2['B3'] = 'SLR (kg/h/m²)'
+    ws2['C3'] = '相对变化 (%)'
+
+    for row_idx, row in enumerate(flow_rows, start=4):
+        _write_sensitivity_row(ws2, row_idx, row)
+
+    # 格式化
+    for ws in [ws1, ws2]:
+        for row in range(3, 20):
+            for col in range(1, 4):
+                ws.cell(row=row, column=col).alignment = Alignment(horizontal="center")
+
+    wb.save(output_file)
+
+
+def _write_sensitivity_row(ws, row_idx: int, row: tuple) -> None:
+    """写入敏感性分析的一行"""
+    for col_idx, value in enumerate(row, start=1):
+        cell = ws.cell(row=row_idx, column=col_idx, value=value)
+        cell.alignment = Alignment(horizontal="center")
 
 
 # 使用示例
@@ -322,16 +1019,11 @@ def example_excel_operations(data_dir: str = None, output_dir: str = None):
             '超高负荷': {'mlss': 4500, 'flow': 150},
         }
 
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        handler.create_comparison_excel(
-            str(output_dir / "参数对比分析.xlsx"),
-            variations
-        )
-
-        # 生成敏感性分析
-        handler.create_sensitivity_analysis(
-            str(output_dir / "敏感性分析.xlsx"),
+        # 并发生成对比分析和敏感性分析
+        handler.generate_reports(
+            str(output_dir),
+            reports=('comparison', 'sensitivity'),
+            variations=variations,
             base_mlss=3500,
             base_flow=100
         )
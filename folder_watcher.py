@@ -0,0 +1,551 @@
+"""
+监视文件夹 - 新增或修改的工作簿自动解析并生成报告
+
+长期运行的监视进程：data/ 中出现新的或被修改的工作簿时，自动解析并把分析报告写入
+output/，不必再手动运行示例脚本。
+
+    - 事件来源：Linux 上使用 inotify（ctypes 调用 libc，无第三方依赖），
+      其他平台或 inotify 不可用时退回按修改时间和大小轮询
+    - 防抖：文件最后一次事件后静默 debounce 秒、且大小和修改时间不再变化才处理，
+      避免读到写了一半的文件
+    - 有界队列 + 固定数量的工作线程；队列满时文件留在待处理表中，下一轮再入队
+    - 内容哈希：内容和处理参数（如面积）都与上次成功处理时相同、且报告仍存在的文件
+      直接跳过（记录在状态文件中，重启后仍有效）
+    - 计数器：队列深度、处理中数量、已处理 / 跳过 / 失败数，
+      以及排队等待、处理耗时、端到端（首次事件到处理完成）的延迟统计
+
+使用示例：
+    watcher = FolderWatcher('data', 'output', workers=2)
+    watcher.start()
+    ...
+    print(watcher.stats())
+    watcher.stop()
+
+命令行：
+    python folder_watcher.py data output --workers 2 --debounce 1.0
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from profiling import stage
+
+WATCH_SUFFIXES = ('.xlsx', '.xlsm')
+STATE_FILENAME = '.watch_state.json'
+REPORT_SUFFIX = '_分析报告.xlsx'
+HASH_CHUNK_SIZE = 1 << 20
+
+# inotify 常量（linux/inotify.h）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT = struct.Struct('iIII')
+
+
+def _load_libc():
+    """加载支持 inotify 的 libc；不可用时返回 None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class _InotifySource:
+    """inotify 事件源"""
+
+    kind = 'inotify'
+
+    def __init__(self, directory: Path, libc):
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(err, f'inotify_add_watch 失败: {directory}')
+
+    def wait(self, timeout: float) -> List[str]:
+        """等待事件，返回发生变化的文件名"""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            _, _, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class _PollingSource:
+    """按修改时间和大小轮询的事件源"""
+
+    kind = 'polling'
+
+    def __init__(self, directory: Path, interval: float):
+        self.directory = directory
+        self.interval = interval
+        self._signatures = self._scan()
+
+    def _scan(self) -> Dict[str, tuple]:
+        signatures = {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return signatures
+        for entry in entries:
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            signatures[entry.name] = (st.st_mtime_ns, st.st_size)
+        return signatures
+
+    def wait(self, timeout: float) -> List[str]:
+        """等待一个轮询周期，返回新增或变化的文件名"""
+        time.sleep(min(timeout, self.interval))
+        signatures = self._scan()
+        changed = [name for name, sig in signatures.items() if self._signatures.get(name) != sig]
+        self._signatures = signatures
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class LatencyCounter:
+    """延迟统计：次数、均值、最大值和最近样本的分位数"""
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self._recent = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+
+    def to_dict(self) -> Dict:
+        recent = sorted(self._recent)
+
+        def pct(p):
+            return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else 0.0
+
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': pct(0.50),
+            'p95': pct(0.95),
+            'max': self.max,
+            'last': self.last,
+        }
+
+
+def file_hash(path) -> str:
+    """文件内容哈希（BLAKE2b）"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def process_workbook(path, output_dir, area: float = 1.0) -> Dict:
+    """
+    默认处理函数：解析 MLSS 浓度表并增量更新分析报告
+
+    Args:
+        path: 工作簿路径
+        output_dir: 报告输出目录
+        area: 处理单元面积 (m²)
+
+    Returns:
+        {'report': 报告路径, 'rows': 本次改写的行数}
+    """
+    from excel_handler import ExcelDataHandler
+
+    handler = ExcelDataHandler(str(path))
+    handler.calculator.area = area
+    table_info = handler.parse_mlss_table()
+    if 'error' in table_info:
+        raise ValueError(f"无法解析 MLSS 浓度表: {table_info['error']}")
+    report = Path(output_dir) / f'{Path(path).stem}{REPORT_SUFFIX}'
+    handler.generate_analysis_report(str(report), incremental=True, changed_only=True)
+    return {'report': str(report), 'rows': handler.last_update['changed']}
+
+
+class FolderWatcher:
+    """监视文件夹并自动处理新增或修改的工作簿"""
+
+    def __init__(self, input_dir, output_dir, processor: Callable = None, workers: int = 2,
+                 queue_size: int = 64, debounce: float = 1.0, poll_interval: float = 1.0,
+                 use_inotify: bool = True, suffixes=WATCH_SUFFIXES, state_file=None,
+                 area: float = 1.0, settings: Dict = None):
+        """
+        Args:
+            input_dir: 监视的目录
+            output_dir: 报告输出目录（不能与监视目录相同）
+            processor: processor(路径) 处理一个工作簿，默认 process_workbook
+            workers: 工作线程数
+            queue_size: 队列容量
+            debounce: 防抖时间（秒）
+            poll_interval: 轮询间隔（秒，仅轮询模式）
+            use_inotify: 可用时使用 inotify
+            suffixes: 需要处理的文件扩展名
+            state_file: 处理状态文件，默认 output_dir/.watch_state.json
+            area: 默认处理函数使用的面积 (m²)
+            settings: 影响处理结果的参数（可 JSON 序列化），与内容哈希一起决定能否跳过；
+                默认处理函数为 {'area': area}，自定义 processor 默认为空
+        """
+        self.input_dir = Path(input_dir)
+        self.output_dir = Path(output_dir)
+        if not self.input_dir.is_dir():
+            raise ValueError(f'监视目录不存在: {self.input_dir}')
+        if self.input_dir.resolve() == self.output_dir.resolve():
+            raise ValueError('输出目录不能与监视目录相同')
+        if workers < 1:
+            raise ValueError('工作线程数必须大于 0')
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        if settings is None:
+            settings = {} if processor is not None else {'area': area}
+        self.settings = dict(settings)
+        self._settings_key = json.dumps(self.settings, sort_keys=True, ensure_ascii=False,
+                                        default=str)
+        self.processor = processor or (lambda path: process_workbook(path, self.output_dir, area))
+        self.workers = workers
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.suffixes = tuple(s.lower() for s in suffixes)
+        self.state_file = Path(state_file) if state_file else self.output_dir / STATE_FILENAME
+        self.last_error: Optional[Exception] = None
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._pending: Dict[Path, list] = {}  # 路径 -> [截止时间, 文件签名, 首次事件时间]
+        self._inflight = set()
+        self._dirty = set()  # 处理期间又发生变化的文件
+        self._state = self._load_state()  # 路径 -> {'hash', 'settings', 'report'}
+        self._counters = {'events': 0, 'queued': 0, 'processed': 0, 'skipped': 0,
+                          'failed': 0, 'queue_full': 0}
+        self._latency = {'queue_wait': LatencyCounter(), 'processing': LatencyCounter(),
+                         'end_to_end': LatencyCounter()}
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._source = None
+
+    # ---------- 状态 ----------
+
+    def _load_state(self) -> Dict[str, dict]:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get('files', {})
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self) -> None:
+        tmp = self.state_file.with_name(self.state_file.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'files': self._state}, f, ensure_ascii=False)
+        os.replace(tmp, self.state_file)
+
+    def _is_current(self, key: str, digest: str) -> bool:
+        """内容、处理参数与上次成功处理时相同，且报告仍存在"""
+        entry = self._state.get(key)
+        if (not isinstance(entry, dict) or entry.get('hash') != digest
+                or entry.get('settings') != self._settings_key):
+            return False
+        report = entry.get('report')
+        return report is None or Path(report).exists()
+
+    # ---------- 事件与防抖 ----------
+
+    def _accepts(self, name: str) -> bool:
+        # 跳过 Excel 的锁文件和临时文件
+        return (name.lower().endswith(self.suffixes) and not name.startswith(('~$', '.')))
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[tuple]:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def notify(self, name: str, now: float = None) -> None:
+        """登记一个文件事件（重复事件会推迟处理时间）"""
+        if not self._accepts(name):
+            return
+        now = time.monotonic() if now is None else now
+        path = self.input_dir / name
+        with self._lock:
+            self._counters['events'] += 1
+            entry = self._pending.get(path)
+            if entry is None:
+                self._pending[path] = [now + self.debounce, self._signature(path), now]
+            else:
+                entry[0] = now + self.debounce
+
+    def scan(self) -> int:
+        """登记目录中现有的全部工作簿（启动时调用，未变化的文件会按哈希跳过）"""
+        names = sorted(entry.name for entry in os.scandir(self.input_dir) if entry.is_file())
+        for name in names:
+            self.notify(name)
+        return len(names)
+
+    def _flush_pending(self, now: float = None) -> None:
+        """把静默期已过、大小和修改时间稳定的文件放入队列"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            due = [path for path, entry in self._pending.items() if entry[0] <= now]
+            for path in due:
+                deadline, signature, first_seen = self._pending[path]
+                current = self._signature(path)
+                if current is None:
+                    # 文件已删除或被改名
+                    del self._pending[path]
+                    continue
+                if current != signature:
+                    # 仍在写入，继续等待
+                    self._pending[path] = [now + self.debounce, current, first_seen]
+                    continue
+                if path in self._inflight:
+                    self._dirty.add(path)
+                    del self._pending[path]
+                    continue
+                try:
+                    self._queue.put_nowait((path, first_seen, now))
+                except queue.Full:
+                    self._counters['queue_full'] += 1
+                    continue
+                self._inflight.add(path)
+                self._counters['queued'] += 1
+                del self._pending[path]
+
+    # ---------- 工作线程 ----------
+
+    def _process(self, path: Path, first_seen: float, queued_at: float) -> None:
+        started = time.monotonic()
+        self._latency['queue_wait'].add(started - queued_at)
+        key = str(path)
+        try:
+            with stage('watch_process', category='export') as s:
+                digest = file_hash(path)
+                if self._is_current(key, digest):
+                    with self._lock:
+                        self._counters['skipped'] += 1
+                    return
+                result = self.processor(path)
+                if isinstance(result, dict) and 'rows' in result:
+                    s.rows = result['rows']
+            entry = {'hash': digest, 'settings': self._settings_key}
+            if isinstance(result, dict) and result.get('report'):
+                entry['report'] = str(result['report'])
+            with self._lock:
+                self._state[key] = entry
+                self._save_state()
+                self._counters['processed'] += 1
+            print(f"✓ 已处理: {path}")
+        except Exception as e:
+            self.last_error = e
+            with self._lock:
+                self._counters['failed'] += 1
+            print(f"⚠️ 处理失败: {path}: {e}")
+        finally:
+            done = time.monotonic()
+            self._latency['processing'].add(done - started)
+            self._latency['end_to_end'].add(done - first_seen)
+            with self._lock:
+                self._inflight.discard(path)
+                if path in self._dirty:
+                    # 处理期间又被修改，重新登记
+                    self._dirty.discard(path)
+                    self._pending[path] = [done + self.debounce, self._signature(path), done]
+
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._process(*item)
+            finally:
+                self._queue.task_done()
+
+    def _watch(self) -> None:
+        tick = min(self.debounce, self.poll_interval) / 2 or 0.05
+        while not self._stop.is_set():
+            for name in self._source.wait(tick):
+                self.notify(name)
+            self._flush_pending()
+
+    # ---------- 启动与停止 ----------
+
+    def _open_source(self):
+        libc = _load_libc() if self.use_inotify else None
+        if libc is not None:
+            try:
+                return _InotifySource(self.input_dir, libc)
+            except OSError as e:
+                print(f"⚠️ inotify 不可用，改为轮询: {e}")
+        return _PollingSource(self.input_dir, self.poll_interval)
+
+    def start(self, scan: bool = True) -> None:
+        """
+        启动监视线程和工作线程
+
+        Args:
+            scan: 启动时是否登记目录中已有的工作簿
+        """
+        if self._threads:
+            return
+        self._stop.clear()
+        self._source = self._open_source()
+        if scan:
+            self.scan()
+        self._threads = [threading.Thread(target=self._worker, name=f'folder-watcher-{i}',
+                                          daemon=True) for i in range(self.workers)]
+        self._threads.append(threading.Thread(target=self._watch, name='folder-watcher',
+                                              daemon=True))
+        for thread in self._threads:
+            thread.start()
+        print(f"✓ 开始监视: {self.input_dir}（{self._source.kind}，{self.workers} 个工作线程）")
+
+    def stop(self) -> None:
+        """停止监视，等待队列中已有的任务处理完"""
+        if not self._threads:
+            return
+        self._stop.set()
+        watch_thread = self._threads.pop()
+        watch_thread.join()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._source.close()
+        self._source = None
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """
+        等待待处理表和队列清空
+
+        Returns:
+            是否在超时前清空
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                idle = not self._pending and not self._inflight
+            if idle:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.02)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def stats(self) -> Dict:
+        """
+        运行计数器
+
+        Returns:
+            {'source', 'queue_depth', 'pending', 'in_flight', 计数器..., 'latency': {...}}
+        """
+        with self._lock:
+            result = {
+                'source': self._source.kind if self._source else None,
+                'queue_depth': self._queue.qsize(),
+                'pending': len(self._pending),
+                'in_flight': len(self._inflight),
+                **self._counters,
+            }
+        result['latency'] = {name: counter.to_dict() for name, counter in self._latency.items()}
+        return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='监视文件夹，自动处理新增或修改的工作簿')
+    parser.add_argument('input_dir', nargs='?', default='data', help='监视的目录（默认 data）')
+    parser.add_argument('output_dir', nargs='?', default='output', help='报告输出目录（默认 output）')
+    parser.add_argument('--workers', type=int, default=2, help='工作线程数（默认 2）')
+    parser.add_argument('--queue-size', type=int, default=64, help='队列容量（默认 64）')
+    parser.add_argument('--debounce', type=float, default=1.0, help='防抖时间，秒（默认 1.0）')
+    parser.add_argument('--poll', action='store_true', help='强制使用轮询')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='轮询间隔，秒（默认 1.0）')
+    parser.add_argument('--area', type=float, default=1.0, help='处理单元面积 m²（默认 1.0）')
+    parser.add_argument('--stats-interval', type=float, default=60.0,
+                        help='输出计数器的间隔，秒（0 表示不输出）')
+    args = parser.parse_args(argv)
+
+    try:
+        watcher = FolderWatcher(args.input_dir, args.output_dir, workers=args.workers,
+                                queue_size=args.queue_size, debounce=args.debounce,
+                                poll_interval=args.poll_interval, use_inotify=not args.poll,
+                                area=args.area)
+    except ValueError as e:
+        parser.error(str(e))
+
+    watcher.start()
+    try:
+        while True:
+            time.sleep(args.stats_interval or 3600)
+            if args.stats_interval:
+                print(json.dumps(watcher.stats(), ensure_ascii=False), file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,253 @@
+"""
+短期 SLR 预测 - 指数平滑模型的增量状态
+
+对每个处理单元的 MLSS 和流量分别维护 Holt-Winters 加法模型（水平、阻尼趋势、
+可选的周期项），每来一个样本 O(1) 更新状态。预测时由 MLSS 和流量的预测值
+计算 SLR，并给出 SLR 离开安全范围（或最优区间）前的剩余时间。
+
+所有单元的状态保存在 numpy 数组中，每次更新、预测都是对全部单元的一次向量化
+运算，单核即可同时跟踪数百个单元。
+
+模型（x 为 MLSS 或流量，m 为周期长度，φ 为趋势阻尼系数）：
+    预测误差前：ŷ = L + φT + S[t-m]
+    L = α(x - S[t-m]) + (1 - α)(L + φT)
+    T = β(L - L_prev) + (1 - β)φT
+    S[t] = γ(x - L) + (1 - γ)S[t-m]
+    h 步预测：L + (φ + φ² + … + φ^h)T + S[t-m+h]
+
+样本缺失（NaN）时该变量按预测值推进一步，不更新趋势和周期项。
+
+使用示例：
+    forecaster = SLRForecaster(WastewaterCalculator(area=100), interval=300,
+                               season_length=288)   # 5 分钟采样，日周期
+    forecaster.update(['1#', '2#'], mlss=[3500, 3600], equivalent_flow=[100, 120])
+    result = forecaster.time_to_exit(horizon=36)      # 未来 3 小时
+    result['seconds_to_exit']
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from wastewater_treatment_calc import STATUS_CODES, WastewaterCalculator
+
+VARIABLES = ('mlss', 'equivalent_flow')
+
+
+class SLRForecaster:
+    """多单元 SLR 短期预测器"""
+
+    def __init__(self, calculator: WastewaterCalculator = None, interval: float = 300.0,
+                 alpha: float = 0.3, beta: float = 0.05, gamma: float = 0.1,
+                 phi: float = 0.98, season_length: int = 0,
+                 areas: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            calculator: 提供面积和安全范围的计算器，默认 WastewaterCalculator()
+            interval: 采样间隔（秒），预测步长与之相同
+            alpha: 水平平滑系数
+            beta: 趋势平滑系数
+            gamma: 周期项平滑系数（season_length 为 0 时不使用）
+            phi: 趋势阻尼系数，(0, 1]，越小长期预测越趋于平稳
+            season_length: 周期长度（样本数），0 表示无周期项
+            areas: 各单元面积 (m²)，未列出的单元使用计算器面积
+        """
+        for name, value in (('alpha', alpha), ('beta', beta), ('gamma', gamma)):
+            if not 0 <= value <= 1:
+                raise ValueError(f'{name} 必须在 [0, 1] 之间')
+        if not 0 < phi <= 1:
+            raise ValueError('phi 必须在 (0, 1] 之间')
+        if interval <= 0:
+            raise ValueError('interval 必须为正数')
+        if season_length < 0:
+            raise ValueError('season_length 不能为负数')
+
+        self.calculator = calculator or WastewaterCalculator(area=1.0)
+        self.interval = float(interval)
+        self.alpha, self.beta, self.gamma, self.phi = alpha, beta, gamma, phi
+        self.season_length = int(season_length)
+        self._areas = dict(areas or {})
+
+        self._index: Dict[str, int] = {}
+        self.unit_ids: List[str] = []
+        n_seasons = max(self.season_length, 1)
+        self.level = np.empty((len(VARIABLES), 0))
+        self.trend = np.empty((len(VARIABLES), 0))
+        self.season = np.empty((len(VARIABLES), 0, n_seasons))
+        self.initialized = np.empty((len(VARIABLES), 0), dtype=bool)
+        self.phase = np.empty(0, dtype=np.int64)
+        self.samples = np.empty(0, dtype=np.int64)
+        self.area = np.empty(0)
+
+    def __len__(self) -> int:
+        return len(self.unit_ids)
+
+    def _unit_indices(self, unit_ids) -> np.ndarray:
+        """单元编号 -> 状态数组下标，新单元自动登记"""
+        unit_ids = [str(u) for u in np.atleast_1d(np.asarray(unit_ids, dtype=object)).tolist()]
+        new = [u for u in dict.fromkeys(unit_ids) if u not in self._index]
+        if new:
+            for unit in new:
+                self._index[unit] = len(self.unit_ids)
+                self.unit_ids.append(unit)
+            k = len(new)
+            n_vars, n_seasons = len(VARIABLES), self.season.shape[2]
+            self.level = np.concatenate([self.level, np.zeros((n_vars, k))], axis=1)
+            self.trend = np.concatenate([self.trend, np.zeros((n_vars, k))], axis=1)
+            self.season = np.concatenate([self.season, np.zeros((n_vars, k, n_seasons))], axis=1)
+            self.initialized = np.concatenate(
+                [self.initialized, np.zeros((n_vars, k), dtype=bool)], axis=1)
+            self.phase = np.concatenate([self.phase, np.zeros(k, dtype=np.int64)])
+            self.samples = np.concatenate([self.samples, np.zeros(k, dtype=np.int64)])
+            self.area = np.concatenate(
+                [self.area, [float(self._areas.get(u, self.calculator.area)) for u in new]])
+        return np.array([self._index[u] for u in unit_ids], dtype=np.intp)
+
+    def update(self, unit_ids, mlss, equivalent_flow) -> None:
+        """
+        每个单元输入一个新样本并更新状态
+
+        Args:
+            unit_ids: 单元编号数组（同一次调用中不能重复）
+            mlss: MLSS 数组 (mg/L)，缺失为 NaN
+            equivalent_flow: 等效流量数组 (L/s)，缺失为 NaN
+        """
+        idx = self._unit_indices(unit_ids)
+        if len(np.unique(idx)) != len(idx):
+            raise ValueError('同一次更新中单元编号不能重复，请按时间分批调用')
+        n = len(idx)
+        values = np.stack([np.broadcast_to(np.asarray(mlss, dtype=np.float64), (n,)),
+                           np.broadcast_to(np.asarray(equivalent_flow, dtype=np.float64), (n,))])
+
+        a, b, g, phi = self.alpha, self.beta, self.gamma, self.phi
+        phase = self.phase[idx]
+        level = self.level[:, idx]
+        trend = self.trend[:, idx]
+        season = self.season[:, idx, phase] if self.season_length else np.zeros_like(level)
+        initialized = self.initialized[:, idx]
+        observed = np.isfinite(values)
+
+        projected = level + phi * trend
+        new_level = a * (values - season) + (1 - a) * projected
+        new_trend = b * (new_level - level) + (1 - b) * phi * trend
+        new_season = g * (values - new_level) + (1 - g) * season
+
+        # 首个样本直接作为水平；缺失样本按预测推进
+        first = observed & ~initialized
+        new_level = np.where(first, values, np.where(observed, new_level, projected))
+        new_trend = np.where(observed & initialized, new_trend, np.where(first, 0.0, phi * trend))
+        new_season = np.where(observed & initialized, new_season, season)
+
+        self.level[:, idx] = new_level
+        self.trend[:, idx] = new_trend
+        if self.season_length:
+            self.season[:, idx, phase] = new_season
+            self.phase[idx] = (phase + 1) % self.season_length
+        self.initialized[:, idx] = initialized | observed
+        self.samples[idx] += 1
+
+    def update_series(self, unit_id: str, mlss: Sequence[float],
+                      equivalent_flow: Sequence[float]) -> None:
+        """
+        按时间顺序输入单个单元的一段历史（用于预热）
+
+        Args:
+            unit_id: 单元编号
+            mlss: MLSS 序列
+            equivalent_flow: 等效流量序列（与 mlss 等长）
+        """
+        for m, f in zip(np.asarray(mlss, dtype=np.float64), np.asarray(equivalent_flow, dtype=np.float64)):
+            self.update([unit_id], m, f)
+
+    def forecast(self, horizon: int) -> Dict:
+        """
+        所有单元未来 horizon 步的预测
+
+        Args:
+            horizon: 预测步数
+
+        Returns:
+            {
+                'unit_ids': 单元编号列表,
+                'seconds': 各步距当前的秒数 (H,),
+                'mlss' / 'equivalent_flow' / 'slr': 预测值 (单元数, H)，未初始化的单元为 NaN,
+                'slr_status': SLR 状态编码 (单元数, H),
+            }
+        """
+        if horizon <= 0:
+            raise ValueError('horizon 必须为正整数')
+        steps = np.arange(1, horizon + 1)
+        # 阻尼趋势的累计系数 φ + φ² + … + φ^h
+        damping = np.cumsum(self.phi ** steps)
+
+        path = self.level[:, :, None] + self.trend[:, :, None] * damping
+        if self.season_length:
+            seasonal_idx = (self.phase[:, None] + steps - 1) % self.season_length
+            path = path + np.take_along_axis(self.season, seasonal_idx[None, :, :], axis=2)
+        path = np.where(self.initialized[:, :, None], path, np.nan)
+
+        mlss, flow = path
+        slr = self.calculator.calculate_slr_batch(mlss, flow) * self.calculator.area / self.area[:, None]
+        return {
+            'unit_ids': list(self.unit_ids),
+            'seconds': steps * self.interval,
+            'mlss': mlss,
+            'equivalent_flow': flow,
+            'slr': slr,
+            'slr_status': self.calculator.classify_batch('slr', slr),
+        }
+
+    def time_to_exit(self, horizon: int, band: str = 'safe') -> Dict:
+        """
+        预测 SLR 离开区间前的剩余时间
+
+        Args:
+            horizon: 预测步数
+            band: 'safe'（安全范围）或 'optimal'（最优区间）
+
+        Returns:
+            {
+                'unit_ids': 单元编号列表,
+                'current_slr': 当前水平对应的 SLR,
+                'exit_step': 首次越界的步数（1 起），当前已越界为 0，预测期内不越界为 -1,
+                'seconds_to_exit': 剩余秒数，不越界为 inf，未初始化为 NaN,
+                'exit_status': 越界方向的状态编码（too_low / too_high），不越界为 -1,
+            }
+        """
+        ranges = self.calculator.SAFETY_RANGES['slr']
+        if band == 'safe':
+            low, high = ranges['min'], ranges['max']
+        elif band == 'optimal':
+            low, high = ranges['optimal']
+        else:
+            raise ValueError(f'未知目标区间: {band}')
+
+        calc = self.calculator
+        # 当前平滑值：水平加上最近一个样本所在相位的周期项
+        smoothed = self.level
+        if self.season_length:
+            last = (self.phase - 1) % self.season_length
+            smoothed = smoothed + np.take_along_axis(self.season, last[None, :, None], axis=2)[:, :, 0]
+        current = calc.calculate_slr_batch(smoothed[0], smoothed[1]) * calc.area / self.area
+        current = np.where(self.initialized.all(axis=0), current, np.nan)
+        prediction = self.forecast(horizon)
+        slr = np.concatenate([current[:, None], prediction['slr']], axis=1)
+
+        outside = (slr < low) | (slr > high)
+        crossed = outside.any(axis=1)
+        exit_step = np.where(crossed, outside.argmax(axis=1), -1)
+
+        rows = np.arange(len(self))
+        exit_slr = slr[rows, np.maximum(exit_step, 0)]
+        exit_status = np.where(exit_slr < low, STATUS_CODES['too_low'], STATUS_CODES['too_high'])
+        exit_status = np.where(crossed, exit_status, -1).astype(np.int8)
+
+        seconds = np.where(crossed, exit_step * self.interval, np.inf)
+        seconds = np.where(np.isnan(current), np.nan, seconds)
+        return {
+            'unit_ids': prediction['unit_ids'],
+            'current_slr': current,
+            'exit_step': exit_step,
+            'seconds_to_exit': seconds,
+            'exit_status': exit_status,
+        }
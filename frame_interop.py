@@ -0,0 +1,237 @@
+"""
+pandas / Arrow 互操作 - 直接在列缓冲区上运行批量计算
+
+批量计算（check_operating_points）返回 numpy 列字典，generate_analysis_report 返回
+字符串化的行字典。本模块让分析人员直接在 DataFrame 或 Arrow 表上运行计算，得到
+带类型的列（SLR 为 float64，状态为分类类型），避免逐行重建 DataFrame：
+
+    - 输入列为 float64 且无缺失值时直接使用底层缓冲区（零拷贝），其他类型只转换一次；
+      缺失值所在的行按无效数据处理（状态为 'invalid'）
+    - 输出的数值列直接包装计算结果数组，状态列以 int8 编码构造分类类型（不展开为字符串）
+    - pandas 和 pyarrow 都是可选依赖，只在调用相应函数时需要
+
+使用示例：
+    import frame_interop
+
+    result = frame_interop.from_frame(df, calc, mlss='MLSS', flow='EQ')
+    result = df.wastewater.check(calc, mlss='MLSS', flow='EQ')   # DataFrame 访问器
+    table = frame_interop.from_arrow(arrow_table, calc)
+    report = frame_interop.analysis_frame(ExcelDataHandler('MLSS浓度表.xlsx'))
+"""
+
+from typing import Dict
+
+import numpy as np
+
+from wastewater_treatment_calc import STATUS_NAMES, WastewaterCalculator
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+STATUS_COLUMNS = ('mlss_status', 'flow_status', 'slr_status')
+ACCESSOR_NAME = 'wastewater'
+
+# 状态分类类型（所有结果共用同一个类型，便于拼接和比较）
+STATUS_DTYPE = pd.CategoricalDtype(list(STATUS_NAMES)) if pd is not None else None
+
+
+def _require_pandas() -> None:
+    if pd is None:
+        raise ImportError('DataFrame 互操作需要安装 pandas')
+
+
+def _require_arrow() -> None:
+    if pa is None:
+        raise ImportError('Arrow 互操作需要安装 pyarrow')
+
+
+def column_array(column) -> np.ndarray:
+    """
+    把 Series、Arrow 数组或序列转换为 float64 numpy 数组
+
+    float64 且无缺失值的列直接返回底层缓冲区的视图（只读，不复制）；
+    其他类型转换一次，缺失值转为 NaN。
+    """
+    if pa is not None and isinstance(column, (pa.Array, pa.ChunkedArray)):
+        if isinstance(column, pa.ChunkedArray):
+            column = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+        if not pa.types.is_float64(column.type):
+            column = column.cast(pa.float64())
+        if column.null_count:
+            column = column.fill_null(np.nan)
+        return column.to_numpy(zero_copy_only=False)
+    if pd is not None and isinstance(column, pd.Series):
+        if column.dtype == np.float64:
+            return column.to_numpy(copy=False)
+        return column.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.asarray(column, dtype=np.float64)
+
+
+def check_columns(mlss, flow, calculator: WastewaterCalculator = None,
+                  valid=None) -> Dict[str, np.ndarray]:
+    """
+    在列缓冲区上运行 check_operating_points
+
+    Args:
+        mlss: MLSS 列 (mg/L)，Series、Arrow 数组或序列
+        flow: 等效流量列 (L/s)
+        calculator: 计算器，默认 WastewaterCalculator()
+        valid: 数据质量掩码（可选）；缺失值所在的行总是视为无效
+
+    Returns:
+        check_operating_points 的列式结果
+    """
+    calculator = calculator or WastewaterCalculator(area=1.0)
+    mlss = column_array(mlss)
+    flow = column_array(flow)
+    missing = np.isnan(mlss) | np.isnan(flow)
+    if valid is not None:
+        valid = np.asarray(valid.to_numpy() if hasattr(valid, 'to_numpy') else valid, dtype=bool)
+        valid = valid & ~missing
+    elif missing.any():
+        valid = ~missing
+    return calculator.check_operating_points(mlss, flow, valid=valid)
+
+
+def to_frame(result: Dict[str, np.ndarray], index=None, categorical: bool = True):
+    """
+    批量结果转为 DataFrame
+
+    Args:
+        result: check_operating_points（或同结构）的结果
+        index: DataFrame 索引（可选）
+        categorical: 状态列转为分类类型；False 时保留 int8 编码
+
+    Returns:
+        DataFrame，数值列直接包装结果数组
+    """
+    _require_pandas()
+    columns = {}
+    for name, values in result.items():
+        values = np.asarray(values)
+        if values.ndim != 1:
+            continue
+        if categorical and name in STATUS_COLUMNS:
+            values = pd.Categorical.from_codes(values, dtype=STATUS_DTYPE)
+        columns[name] = values
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+def from_frame(df, calculator: WastewaterCalculator = None, mlss: str = 'mlss',
+               flow: str = 'equivalent_flow', valid: str = None, categorical: bool = True):
+    """
+    对 DataFrame 的列运行批量计算
+
+    Args:
+        df: 输入 DataFrame
+        calculator: 计算器，默认 WastewaterCalculator()
+        mlss: MLSS 列名
+        flow: 等效流量列名
+        valid: 数据质量掩码列名（可选）
+        categorical: 状态列转为分类类型
+
+    Returns:
+        结果 DataFrame，索引与输入相同
+    """
+    _require_pandas()
+    for name in (mlss, flow) + ((valid,) if valid else ()):
+        if name not in df.columns:
+            raise KeyError(f'缺少列: {name}')
+    result = check_columns(df[mlss], df[flow], calculator,
+                           valid=df[valid] if valid else None)
+    return to_frame(result, index=df.index, categorical=categorical)
+
+
+def to_arrow(result: Dict[str, np.ndarray], categorical: bool = True):
+    """
+    批量结果转为 Arrow 表
+
+    数值列由 numpy 缓冲区直接构造（不复制），状态列为以 int8 编码为索引的字典数组。
+    """
+    _require_arrow()
+    dictionary = pa.array(list(STATUS_NAMES))
+    columns = {}
+    for name, values in result.items():
+        values = np.asarray(values)
+        if values.ndim != 1:
+            continue
+        if categorical and name in STATUS_COLUMNS:
+            columns[name] = pa.DictionaryArray.from_arrays(pa.array(values), dictionary)
+        else:
+            columns[name] = pa.array(values)
+    return pa.table(columns)
+
+
+def from_arrow(table, calculator: WastewaterCalculator = None, mlss: str = 'mlss',
+               flow: str = 'equivalent_flow', valid: str = None, categorical: bool = True):
+    """
+    对 Arrow 表的列运行批量计算
+
+    Args:
+        table: pyarrow.Table 或 RecordBatch
+        calculator: 计算器，默认 WastewaterCalculator()
+        mlss: MLSS 列名
+        flow: 等效流量列名
+        valid: 数据质量掩码列名（可选）
+        categorical: 状态列转为字典数组
+
+    Returns:
+        结果 Arrow 表
+    """
+    _require_arrow()
+    names = table.schema.names
+    for name in (mlss, flow) + ((valid,) if valid else ()):
+        if name not in names:
+            raise KeyError(f'缺少列: {name}')
+    mask = None
+    if valid:
+        mask = table.column(valid).to_numpy(zero_copy_only=False)
+    result = check_columns(table.column(mlss), table.column(flow), calculator, valid=mask)
+    return to_arrow(result, categorical=categorical)
+
+
+def analysis_frame(handler, categorical: bool = True):
+    """
+    MLSS 浓度表分析结果的 DataFrame（generate_analysis_report 的带类型版本）
+
+    Args:
+        handler: 已加载浓度表的 ExcelDataHandler
+        categorical: 状态列转为分类类型
+
+    Returns:
+        DataFrame，另含表格中的 SLR 列 'table_slr'（float64）
+    """
+    _require_pandas()
+    columns = handler.analysis_columns()
+    if columns is None:
+        raise ValueError('无法解析 MLSS 浓度表')
+    return to_frame(columns, categorical=categorical)
+
+
+if pd is not None:
+    @pd.api.extensions.register_dataframe_accessor(ACCESSOR_NAME)
+    class WastewaterAccessor:
+        """DataFrame 访问器：df.wastewater.check(...) / df.wastewater.slr(...)"""
+
+        def __init__(self, df):
+            self._df = df
+
+        def check(self, calculator: WastewaterCalculator = None, mlss: str = 'mlss',
+                  flow: str = 'equivalent_flow', valid: str = None, categorical: bool = True):
+            """批量检查，参数同 from_frame"""
+            return from_frame(self._df, calculator, mlss, flow, valid, categorical)
+
+        def slr(self, calculator: WastewaterCalculator = None, mlss: str = 'mlss',
+                flow: str = 'equivalent_flow'):
+            """只计算 SLR，返回 float64 Series"""
+            calculator = calculator or WastewaterCalculator(area=1.0)
+            values = calculator.calculate_slr_batch(column_array(self._df[mlss]),
+                                                    column_array(self._df[flow]))
+            return pd.Series(values, index=self._df.index, name='calculated_slr', copy=False)
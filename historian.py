@@ -0,0 +1,335 @@
+"""
+运行点历史库 - 只追加的内存映射列式存储
+
+每一列保存为一个定长二进制文件（小端序），通过 numpy.memmap 零拷贝读取：
+
+    <目录>/
+        meta.json           # 结构版本、列定义、已提交行数、单元编号表
+        timestamp.bin       # int64，Unix 时间戳（秒，UTC）
+        unit.bin            # int16，单元编号在 meta.json 'units' 中的下标
+        mlss.bin            # float32，mg/L
+        equivalent_flow.bin # float32，L/s
+        slr.bin             # float32，kg/h/m²
+        mlss_status.bin     # int8，状态编码（见 STATUS_NAMES）
+        flow_status.bin     # int8
+        slr_status.bin      # int8
+        overall_safe.bin    # int8，1 为安全
+
+配置了传感器质量预检（SensorQualityFilter）时，异常读数的状态记为 'invalid'，
+overall_safe 为 0，重新检查时同样排除。
+
+时间戳要求全局非递减，因此按时间范围查询只需对时间戳列做二分查找。
+追加时先写列文件，再原子替换 meta.json 中的行数；中途崩溃留下的尾部数据
+在下次打开时被截断，已提交的数据不受影响。仅支持单个写入进程。
+
+使用示例：
+    store = OperatingHistorian('history/')
+    store.append(timestamps, '1#', mlss, flow)
+    data = store.read('2024-01-01', '2024-02-01', unit='1#')
+    check = store.revalidate('2024-01-01', '2024-02-01')
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from wastewater_treatment_calc import STATUS_CODES, WastewaterCalculator
+
+SCHEMA_VERSION = 1
+
+# 列名 -> 定长数据类型
+COLUMNS = {
+    'timestamp': '<i8',
+    'unit': '<i2',
+    'mlss': '<f4',
+    'equivalent_flow': '<f4',
+    'slr': '<f4',
+    'mlss_status': 'i1',
+    'flow_status': 'i1',
+    'slr_status': 'i1',
+    'overall_safe': 'i1',
+}
+
+META_FILE = 'meta.json'
+
+
+def to_epoch_seconds(values) -> np.ndarray:
+    """
+    转换为 Unix 时间戳（秒）
+
+    Args:
+        values: 整数时间戳、numpy datetime64、datetime 对象或 ISO 格式字符串
+                （无时区信息的时间按 UTC 处理）
+
+    Returns:
+        int64 数组
+    """
+    arr = np.asarray(values)
+    if arr.dtype.kind in 'iu':
+        return arr.astype(np.int64)
+    if arr.dtype.kind != 'M':
+        arr = arr.astype('datetime64[s]')
+    return arr.astype('datetime64[s]').astype(np.int64)
+
+
+class OperatingHistorian:
+    """只追加的运行点历史库"""
+
+    def __init__(self, path: str, calculator: WastewaterCalculator = None, create: bool = True,
+                 quality_filter=None):
+        """
+        打开或创建历史库
+
+        Args:
+            path: 历史库目录
+            calculator: 追加时计算 SLR 和状态所用的计算器，默认 WastewaterCalculator()
+            create: 目录不存在时是否创建
+            quality_filter: 追加前的传感器质量预检（SensorQualityFilter），默认不检查
+        """
+        self.path = Path(path)
+        self.calculator = calculator or WastewaterCalculator(area=1.0)
+        self.quality_filter = quality_filter
+        self._maps = {}
+
+        if not (self.path / META_FILE).exists():
+            if not create:
+                raise FileNotFoundError(f'历史库不存在: {self.path}')
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._meta = {'schema_version': SCHEMA_VERSION, 'columns': COLUMNS,
+                          'rows': 0, 'units': []}
+            for name in COLUMNS:
+                (self.path / f'{name}.bin').touch()
+            self._write_meta()
+        else:
+            self._meta = self._read_meta()
+            self._truncate_uncommitted()
+
+        self._unit_codes = {unit: code for code, unit in enumerate(self._meta['units'])}
+
+    # ------------------------------------------------------------------
+    # 元数据
+    # ------------------------------------------------------------------
+
+    def _read_meta(self) -> dict:
+        with open(self.path / META_FILE, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('schema_version') != SCHEMA_VERSION:
+            raise ValueError(f"不支持的历史库结构版本: {meta.get('schema_version')}")
+        if meta.get('columns') != COLUMNS:
+            raise ValueError('历史库列定义与当前版本不一致')
+        return meta
+
+    def _write_meta(self) -> None:
+        tmp = self.path / (META_FILE + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._meta, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path / META_FILE)
+
+    def _truncate_uncommitted(self) -> None:
+        """截断未提交的尾部数据（上次追加中途失败时留下）"""
+        rows = self._meta['rows']
+        for name, dtype in COLUMNS.items():
+            column_file = self.path / f'{name}.bin'
+            size = rows * np.dtype(dtype).itemsize
+            if column_file.stat().st_size > size:
+                with open(column_file, 'r+b') as f:
+                    f.truncate(size)
+
+    def refresh(self) -> None:
+        """重新读取 meta.json（其他进程追加数据后调用）"""
+        self._meta = self._read_meta()
+        self._unit_codes = {unit: code for code, unit in enumerate(self._meta['units'])}
+        self._maps.clear()
+
+    def __len__(self) -> int:
+        return self._meta['rows']
+
+    @property
+    def units(self) -> List[str]:
+        """已登记的单元编号"""
+        return list(self._meta['units'])
+
+    def unit_code(self, unit_id: str) -> int:
+        """单元编号对应的 int16 编码"""
+        try:
+            return self._unit_codes[unit_id]
+        except KeyError:
+            raise KeyError(f'未知处理单元: {unit_id}')
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def append(self, timestamps, unit_ids, mlss, equivalent_flow) -> int:
+        """
+        追加运行点，SLR 和状态由计算器批量计算后一并保存
+
+        Args:
+            timestamps: 时间戳数组（见 to_epoch_seconds），须不早于已有数据
+            unit_ids: 单元编号（单个字符串或与数据等长的数组）
+            mlss: MLSS 数组 (mg/L)
+            equivalent_flow: 等效流量数组 (L/s)
+
+        Returns:
+            追加后的总行数
+        """
+        timestamps = np.atleast_1d(to_epoch_seconds(timestamps))
+        n = len(timestamps)
+        mlss = np.broadcast_to(np.asarray(mlss, dtype=np.float64), (n,))
+        equivalent_flow = np.broadcast_to(np.asarray(equivalent_flow, dtype=np.float64), (n,))
+        unit_names = np.broadcast_to(np.asarray(unit_ids, dtype=object), (n,))
+        if n == 0:
+            return len(self)
+
+        # 批内按时间稳定排序，并保证不早于已有数据
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+        if len(self) and timestamps[0] < self._last_timestamp():
+            raise ValueError('时间戳早于历史库中已有的数据，历史库只支持按时间追加')
+
+        # 质量预检会推进各传感器的状态，写入失败时恢复到检查前
+        quality_state = None if self.quality_filter is None else self.quality_filter.snapshot()
+        try:
+            valid = None
+            if self.quality_filter is not None:
+                valid = self.quality_filter.check(unit_names[order], timestamps,
+                                                  mlss=mlss[order],
+                                                  equivalent_flow=equivalent_flow[order])['valid']
+            check = self.calculator.check_operating_points(mlss[order], equivalent_flow[order],
+                                                           valid=valid)
+            columns = {
+                'timestamp': timestamps,
+                'mlss': check['mlss'],
+                'equivalent_flow': check['equivalent_flow'],
+                'slr': check['calculated_slr'],
+                'mlss_status': check['mlss_status'],
+                'flow_status': check['flow_status'],
+                'slr_status': check['slr_status'],
+                'overall_safe': check['overall_safe'],
+            }
+
+            # 新单元在校验通过后才登记；写入失败时 refresh() 一并撤销登记
+            columns['unit'] = np.broadcast_to(self._encode_units(unit_ids), (n,))[order]
+            for name, dtype in COLUMNS.items():
+                with open(self.path / f'{name}.bin', 'ab') as f:
+                    f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._meta['rows'] += n
+            self._write_meta()
+        except BaseException:
+            if quality_state is not None:
+                self.quality_filter.restore(quality_state)
+            self.refresh()
+            self._truncate_uncommitted()
+            raise
+        self._maps.clear()
+        return len(self)
+
+    def _encode_units(self, unit_ids) -> np.ndarray:
+        unit_ids = np.asarray(unit_ids, dtype=object)
+        uniques = unit_ids.ravel().tolist() if unit_ids.ndim else [unit_ids.item()]
+        for unit in dict.fromkeys(uniques):
+            if unit not in self._unit_codes:
+                if len(self._meta['units']) >= np.iinfo(np.int16).max:
+                    raise ValueError('处理单元数量超出上限')
+                self._unit_codes[unit] = len(self._meta['units'])
+                self._meta['units'].append(unit)
+        if unit_ids.ndim == 0:
+            return np.int16(self._unit_codes[unit_ids.item()])
+        return np.array([self._unit_codes[u] for u in unit_ids.tolist()], dtype=np.int16)
+
+    def _last_timestamp(self) -> int:
+        return int(self.column('timestamp')[-1])
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        整列的只读内存映射视图（零拷贝）
+
+        Args:
+            name: 列名（见 COLUMNS）
+        """
+        dtype = COLUMNS.get(name)
+        if dtype is None:
+            raise KeyError(f'未知列: {name}')
+        rows = len(self)
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        view = self._maps.get(name)
+        if view is None:
+            view = np.memmap(self.path / f'{name}.bin', dtype=dtype, mode='r', shape=(rows,))
+            self._maps[name] = view
+        return view
+
+    def time_range(self, start=None, end=None) -> slice:
+        """
+        时间范围 [start, end) 对应的行切片（二分查找）
+
+        Args:
+            start: 起始时间（含），None 表示不限
+            end: 结束时间（不含），None 表示不限
+        """
+        ts = self.column('timestamp')
+        lo = 0 if start is None else int(np.searchsorted(ts, to_epoch_seconds(start), side='left'))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, to_epoch_seconds(end), side='left'))
+        return slice(lo, max(lo, hi))
+
+    def read(self, start=None, end=None, columns: Optional[List[str]] = None,
+             unit: str = None) -> Dict[str, np.ndarray]:
+        """
+        读取时间范围内的数据
+
+        不指定 unit 时返回内存映射切片（零拷贝）；指定 unit 时按掩码筛选（会复制）。
+
+        Args:
+            start: 起始时间（含）
+            end: 结束时间（不含）
+            columns: 要读取的列，默认全部
+            unit: 只读取该单元的数据
+
+        Returns:
+            {列名: 数组}
+        """
+        rows = self.time_range(start, end)
+        names = list(columns) if columns else list(COLUMNS)
+        data = {name: self.column(name)[rows] for name in names}
+        if unit is not None:
+            mask = self.column('unit')[rows] == self.unit_code(unit)
+            data = {name: values[mask] for name, values in data.items()}
+        return data
+
+    def revalidate(self, start=None, end=None, unit: str = None,
+                   calculator: WastewaterCalculator = None) -> Dict[str, np.ndarray]:
+        """
+        直接对历史数据重新批量检查（如安全范围或面积调整后）
+
+        追加时被质量预检判为无效的行仍保持无效。
+
+        Args:
+            start: 起始时间（含）
+            end: 结束时间（不含）
+            unit: 只检查该单元
+            calculator: 使用的计算器，默认为历史库的计算器
+
+        Returns:
+            check_operating_points 的结果，另含 'timestamp' 和 'unit' 列
+        """
+        calculator = calculator or self.calculator
+        data = self.read(start, end,
+                         columns=['timestamp', 'unit', 'mlss', 'equivalent_flow', 'slr_status'],
+                         unit=unit)
+        result = calculator.check_operating_points(
+            data['mlss'], data['equivalent_flow'],
+            valid=data['slr_status'] != STATUS_CODES['invalid'])
+        result['timestamp'] = data['timestamp']
+        result['unit'] = data['unit']
+        return result
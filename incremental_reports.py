@@ -0,0 +1,272 @@
+"""
+报告增量更新 - 按行输入指纹只重算、只改写变化的行
+
+每次增量生成报告时，在报告旁写一个指纹文件（<报告>.fingerprints.json），记录：
+    - 报告类型和上下文指纹（计算器面积、安全范围等影响所有行的参数）
+    - 每个工作表每一行输入的指纹（按行顺序）
+    - 报告文件写入后的修改时间和大小
+
+下次增量生成时逐行比较指纹：只有输入变化的行被重算并写回原工作簿，新增的行追加在
+末尾，多出的行被删除。上下文变化、指纹文件缺失或报告被其他程序改动过时，整体重新生成。
+
+修补直接改写压缩包中工作表的 XML：未变化的行原样复制，变化的行按原单元格样式重新生成，
+其他部件（样式、列宽、条件格式）不经 openpyxl 解析。解压/重新压缩的耗时与文件大小成正比，
+因此先用 estimate_patch_seconds / estimate_rebuild_seconds 估算，修补不比整体重新生成
+（openpyxl 写入每个单元格）更快时直接重新生成。
+
+使用示例：
+    handler.create_comparison_excel('对比.xlsx', variations, incremental=True)
+    handler.generate_analysis_report('分析报告.xlsx', incremental=True)
+"""
+
+import hashlib
+import json
+import math
+import numbers
+import os
+import re
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+FINGERPRINT_VERSION = 1
+SIDECAR_SUFFIX = '.fingerprints.json'
+
+# 耗时估算系数（秒），按 221×171 点的分析报告（约 26 万个单元格、1 MB）实测后取整：
+# 修补 = 读取并重新压缩整个文件 + 生成变化的单元格；重新生成 = openpyxl 写入每个单元格
+PATCH_SECONDS_PER_BYTE = 5e-7
+PATCH_SECONDS_PER_CELL = 2e-6
+REBUILD_SECONDS_PER_CELL = 1.5e-5
+
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_ROW = re.compile(rb'<row\b[^>]*?(?:/>|>.*?</row>)', re.S)
+_CELL = re.compile(rb'<c\b[^>]*?(?:/>|>.*?</c>)', re.S)
+_ROW_NUMBER = re.compile(rb'\br="(\d+)"')
+_CELL_COLUMN = re.compile(rb'\br="([A-Z]+)\d+"')
+_CELL_STYLE = re.compile(rb'\bs="(\d+)"')
+_DIMENSION = re.compile(rb'(<dimension ref="[A-Z]+\d+:[A-Z]+)\d+(")')
+
+
+def fingerprint(value) -> str:
+    """任意可 repr 的值的短指纹（16 位十六进制）"""
+    return hashlib.blake2b(repr(value).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def row_fingerprints(rows: Iterable[tuple]) -> List[str]:
+    """每行输入的指纹列表"""
+    return [fingerprint(row) for row in rows]
+
+
+def context_fingerprint(calculator, **extra) -> str:
+    """
+    影响所有行的上下文指纹
+
+    Args:
+        calculator: 计算器（面积和安全范围）
+        **extra: 其他影响所有行的参数
+    """
+    payload = json.dumps({'area': calculator.area, 'ranges': calculator.SAFETY_RANGES,
+                          'extra': extra}, sort_keys=True, ensure_ascii=False, default=str)
+    return fingerprint(payload)
+
+
+def sidecar_path(report_file) -> Path:
+    """报告对应的指纹文件路径"""
+    return Path(str(report_file) + SIDECAR_SUFFIX)
+
+
+def _file_signature(path) -> Optional[list]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def load_sidecar(report_file, kind: str, context: str) -> Optional[Dict[str, List[str]]]:
+    """
+    读取可用于增量更新的行指纹
+
+    Returns:
+        {工作表: 行指纹列表}；指纹文件缺失、版本/类型/上下文不符或报告已被改动时为 None
+    """
+    signature = _file_signature(report_file)
+    if signature is None:
+        return None
+    try:
+        with open(sidecar_path(report_file), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if (data.get('version') != FINGERPRINT_VERSION or data.get('kind') != kind
+            or data.get('context') != context or data.get('file') != signature):
+        return None
+    return data.get('sections')
+
+
+def save_sidecar(report_file, kind: str, context: str, sections: Dict[str, List[str]]) -> None:
+    """报告写出后保存行指纹（原子替换）"""
+    path = sidecar_path(report_file)
+    tmp = path.with_name(path.name + '.tmp')
+    data = {
+        'version': FINGERPRINT_VERSION,
+        'kind': kind,
+        'context': context,
+        'file': _file_signature(report_file),
+        'sections': sections,
+    }
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def changed_rows(old: Sequence[str], new: Sequence[str]) -> List[int]:
+    """按位置比较，返回需要重写的行下标（含新增的行）"""
+    n_old = len(old)
+    return [i for i, fp in enumerate(new) if i >= n_old or old[i] != fp]
+
+
+def estimate_patch_seconds(report_file, changed_cells: int) -> float:
+    """估算修补报告的耗时（秒）"""
+    size = _file_signature(report_file)
+    return ((size[1] if size else 0) * PATCH_SECONDS_PER_BYTE
+            + changed_cells * PATCH_SECONDS_PER_CELL)
+
+
+def estimate_rebuild_seconds(total_cells: int) -> float:
+    """估算整体重新生成报告的耗时（秒）"""
+    return total_cells * REBUILD_SECONDS_PER_CELL
+
+
+def patch_workbook(report_file, patches: Sequence[tuple]) -> bool:
+    """
+    直接改写工作表 XML 修补数据行（原子替换报告文件）
+
+    Args:
+        report_file: 报告路径
+        patches: 每个工作表一项
+            (工作表序号, 第一条数据的行号, 变化行下标, 对应的新行值列表, 原数据行数, 新数据行数)
+
+    Returns:
+        是否已修补；工作表结构无法原地修补（数据区后还有其他行而行数变化、
+        新数据为空等）时返回 False 且不改动文件，调用方应整体重新生成
+    """
+    report_file = str(report_file)
+    with zipfile.ZipFile(report_file) as zin:
+        sheets = _sheet_paths(zin)
+        parts = {}
+        for sheet_index, first_row, changed, values, old_count, new_count in patches:
+            if sheet_index >= len(sheets):
+                return False
+            name = sheets[sheet_index]
+            xml = _patch_sheet(zin.read(name), first_row, dict(zip(changed, values)),
+                               old_count, new_count)
+            if xml is None:
+                return False
+            parts[name] = xml
+
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(report_file)))
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(tmp, 'w') as zout:
+                for info in zin.infolist():
+                    data = parts.get(info.filename)
+                    zout.writestr(info, data if data is not None else zin.read(info.filename))
+            os.chmod(tmp, os.stat(report_file).st_mode & 0o777)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    os.replace(tmp, report_file)
+    return True
+
+
+def _sheet_paths(zf: zipfile.ZipFile) -> List[str]:
+    """按工作簿顺序返回各工作表 XML 在压缩包中的路径"""
+    rels = ElementTree.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+    targets = {rel.get('Id'): rel.get('Target') for rel in rels}
+    book = ElementTree.fromstring(zf.read('xl/workbook.xml'))
+    paths = []
+    for sheet in book.iter(f'{{{_MAIN_NS}}}sheet'):
+        target = targets[sheet.get(f'{{{_REL_NS}}}id')]
+        paths.append(target.lstrip('/') if target.startswith('/') else 'xl/' + target)
+    return paths
+
+
+def _patch_sheet(xml: bytes, first_row: int, new_rows: Dict[int, Sequence], old_count: int,
+                 new_count: int) -> Optional[bytes]:
+    """修补一个工作表的 XML；无法原地修补时返回 None"""
+    start = xml.find(b'<sheetData>')
+    end = xml.find(b'</sheetData>')
+    if start < 0 or end < 0 or new_count == 0:
+        return None
+    start += len(b'<sheetData>')
+    last_old = first_row + old_count - 1
+
+    head, data, tail = [], {}, []
+    for match in _ROW.finditer(xml, start, end):
+        row = match.group(0)
+        number = int(_ROW_NUMBER.search(row).group(1))
+        if number < first_row:
+            head.append(row)
+        elif number <= last_old:
+            data[number - first_row] = row
+        else:
+            tail.append(row)
+    if tail and new_count != old_count:
+        return None
+
+    template = data.get(old_count - 1)
+    out = head
+    for idx in range(new_count):
+        if idx in new_rows:
+            out.append(_row_xml(first_row + idx, new_rows[idx], data.get(idx, template)))
+        elif idx in data:
+            out.append(data[idx])
+    out.extend(tail)
+    xml = xml[:start] + b''.join(out) + xml[end:]
+
+    if new_count != old_count:
+        new_last = first_row + new_count - 1
+        xml = _DIMENSION.sub(lambda m: m.group(1) + str(new_last).encode() + m.group(2), xml,
+                             count=1)
+        # 覆盖整个数据区的条件格式范围随行数伸缩
+        xml = re.sub(rb'(sqref="[A-Z]+%d:[A-Z]+)%d"' % (first_row, last_old),
+                     rb'\g<1>%d"' % new_last, xml)
+    return xml
+
+
+def _row_xml(number: int, values: Sequence, original: Optional[bytes]) -> bytes:
+    """生成一行的 XML，沿用原行各列的单元格样式"""
+    styles = {}
+    for cell in _CELL.finditer(original or b''):
+        column = _CELL_COLUMN.search(cell.group(0))
+        style = _CELL_STYLE.search(cell.group(0))
+        if column and style:
+            styles[column_index_from_string(column.group(1).decode())] = style.group(1)
+
+    cells = []
+    for col in range(1, max([len(values), *styles]) + 1):
+        value = values[col - 1] if col <= len(values) else None
+        cells.append(_cell_xml(f'{get_column_letter(col)}{number}', value, styles.get(col)))
+    return b'<row r="%d">%s</row>' % (number, b''.join(cells))
+
+
+def _cell_xml(ref: str, value, style: Optional[bytes]) -> bytes:
+    """生成一个单元格的 XML（字符串写为内联字符串）"""
+    attrs = f'r="{ref}"'.encode() + (b' s="%s"' % style if style else b'')
+    if value is None:
+        return b'<c %s/>' % attrs if style else b''
+    if isinstance(value, bool):
+        return b'<c %s t="b"><v>%d</v></c>' % (attrs, value)
+    if isinstance(value, numbers.Real) and math.isfinite(value):
+        text = str(int(value)) if isinstance(value, numbers.Integral) else repr(float(value))
+        return b'<c %s t="n"><v>%s</v></c>' % (attrs, text.encode())
+    text = escape(str(value))
+    space = ' xml:space="preserve"' if text != text.strip() else ''
+    return f'<c {attrs.decode()} t="inlineStr"><is><t{space}>{text}</t></is></c>'.encode('utf-8')
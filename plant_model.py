@@ -0,0 +1,232 @@
+"""
+污泥处理厂拓扑模型 - 多个并联沉淀池的流量分配
+
+全厂进水按分配比例或堰长（同一堰顶高程下，溢流量与堰长成正比）分配到
+并联的各处理单元，停运单元的份额按比例转移给其余在运单元。
+在全厂流量和 MLSS 给定时，一次向量化计算得到每个单元的流量、SLR 和状态。
+
+使用示例：
+    plant = PlantModel([
+        ClarifierUnit('1#', area=20.0),
+        ClarifierUnit('2#', area=20.0),
+        ClarifierUnit('3#', area=25.0),
+    ])
+    result = plant.evaluate(plant_flow=300, mlss=3500)
+    plant.take_offline('3#')
+    result = plant.evaluate(plant_flow=300, mlss=3500)
+"""
+
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from wastewater_treatment_calc import WastewaterCalculator
+
+
+@dataclass
+class ClarifierUnit:
+    """处理单元（沉淀池）定义"""
+    unit_id: str
+    area: float  # m²
+    split_ratio: Optional[float] = None  # 固定分配比例（相对值）
+    weir_length: Optional[float] = None  # 出水堰长度 (m)，按堰长比例分配
+    in_service: bool = True
+
+    @property
+    def split_mode(self) -> str:
+        """分配方式：'ratio'、'weir' 或 'area'（未指定时按面积分配）"""
+        if self.split_ratio is not None:
+            return 'ratio'
+        if self.weir_length is not None:
+            return 'weir'
+        return 'area'
+
+    @property
+    def split_weight(self) -> float:
+        """分配权重"""
+        if self.split_ratio is not None:
+            return self.split_ratio
+        if self.weir_length is not None:
+            return self.weir_length
+        return self.area
+
+
+class PlantModel:
+    """并联处理单元组成的污泥处理厂模型"""
+
+    def __init__(self, units: List[ClarifierUnit], calculator: WastewaterCalculator = None):
+        """
+        初始化模型
+
+        Args:
+            units: 处理单元列表，所有单元需使用同一种分配方式
+            calculator: 提供安全范围的计算器，默认 WastewaterCalculator()
+        """
+        if not units:
+            raise ValueError('至少需要一个处理单元')
+
+        unit_ids = [unit.unit_id for unit in units]
+        if len(set(unit_ids)) != len(unit_ids):
+            raise ValueError('处理单元编号重复')
+
+        modes = {unit.split_mode for unit in units}
+        if len(modes) > 1:
+            raise ValueError(f'所有处理单元必须使用同一种分配方式: {sorted(modes)}')
+
+        for unit in units:
+            if unit.area <= 0:
+                raise ValueError(f'处理单元 {unit.unit_id} 面积必须为正数')
+            if unit.split_weight < 0:
+                raise ValueError(f'处理单元 {unit.unit_id} 分配权重不能为负数')
+
+        # 复制单元定义，停运 / 恢复只改变模型自己的副本，不影响调用方的对象
+        self.units = [replace(unit) for unit in units]
+        self.calculator = calculator or WastewaterCalculator(area=1.0)
+        self._index = {unit_id: i for i, unit_id in enumerate(unit_ids)}
+
+        self.areas = np.array([unit.area for unit in units], dtype=np.float64)
+        self._weights = np.array([unit.split_weight for unit in units], dtype=np.float64)
+        self.in_service = np.array([unit.in_service for unit in units], dtype=bool)
+        self._update_shares()
+
+    @property
+    def unit_ids(self) -> List[str]:
+        """处理单元编号列表"""
+        return [unit.unit_id for unit in self.units]
+
+    @property
+    def shares(self) -> np.ndarray:
+        """各单元当前的流量份额（停运单元为 0，在运单元之和为 1）"""
+        return self._shares
+
+    def _update_shares(self) -> None:
+        self._shares = self.shares_for(self.in_service)
+
+    def shares_for(self, in_service) -> np.ndarray:
+        """
+        给定运行状态下的流量份额
+
+        Args:
+            in_service: bool 数组，形状为 (..., 单元数)，可按行给出多种停运组合
+
+        Returns:
+            份额数组，形状与 in_service 相同（全部停运的行为 0）
+        """
+        weights = np.where(in_service, self._weights, 0.0)
+        total = weights.sum(axis=-1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(total > 0, weights / total, 0.0)
+
+    def set_in_service(self, unit_id: str, in_service: bool) -> None:
+        """
+        设置单元运行状态，并重新计算流量份额
+
+        Args:
+            unit_id: 处理单元编号
+            in_service: True 为在运，False 为停运
+        """
+        idx = self._index.get(unit_id)
+        if idx is None:
+            raise KeyError(f'未知处理单元: {unit_id}')
+        self.units[idx].in_service = in_service
+        self.in_service[idx] = in_service
+        self._update_shares()
+
+    def take_offline(self, unit_id: str) -> None:
+        """停运单元"""
+        self.set_in_service(unit_id, False)
+
+    def bring_online(self, unit_id: str) -> None:
+        """恢复单元运行"""
+        self.set_in_service(unit_id, True)
+
+    def split_flow(self, plant_flow) -> np.ndarray:
+        """
+        将全厂流量分配到各单元
+
+        Args:
+            plant_flow: 全厂流量 (L/s)，标量或形状为 (T,) 的数组
+
+        Returns:
+            各单元流量，形状为 (..., 单元数)
+        """
+        if not self.in_service.any():
+            raise ValueError('没有在运的处理单元')
+        plant_flow = np.asarray(plant_flow, dtype=np.float64)
+        return plant_flow[..., None] * self._shares
+
+    def evaluate(self, plant_flow, mlss, in_service=None) -> Dict:
+        """
+        一次计算所有单元的流量、SLR 和状态
+
+        Args:
+            plant_flow: 全厂流量 (L/s)，标量或数组
+            mlss: MLSS (mg/L)，标量或与 plant_flow 形状相同的数组
+            in_service: 覆盖当前运行状态的 bool 数组，形状为 (..., 单元数)，
+                        可为每个全厂流量给出不同的停运组合（默认使用当前状态）
+
+        Returns:
+            列式结果字典（单元相关的数组最后一维为单元）：
+                {
+                    'unit_ids': 单元编号列表,
+                    'in_service': bool 数组 (..., 单元数),
+                    'unit_flow': 各单元流量,
+                    'slr': 各单元 SLR,
+                    'mlss_status' / 'flow_status' / 'slr_status': int8 状态编码,
+                    'overall_safe': 各单元是否安全（停运单元为 False）,
+                    'plant_safe': 有在运单元且所有在运单元都安全,
+                }
+        """
+        calc = self.calculator
+        plant_flow, mlss = np.broadcast_arrays(
+            np.asarray(plant_flow, dtype=np.float64),
+            np.asarray(mlss, dtype=np.float64),
+        )
+        if in_service is None:
+            in_service = self.in_service.copy()
+            unit_flow = self.split_flow(plant_flow)
+        else:
+            in_service = np.asarray(in_service, dtype=bool)
+            unit_flow = plant_flow[..., None] * self.shares_for(in_service)
+        unit_mlss = np.broadcast_to(mlss[..., None], unit_flow.shape)
+        slr = calc.calculate_slr_batch(unit_mlss, unit_flow) * calc.area / self.areas
+
+        overall_safe = (calc.safe_mask_batch('mlss', unit_mlss)
+                        & calc.safe_mask_batch('equivalent_flow', unit_flow)
+                        & calc.safe_mask_batch('slr', slr)
+                        & in_service)
+
+        return {
+            'unit_ids': self.unit_ids,
+            'in_service': in_service,
+            'unit_flow': unit_flow,
+            'slr': slr,
+            'mlss_status': calc.classify_batch('mlss', unit_mlss),
+            'flow_status': calc.classify_batch('equivalent_flow', unit_flow),
+            'slr_status': calc.classify_batch('slr', slr),
+            'overall_safe': overall_safe,
+            'plant_safe': (np.all(overall_safe | ~in_service, axis=-1)
+                           & np.any(in_service, axis=-1)),
+        }
+
+    def check_units(self, plant_flow: float, mlss: float) -> Dict[str, dict]:
+        """
+        逐个单元生成完整的检查结果（含运行建议），停运单元不包含在内
+
+        Args:
+            plant_flow: 全厂流量 (L/s)
+            mlss: MLSS (mg/L)
+
+        Returns:
+            {单元编号: check_operating_point 结果}
+        """
+        unit_flow = self.split_flow(plant_flow)
+        results = {}
+        for i, unit in enumerate(self.units):
+            if not self.in_service[i]:
+                continue
+            calc = WastewaterCalculator(area=unit.area)
+            calc.SAFETY_RANGES = self.calculator.SAFETY_RANGES
+            results[unit.unit_id] = calc.check_operating_point(mlss, float(unit_flow[i]))
+        return results
@@ -0,0 +1,349 @@
+"""
+阶段计时与性能剖析模块
+
+为加载、解析、分析、导出等处理阶段记录耗时、行数和内存峰值，默认关闭。
+
+启用方式：
+1. 环境变量（进程退出时自动输出）：
+    WASTEWATER_PROFILE=1                    # 在标准错误输出汇总
+    WASTEWATER_PROFILE=profile.json         # 写入 JSON 文件
+    WASTEWATER_PROFILE_FORMAT=trace         # 写成 trace-event 格式（chrome://tracing / Perfetto）
+    WASTEWATER_PROFILE_MEMORY=1             # 同时记录内存峰值（tracemalloc，开销较大）
+
+2. 上下文管理器：
+    from profiling import profile
+
+    with profile(track_memory=True) as recorder:
+        handler = ExcelDataHandler('MLSS浓度表.xlsx')
+        handler.generate_analysis_report('报告.xlsx')
+    recorder.dump('profile.json')
+    recorder.dump('trace.json', fmt='trace')
+
+在代码中标记阶段：
+    with stage('parse_mlss_table', category='parse') as s:
+        ...
+        s.rows = len(rows)
+
+关闭时 stage() 只做一次全局判断并返回共享的空对象，开销可忽略。
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import List, Optional
+
+PROFILE_ENV = 'WASTEWATER_PROFILE'
+PROFILE_FORMAT_ENV = 'WASTEWATER_PROFILE_FORMAT'
+PROFILE_MEMORY_ENV = 'WASTEWATER_PROFILE_MEMORY'
+
+# 当前启用的记录器；为 None 时所有阶段标记都是空操作
+_recorder = None
+
+
+class _NullStage:
+    """关闭剖析时使用的空阶段对象"""
+
+    __slots__ = ('rows',)
+
+    def __init__(self):
+        self.rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """一次阶段记录"""
+
+    __slots__ = ('recorder', 'name', 'category', 'rows', 'start', 'duration',
+                 'thread_id', 'peak_memory', 'nested_rows', '_mem_start', '_mem_peak')
+
+    def __init__(self, recorder: 'ProfileRecorder', name: str, category: str, rows: Optional[int]):
+        self.recorder = recorder
+        self.name = name
+        self.category = category
+        self.rows = rows
+        self.start = 0.0
+        self.duration = 0.0
+        self.thread_id = threading.get_ident()
+        self.peak_memory = None
+        # 嵌套的阶段已记录行数时为 True，汇总时不再重复计入本阶段的行数
+        self.nested_rows = False
+        self._mem_start = 0
+        self._mem_peak = 0
+
+    def __enter__(self):
+        self.recorder._enter(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        self.recorder._exit(self)
+        return False
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            'name': self.name,
+            'category': self.category,
+            'start': self.start - self.recorder.origin,
+            'duration': self.duration,
+            'rows': self.rows,
+            'peak_memory': self.peak_memory,
+            'thread_id': self.thread_id,
+            'nested_rows': self.nested_rows,
+        }
+
+
+class ProfileRecorder:
+    """阶段记录器"""
+
+    def __init__(self, track_memory: bool = False):
+        """
+        Args:
+            track_memory: 是否用 tracemalloc 记录每个阶段的内存峰值（字节）
+        """
+        self.track_memory = track_memory
+        self.origin = time.perf_counter()
+        self.stages: List[Stage] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+
+    def start(self) -> None:
+        """开始记录"""
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def stop(self) -> None:
+        """停止记录"""
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self, stage: Stage) -> None:
+        stack = self._stack()
+        if self.track_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # 重置峰值前把到目前为止的峰值记入外层阶段
+            if stack:
+                stack[-1]._mem_peak = max(stack[-1]._mem_peak, peak)
+            stage._mem_start = current
+            stage._mem_peak = current
+            _reset_peak()
+        stack.append(stage)
+
+    def _exit(self, stage: Stage) -> None:
+        stack = self._stack()
+        if stack and stack[-1] is stage:
+            stack.pop()
+        if stack and (stage.rows is not None or stage.nested_rows):
+            stack[-1].nested_rows = True
+        if self.track_memory and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            stage._mem_peak = max(stage._mem_peak, peak)
+            stage.peak_memory = stage._mem_peak - stage._mem_start
+            if stack:
+                stack[-1]._mem_peak = max(stack[-1]._mem_peak, stage._mem_peak)
+            _reset_peak()
+        with self._lock:
+            self.stages.append(stage)
+
+    def stage(self, name: str, category: str = None, rows: int = None) -> Stage:
+        """创建一个阶段记录（上下文管理器）"""
+        return Stage(self, name, category or name, rows)
+
+    def to_records(self) -> list:
+        """所有阶段记录，按开始时间排序"""
+        with self._lock:
+            stages = list(self.stages)
+        return [s.to_dict() for s in sorted(stages, key=lambda s: s.start)]
+
+    def summary(self) -> dict:
+        """
+        按类别汇总
+
+        行数只计入最内层记录了行数的阶段：外层阶段包含的行已由嵌套阶段计入时不再重复计算，
+        否则每多一层嵌套，同一批行就多算一次，各类别的吞吐量偏高。
+
+        Returns:
+            {类别: {'count', 'total_time', 'rows', 'peak_memory'}}
+        """
+        result = {}
+        for record in self.to_records():
+            item = result.setdefault(record['category'], {
+                'count': 0, 'total_time': 0.0, 'rows': 0, 'peak_memory': None,
+            })
+            item['count'] += 1
+            item['total_time'] += record['duration']
+            if not record['nested_rows']:
+                item['rows'] += record['rows'] or 0
+            if record['peak_memory'] is not None:
+                item['peak_memory'] = max(item['peak_memory'] or 0, record['peak_memory'])
+        return result
+
+    def to_trace_events(self) -> dict:
+        """转换为 trace-event 格式（时间单位为微秒）"""
+        pid = os.getpid()
+        events = []
+        for record in self.to_records():
+            events.append({
+                'name': record['name'],
+                'cat': record['category'],
+                'ph': 'X',
+                'ts': record['start'] * 1e6,
+                'dur': record['duration'] * 1e6,
+                'pid': pid,
+                'tid': record['thread_id'],
+                'args': {'rows': record['rows'], 'peak_memory': record['peak_memory']},
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path: str, fmt: str = 'json') -> None:
+        """
+        保存记录
+
+        Args:
+            path: 输出文件路径
+            fmt: 'json'（阶段列表与汇总）或 'trace'（trace-event 格式）
+        """
+        if fmt == 'trace':
+            data = self.to_trace_events()
+        elif fmt == 'json':
+            data = {'stages': self.to_records(), 'summary': self.summary()}
+        else:
+            raise ValueError(f'未知输出格式: {fmt}')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def print_summary(self, file=None) -> None:
+        """打印汇总表"""
+        file = file if file is not None else sys.stderr
+        print(f"{'阶段':<12} {'次数':>6} {'耗时(ms)':>12} {'行数':>10} {'内存峰值(KB)':>14}", file=file)
+        for category, item in self.summary().items():
+            peak = '-' if item['peak_memory'] is None else f"{item['peak_memory'] / 1024:.1f}"
+            print(f"{category:<12} {item['count']:>6} {item['total_time'] * 1000:>12.2f} "
+                  f"{item['rows']:>10} {peak:>14}", file=file)
+
+
+def _reset_peak() -> None:
+    # tracemalloc.reset_peak 需要 Python 3.9+，旧版本只能记录全局峰值
+    reset = getattr(tracemalloc, 'reset_peak', None)
+    if reset is not None:
+        reset()
+
+
+def stage(name: str, category: str = None, rows: int = None):
+    """
+    标记一个处理阶段
+
+    Args:
+        name: 阶段名称（如 'load_excel'）
+        category: 阶段类别（'load' / 'parse' / 'analyse' / 'export'），默认同名称
+        rows: 行数（也可在 with 块内设置 .rows）
+
+    Returns:
+        上下文管理器；剖析关闭时返回共享空对象
+    """
+    recorder = _recorder
+    if recorder is None:
+        return _NULL_STAGE
+    return recorder.stage(name, category, rows)
+
+
+def is_enabled() -> bool:
+    """剖析是否已启用"""
+    return _recorder is not None
+
+
+def get_recorder() -> Optional[ProfileRecorder]:
+    """当前记录器（未启用时为 None）"""
+    return _recorder
+
+
+def enable(track_memory: bool = False) -> ProfileRecorder:
+    """全局启用剖析并返回新的记录器"""
+    global _recorder
+    disable()
+    recorder = ProfileRecorder(track_memory=track_memory)
+    recorder.start()
+    _recorder = recorder
+    return recorder
+
+
+def disable() -> Optional[ProfileRecorder]:
+    """关闭剖析并返回之前的记录器"""
+    global _recorder
+    recorder = _recorder
+    _recorder = None
+    if recorder is not None:
+        recorder.stop()
+    return recorder
+
+
+@contextmanager
+def profile(track_memory: bool = False):
+    """
+    在 with 块内启用剖析
+
+    Args:
+        track_memory: 是否记录内存峰值
+
+    Yields:
+        ProfileRecorder
+    """
+    previous = _recorder
+    recorder = ProfileRecorder(track_memory=track_memory)
+    recorder.start()
+    _set_recorder(recorder)
+    try:
+        yield recorder
+    finally:
+        recorder.stop()
+        _set_recorder(previous)
+
+
+def _set_recorder(recorder: Optional[ProfileRecorder]) -> None:
+    global _recorder
+    _recorder = recorder
+
+
+def _enable_from_env() -> None:
+    """根据环境变量启用剖析，并在进程退出时输出结果"""
+    target = os.environ.get(PROFILE_ENV, '').strip()
+    if not target or target.lower() in ('0', 'false', 'no', 'off'):
+        return
+
+    track_memory = os.environ.get(PROFILE_MEMORY_ENV, '').strip().lower() in ('1', 'true', 'yes', 'on')
+    fmt = os.environ.get(PROFILE_FORMAT_ENV, 'json').strip().lower() or 'json'
+    recorder = enable(track_memory=track_memory)
+
+    def _report():
+        if target.lower() in ('1', 'true', 'yes', 'on'):
+            recorder.print_summary()
+        else:
+            recorder.dump(target, fmt=fmt)
+
+    atexit.register(_report)
+
+
+_enable_from_env()
@@ -0,0 +1,222 @@
+"""
+MLSS 浓度参考表生成 - 按任意分辨率和面积重建 data/MLSS浓度表.xlsx
+
+生成的工作簿与 ExcelDataHandler.parse_mlss_table 期望的布局完全一致：
+    第 1 行：'Solids Loading Rate (kg/h/m2)'，之后为各列 MLSS (mg/L)
+    第 2 行：副标题 'Equivalent (L/s)'
+    第 3 行起：第一列为等效流量 (L/s)，其余为对应的 SLR (kg/h/m²)
+
+网格按流量分块计算（每块一次向量化运算），按顺序流式写入只写模式的工作簿，
+内存只与块大小有关。耗时主要在 openpyxl 写出单元格，单张表内不做线程并行；
+多个沉淀池的参考表可用进程池并行生成。
+
+使用示例：
+    write_reference_table('MLSS浓度表.xlsx', area=141, mlss=(2000, 5400, 10), flow=(60, 170, 0.5))
+    write_reference_tables('output/', {'1#': 141, '2#': 160})
+
+命令行：
+    python reference_table.py --area 141 --mlss 2000:5400:10 --flow 60:170:0.5 -o MLSS浓度表.xlsx
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Font, Alignment
+
+from profiling import stage
+from wastewater_treatment_calc import WastewaterCalculator
+
+# 默认范围（起点, 终点, 步长），与手工维护的参考表一致
+DEFAULT_MLSS_RANGE = (2000, 5400, 200)
+DEFAULT_FLOW_RANGE = (60, 170, 5)
+
+SHEET_NAME = 'MLSS浓度表'
+TABLE_TITLE = 'Solids Loading Rate (kg/h/m2)'
+FLOW_TITLE = 'Equivalent (L/s)'
+
+# 每块的流量行数
+REFERENCE_CHUNK_ROWS = 256
+
+
+def axis_values(spec) -> np.ndarray:
+    """
+    展开坐标轴取值
+
+    Args:
+        spec: (起点, 终点, 步长)（含终点）或取值序列
+
+    Returns:
+        float64 数组
+    """
+    if isinstance(spec, tuple) and len(spec) == 3:
+        start, stop, step = (float(v) for v in spec)
+        if step <= 0 or stop < start:
+            raise ValueError(f'无效范围: {spec}')
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        # 取整消除累积的浮点误差
+        values = np.round(start + step * np.arange(count), 9)
+    else:
+        values = np.asarray(spec, dtype=np.float64).ravel()
+    if values.size == 0:
+        raise ValueError('坐标轴取值为空')
+    if np.any(values <= 0):
+        raise ValueError('坐标轴取值必须为正数')
+    return values
+
+
+def _cell_value(value: float):
+    """整数值写为 int，与手工表格一致"""
+    return int(value) if float(value).is_integer() else float(value)
+
+
+def iter_reference_rows(area: float, mlss_values: np.ndarray, flow_values: np.ndarray,
+                        decimals: int = 2, chunk_rows: int = REFERENCE_CHUNK_ROWS) -> Iterator[list]:
+    """
+    按流量顺序逐行产生参考表数据行，每块流量行一次向量化计算
+
+    Args:
+        area: 处理单元面积 (m²)
+        mlss_values: MLSS 列取值
+        flow_values: 流量行取值
+        decimals: SLR 保留的小数位数
+        chunk_rows: 每块的流量行数
+
+    Yields:
+        [流量, SLR, SLR, ...]
+    """
+    calc = WastewaterCalculator(area=area)
+    for i in range(0, len(flow_values), chunk_rows):
+        flow_chunk = flow_values[i:i + chunk_rows]
+        slr = np.round(calc.calculate_slr_batch(mlss_values[None, :], flow_chunk[:, None]),
+                       decimals)
+        for flow, row in zip(flow_chunk.tolist(), slr.tolist()):
+            yield [_cell_value(flow)] + row
+
+
+def _header_cell(ws, value, fill: str, color: Optional[str] = None) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws, value=value)
+    cell.fill = PatternFill(start_color=fill, end_color=fill, fill_type="solid")
+    cell.font = Font(bold=True, color=color)
+    cell.alignment = Alignment(horizontal="center", vertical="center")
+    return cell
+
+
+def write_reference_table(output_file: str, area: float = 1.0, mlss=DEFAULT_MLSS_RANGE,
+                          flow=DEFAULT_FLOW_RANGE, decimals: int = 2,
+                          chunk_rows: int = REFERENCE_CHUNK_ROWS) -> Dict:
+    """
+    生成 MLSS 浓度参考表（只写模式流式写出）
+
+    Args:
+        output_file: 输出文件路径
+        area: 处理单元面积 (m²)
+        mlss: MLSS 列，(起点, 终点, 步长) 或取值序列
+        flow: 流量行，(起点, 终点, 步长) 或取值序列
+        decimals: SLR 保留的小数位数
+        chunk_rows: 每块计算的流量行数
+
+    Returns:
+        {'path': 输出路径, 'rows': 流量行数, 'columns': MLSS 列数}
+    """
+    if area <= 0:
+        raise ValueError('面积必须为正数')
+    mlss_values = axis_values(mlss)
+    flow_values = axis_values(flow)
+
+    with stage('write_reference_table', category='export',
+               rows=len(flow_values) * len(mlss_values)):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(SHEET_NAME)
+        ws.column_dimensions['A'].width = 20
+        ws.freeze_panes = 'B3'
+
+        ws.append([_header_cell(ws, TABLE_TITLE, "4472C4", "FFFFFF")]
+                  + [_header_cell(ws, _cell_value(m), "4472C4", "FFFFFF")
+                     for m in mlss_values.tolist()])
+        ws.append([_header_cell(ws, FLOW_TITLE, "D9E1F2")]
+                  + [_header_cell(ws, None, "D9E1F2") for _ in range(len(mlss_values))])
+        for row in iter_reference_rows(area, mlss_values, flow_values, decimals, chunk_rows):
+            ws.append(row)
+        wb.save(str(output_file))
+
+    print(f"✓ MLSS 浓度表已生成: {output_file}（{len(flow_values)} × {len(mlss_values)}，面积 {area} m²）")
+    return {'path': str(output_file), 'rows': len(flow_values), 'columns': len(mlss_values)}
+
+
+def _write_reference_job(args) -> str:
+    output_file, area, mlss, flow, decimals, chunk_rows = args
+    write_reference_table(output_file, area, mlss, flow, decimals, chunk_rows)
+    return output_file
+
+
+def write_reference_tables(output_dir: str, areas: Dict[str, float], mlss=DEFAULT_MLSS_RANGE,
+                           flow=DEFAULT_FLOW_RANGE, decimals: int = 2,
+                           chunk_rows: int = REFERENCE_CHUNK_ROWS,
+                           max_workers: Optional[int] = None,
+                           executor: str = 'process') -> Dict[str, str]:
+    """
+    为多个沉淀池并行生成参考表
+
+    Args:
+        output_dir: 输出目录，文件名为 'MLSS浓度表_<单元>.xlsx'
+        areas: {单元编号: 面积 (m²)}，可由 PlantModel 得到：
+               {unit.unit_id: unit.area for unit in plant.units}
+        mlss / flow / decimals / chunk_rows: 同 write_reference_table
+        max_workers: 并行数
+        executor: 'process'（进程池）或 'thread'（线程池）
+
+    Returns:
+        {单元编号: 输出文件路径}
+    """
+    if executor not in ('process', 'thread'):
+        raise ValueError(f'未知执行器: {executor}')
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    jobs = {unit: (str(output_dir / f'{SHEET_NAME}_{unit}.xlsx'), float(area), mlss, flow,
+                   decimals, chunk_rows)
+            for unit, area in areas.items()}
+    pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    with stage('write_reference_tables', category='export', rows=len(jobs)):
+        with pool_class(max_workers=max_workers) as pool:
+            paths = dict(zip(jobs, pool.map(_write_reference_job, jobs.values())))
+    return paths
+
+
+def _parse_range(text: str):
+    """'起点:终点:步长' 或逗号分隔的取值"""
+    if ':' in text:
+        parts = text.split(':')
+        if len(parts) != 3:
+            raise argparse.ArgumentTypeError(f'范围格式应为 起点:终点:步长: {text}')
+        return tuple(float(p) for p in parts)
+    return [float(v) for v in text.split(',')]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='生成 MLSS 浓度参考表')
+    parser.add_argument('-o', '--output', default='MLSS浓度表.xlsx', help='输出文件')
+    parser.add_argument('--area', type=float, default=1.0, help='处理单元面积 m²（默认 1.0）')
+    parser.add_argument('--mlss', type=_parse_range, default=DEFAULT_MLSS_RANGE,
+                        help='MLSS 列，起点:终点:步长 或逗号分隔的取值（默认 2000:5400:200）')
+    parser.add_argument('--flow', type=_parse_range, default=DEFAULT_FLOW_RANGE,
+                        help='流量行，起点:终点:步长 或逗号分隔的取值（默认 60:170:5）')
+    parser.add_argument('--decimals', type=int, default=2, help='SLR 保留的小数位数（默认 2）')
+    args = parser.parse_args(argv)
+
+    try:
+        write_reference_table(args.output, args.area, args.mlss, args.flow, args.decimals)
+    except ValueError as e:
+        parser.error(str(e))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,349 @@
+"""
+量化结果缓存 - 应对 Excel / 看板重算时的大量近似重复检查
+
+Excel 或看板重算时会反复送来几乎相同的输入（3500.0001 与 3500），精确匹配的记忆化
+无效。本缓存按传感器分辨率把 MLSS 和流量量化到网格上，在 SAFETY_RANGES 界定的
+取值范围（两端各放宽 margin）内预先计算每个网格单元的状态：
+
+    mlss_status         (MLSS 网格数,)            int8
+    flow_status         (流量网格数,)             int8
+    slr_status          (MLSS 网格数, 流量网格数)  int8
+    recommendation_code (MLSS 网格数, 流量网格数)  uint8，0 即三项均安全
+
+之后每次检查只是数组下标运算，范围外（或 NaN）的输入回退到计算器的完整检查。
+
+量化区间内包含任一 min / max / optimal 边界的网格单元（MLSS、流量或 SLR 在该单元内
+的取值跨过边界）在查找表中标记为 EXACT_CHECK，查到这类单元时同样回退到完整检查。
+其余单元内所有点的状态都与网格点相同，因此结果与计算器完全一致，不会把边界外侧的
+不安全运行点报告为安全。返回的 value / calculated_slr 为输入值及其精确 SLR。
+
+计算器的安全范围或面积变化（如 SafetyConfigWatcher 热更新）时自动重建查找表，
+也可以订阅配置更新显式清空。
+
+使用示例：
+    cache = QuantizedResultCache(calc, mlss_resolution=1.0, flow_resolution=0.1)
+    check = cache.check_operating_point(3500.0001, 100)   # 与 calc.check_operating_point 同结构
+    result = cache.check_operating_points(mlss, flow)      # 与 calc.check_operating_points 同结构
+    watcher.subscribe(lambda config: cache.clear())
+"""
+
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from wastewater_treatment_calc import (DEFAULT_LANGUAGE, INVALID_RECOMMENDATION, STATUS_CODES,
+                                       STATUS_NAMES, WastewaterCalculator, recommendation_codes,
+                                       recommendation_texts)
+
+# 默认传感器分辨率
+DEFAULT_MLSS_RESOLUTION = 1.0     # mg/L
+DEFAULT_FLOW_RESOLUTION = 0.1     # L/s
+
+# 查找表覆盖安全范围两端各放宽的比例
+DEFAULT_MARGIN = 0.1
+
+# 查找表单元数上限（每个单元 2 字节）
+MAX_TABLE_CELLS = 20_000_000
+
+# 查找表中需要回退到完整检查的单元（量化区间跨过安全范围边界）
+EXACT_CHECK = 255
+
+_SAFE_STATUSES = (STATUS_CODES['optimal'], STATUS_CODES['normal'])
+
+
+def _range_edges(ranges: dict) -> np.ndarray:
+    """状态判定用到的全部边界值"""
+    return np.array([ranges['min'], ranges['max'], *ranges['optimal']], dtype=np.float64)
+
+
+def _spans_edge(low: np.ndarray, high: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """[low, high] 区间内是否含有任一边界"""
+    spans = np.zeros(np.broadcast(low, high).shape, dtype=bool)
+    for edge in edges:
+        spans |= (low <= edge) & (edge <= high)
+    return spans
+
+
+class _Axis:
+    """一个输入变量的量化网格"""
+
+    def __init__(self, ranges: dict, resolution: float, margin: float):
+        if resolution <= 0:
+            raise ValueError('分辨率必须为正数')
+        self.resolution = float(resolution)
+        low = ranges['min'] * (1 - margin)
+        high = ranges['max'] * (1 + margin)
+        self.start = int(np.floor(low / resolution))
+        self.size = int(np.ceil(high / resolution)) - self.start + 1
+        # 取整消除 k × 分辨率 的浮点误差（如 3 × 0.1）
+        self.values = np.round((self.start + np.arange(self.size)) * self.resolution, 10)
+        # 每个网格点的量化区间（四舍五入到该点的取值范围），略微放宽以覆盖浮点误差
+        half = self.resolution * (0.5 + 1e-9)
+        self.lower = self.values - half
+        self.upper = self.values + half
+
+    def index(self, values: np.ndarray) -> np.ndarray:
+        """量化为网格下标，超出网格（或 NaN）为 -1"""
+        with np.errstate(invalid='ignore'):
+            scaled = np.rint(values / self.resolution) - self.start
+            inside = (scaled >= 0) & (scaled < self.size)
+        return np.where(inside, scaled, -1).astype(np.intp)
+
+    def index_one(self, value: float) -> int:
+        try:
+            idx = round(value / self.resolution) - self.start
+        except (OverflowError, ValueError):   # inf / NaN
+            return -1
+        return idx if 0 <= idx < self.size else -1
+
+
+class QuantizedResultCache:
+    """按传感器分辨率量化的检查结果查找表"""
+
+    def __init__(self, calculator: WastewaterCalculator = None,
+                 mlss_resolution: float = DEFAULT_MLSS_RESOLUTION,
+                 flow_resolution: float = DEFAULT_FLOW_RESOLUTION,
+                 margin: float = DEFAULT_MARGIN):
+        """
+        Args:
+            calculator: 被缓存的计算器（面积和安全范围），默认 WastewaterCalculator()
+            mlss_resolution: MLSS 量化分辨率 (mg/L)
+            flow_resolution: 流量量化分辨率 (L/s)
+            margin: 查找表覆盖安全范围两端各放宽的比例
+        """
+        if mlss_resolution <= 0 or flow_resolution <= 0:
+            raise ValueError('分辨率必须为正数')
+        if margin < 0 or margin >= 1:
+            raise ValueError('margin 必须在 [0, 1) 之间')
+        self.calculator = calculator or WastewaterCalculator(area=1.0)
+        self.mlss_resolution = float(mlss_resolution)
+        self.flow_resolution = float(flow_resolution)
+        self.margin = float(margin)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._table = None
+
+    def clear(self) -> None:
+        """丢弃查找表，下次检查时按计算器当前的安全范围重建"""
+        with self._lock:
+            self._table = None
+
+    def _current_table(self) -> dict:
+        calc = self.calculator
+        table = self._table
+        # 安全范围整体替换（热更新）或面积变化时重建
+        if (table is not None and table['ranges'] is calc.SAFETY_RANGES
+                and table['area'] == calc.area):
+            return table
+        with self._lock:
+            table = self._table
+            if (table is None or table['ranges'] is not calc.SAFETY_RANGES
+                    or table['area'] != calc.area):
+                table = self._build(calc)
+                self._table = table
+        return table
+
+    def _build(self, calc: WastewaterCalculator) -> dict:
+        ranges = calc.SAFETY_RANGES
+        mlss_axis = _Axis(ranges['mlss'], self.mlss_resolution, self.margin)
+        flow_axis = _Axis(ranges['equivalent_flow'], self.flow_resolution, self.margin)
+        cells = mlss_axis.size * flow_axis.size
+        if cells > MAX_TABLE_CELLS:
+            raise ValueError(f'查找表过大（{cells} 个单元，上限 {MAX_TABLE_CELLS}），请降低分辨率')
+
+        mlss_status = calc.classify_batch('mlss', mlss_axis.values)
+        flow_status = calc.classify_batch('equivalent_flow', flow_axis.values)
+        mlss_edge = _spans_edge(mlss_axis.lower, mlss_axis.upper, _range_edges(ranges['mlss']))
+        flow_edge = _spans_edge(flow_axis.lower, flow_axis.upper,
+                                _range_edges(ranges['equivalent_flow']))
+        slr_edges = _range_edges(ranges['slr'])
+        slr_status = np.empty((mlss_axis.size, flow_axis.size), dtype=np.int8)
+        codes = np.empty((mlss_axis.size, flow_axis.size), dtype=np.uint8)
+        # 按 MLSS 分块计算，避免整张网格的 float64 中间数组
+        step = max(1, 1_000_000 // flow_axis.size)
+        for i in range(0, mlss_axis.size, step):
+            rows = slice(i, i + step)
+            slr = calc.calculate_slr_batch(mlss_axis.values[rows, None], flow_axis.values[None, :])
+            slr_status[rows] = calc.classify_batch('slr', slr)
+            codes[rows] = recommendation_codes(mlss_status[rows, None], flow_status[None, :],
+                                               slr_status[rows])
+            # SLR 随 MLSS 和流量单调递增，单元内的取值范围由两个角点给出
+            slr_low = calc.calculate_slr_batch(mlss_axis.lower[rows, None],
+                                               flow_axis.lower[None, :])
+            slr_high = calc.calculate_slr_batch(mlss_axis.upper[rows, None],
+                                                flow_axis.upper[None, :])
+            exact = (_spans_edge(slr_low, slr_high, slr_edges)
+                     | mlss_edge[rows, None] | flow_edge[None, :])
+            codes[rows][exact] = EXACT_CHECK
+        return {
+            'ranges': ranges,
+            'area': calc.area,
+            'mlss_axis': mlss_axis,
+            'flow_axis': flow_axis,
+            'mlss_status': mlss_status,
+            'flow_status': flow_status,
+            'slr_status': slr_status,
+            'recommendation_code': codes,
+        }
+
+    @property
+    def nbytes(self) -> int:
+        """查找表占用的内存（字节），尚未建表时为 0"""
+        table = self._table
+        if table is None:
+            return 0
+        return sum(table[name].nbytes for name in
+                   ('mlss_status', 'flow_status', 'slr_status', 'recommendation_code'))
+
+    def _cell(self, mlss: float, equivalent_flow: float):
+        """(查找表, MLSS 下标, 流量下标)，范围外或需要完整检查的单元为 None"""
+        table = self._current_table()
+        i = table['mlss_axis'].index_one(mlss)
+        j = table['flow_axis'].index_one(equivalent_flow)
+        if i < 0 or j < 0 or table['recommendation_code'].item(i, j) == EXACT_CHECK:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return table, i, j
+
+    def lookup(self, mlss: float, equivalent_flow: float) -> Optional[Tuple[int, int, int, int]]:
+        """
+        查找单个运行点所在网格单元的状态编码
+
+        Returns:
+            (mlss_status, flow_status, slr_status, recommendation_code)，
+            范围外或需要完整检查时为 None
+        """
+        cell = self._cell(mlss, equivalent_flow)
+        if cell is None:
+            return None
+        table, i, j = cell
+        return (table['mlss_status'].item(i), table['flow_status'].item(j),
+                table['slr_status'].item(i, j), table['recommendation_code'].item(i, j))
+
+    def is_safe(self, mlss: float, equivalent_flow: float) -> bool:
+        """运行点是否安全（同 check_operating_point(...)['overall_safe']）"""
+        cell = self._cell(mlss, equivalent_flow)
+        if cell is None:
+            return self.calculator.check_operating_point(mlss, equivalent_flow)['overall_safe']
+        table, i, j = cell
+        return table['recommendation_code'].item(i, j) == 0
+
+    def slr_status(self, mlss: float, equivalent_flow: float) -> str:
+        """SLR 状态名称（同 check_operating_point(...)['slr']['status']）"""
+        cell = self._cell(mlss, equivalent_flow)
+        if cell is None:
+            return self.calculator.check_operating_point(mlss, equivalent_flow)['slr']['status']
+        table, i, j = cell
+        return STATUS_NAMES[table['slr_status'].item(i, j)]
+
+    def recommendations(self, mlss: float, equivalent_flow: float,
+                        language: str = DEFAULT_LANGUAGE) -> tuple:
+        """运行建议文本（同 check_operating_point(...)['recommendations']，返回不可变元组）"""
+        cell = self._cell(mlss, equivalent_flow)
+        if cell is None:
+            check = self.calculator.check_operating_point(mlss, equivalent_flow, language)
+            return tuple(check['recommendations'])
+        table, i, j = cell
+        return recommendation_texts(table['recommendation_code'].item(i, j), language)
+
+    def check_operating_point(self, mlss: float, equivalent_flow: float,
+                              language: str = DEFAULT_LANGUAGE) -> dict:
+        """
+        检查单个运行点，结果结构与 WastewaterCalculator.check_operating_point 相同
+
+        Args:
+            mlss: MLSS (mg/L)
+            equivalent_flow: 等效流量 (L/s)
+            language: 运行建议的语言
+        """
+        cell = self._cell(mlss, equivalent_flow)
+        if cell is None:
+            return self.calculator.check_operating_point(mlss, equivalent_flow, language)
+        table, i, j = cell
+
+        ranges = table['ranges']
+        slr = self.calculator.calculate_slr(mlss, equivalent_flow)
+        code = table['recommendation_code'].item(i, j)
+        statuses = (('mlss', mlss, table['mlss_status'].item(i)),
+                    ('equivalent_flow', equivalent_flow, table['flow_status'].item(j)),
+                    ('slr', slr, table['slr_status'].item(i, j)))
+        result = {}
+        for name, value, status in statuses:
+            r = ranges[name]
+            result[name] = {
+                'parameter': name,
+                'value': value,
+                'min': r['min'],
+                'max': r['max'],
+                'optimal': r['optimal'],
+                'status': STATUS_NAMES[status],
+                'safe': status in _SAFE_STATUSES,
+            }
+        result['calculated_slr'] = slr
+        result['overall_safe'] = code == 0
+        result['recommendation_code'] = code
+        result['recommendations'] = list(recommendation_texts(code, language))
+        return result
+
+    def check_operating_points(self, mlss, equivalent_flow, valid=None) -> Dict[str, np.ndarray]:
+        """
+        批量检查，结果结构与 WastewaterCalculator.check_operating_points 相同
+
+        查找表范围内的行查表得到状态，范围外和跨边界单元内的行回退到计算器的完整检查。
+        """
+        mlss, equivalent_flow = np.broadcast_arrays(
+            np.asarray(mlss, dtype=np.float64),
+            np.asarray(equivalent_flow, dtype=np.float64),
+        )
+        table = self._current_table()
+        i = table['mlss_axis'].index(mlss)
+        j = table['flow_axis'].index(equivalent_flow)
+        ic, jc = np.maximum(i, 0), np.maximum(j, 0)
+        codes = table['recommendation_code'][ic, jc]
+        hit = (i >= 0) & (j >= 0) & (codes != EXACT_CHECK)
+        n_hit = int(np.count_nonzero(hit))
+        self.hits += n_hit
+        self.misses += hit.size - n_hit
+
+        result = {
+            'mlss': mlss.copy(),
+            'equivalent_flow': equivalent_flow.copy(),
+            'calculated_slr': self.calculator.calculate_slr_batch(mlss, equivalent_flow),
+            'mlss_status': table['mlss_status'][ic],
+            'flow_status': table['flow_status'][jc],
+            'slr_status': table['slr_status'][ic, jc],
+            'recommendation_code': codes,
+        }
+        if n_hit < hit.size:
+            # 未命中的行按原始值完整检查后写回
+            miss = ~hit
+            full = self.calculator.check_operating_points(mlss[miss], equivalent_flow[miss])
+            for name in ('mlss_status', 'flow_status', 'slr_status', 'recommendation_code'):
+                result[name][miss] = full[name]
+        result['overall_safe'] = result['recommendation_code'] == 0
+        result['valid'] = np.ones(mlss.shape, dtype=bool)
+
+        if valid is not None:
+            valid = np.broadcast_to(np.asarray(valid, dtype=bool), mlss.shape)
+            invalid = ~valid
+            if invalid.any():
+                result['calculated_slr'] = np.where(invalid, np.nan, result['calculated_slr'])
+                result['overall_safe'] = result['overall_safe'] & valid
+                for name in ('mlss_status', 'flow_status', 'slr_status'):
+                    result[name][invalid] = STATUS_CODES['invalid']
+                result['recommendation_code'][invalid] = INVALID_RECOMMENDATION
+            result['valid'] = valid.copy()
+        return result
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """命中统计：{'hits', 'misses', 'hit_rate', 'table_bytes'}"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else None,
+            'table_bytes': self.nbytes,
+        }
@@ -0,0 +1,409 @@
+"""
+分析结果库 - 基于 SQLite 的本地持久化和索引查询
+
+分析报告、对比分析、敏感性分析的结果除了写入 Excel，还可以写入本地 SQLite 数据库，
+直接按时间、单元、状态查询，不必重新打开表格。只依赖标准库，离线主机可用。
+
+表结构：
+    runs         每次生成报告一行：类型、时间、单元、来源、输出文件、行数、不安全数
+    results      每个运行点一行：时间、单元、标签（场景名）、MLSS、流量、SLR、状态编码
+    sensitivity  敏感性分析：参数、取值、SLR、相对变化 %
+
+数据库使用 WAL 模式（读写互不阻塞），批量写入在单个事务中用 executemany 完成；
+results 表在时间、单元、状态上建有索引。查询结果以列式 numpy 数组返回。
+
+使用示例：
+    store = ResultsStore('output/results.db')
+    handler = ExcelDataHandler('data/MLSS浓度表.xlsx', results_store=store, unit='1#')
+    handler.generate_analysis_report('output/分析报告.xlsx')
+    store.unsafe_units(start='2024-06-01', end='2024-06-08')     # {'1#': 123, ...}
+    data = store.query(start='2024-06-01', unit='1#', unsafe_only=True)
+"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from historian import to_epoch_seconds
+from wastewater_treatment_calc import INVALID_RECOMMENDATION, STATUS_CODES, recommendation_codes
+
+SCHEMA_VERSION = 1
+
+RUN_KINDS = ('analysis', 'comparison', 'sensitivity')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    created INTEGER NOT NULL,
+    unit TEXT,
+    area REAL,
+    source TEXT,
+    output_file TEXT,
+    rows INTEGER NOT NULL DEFAULT 0,
+    unsafe INTEGER NOT NULL DEFAULT 0,
+    meta TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    ts INTEGER NOT NULL,
+    unit TEXT,
+    label TEXT,
+    mlss REAL,
+    equivalent_flow REAL,
+    slr REAL,
+    mlss_status INTEGER,
+    flow_status INTEGER,
+    slr_status INTEGER,
+    overall_safe INTEGER,
+    recommendation_code INTEGER
+);
+CREATE TABLE IF NOT EXISTS sensitivity (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    parameter TEXT NOT NULL,
+    value REAL,
+    slr REAL,
+    change_pct REAL
+);
+CREATE INDEX IF NOT EXISTS idx_results_ts ON results(ts);
+CREATE INDEX IF NOT EXISTS idx_results_unit_ts ON results(unit, ts);
+CREATE INDEX IF NOT EXISTS idx_results_safe_ts ON results(overall_safe, ts);
+CREATE INDEX IF NOT EXISTS idx_results_run ON results(run_id);
+CREATE INDEX IF NOT EXISTS idx_sensitivity_run ON sensitivity(run_id);
+CREATE INDEX IF NOT EXISTS idx_runs_kind_created ON runs(kind, created);
+"""
+
+# results 表的列 -> 查询结果的数据类型
+RESULT_COLUMNS = {
+    'run_id': np.int64,
+    'ts': np.int64,
+    'unit': object,
+    'label': object,
+    'mlss': np.float64,
+    'equivalent_flow': np.float64,
+    'slr': np.float64,
+    'mlss_status': np.int8,
+    'flow_status': np.int8,
+    'slr_status': np.int8,
+    'overall_safe': bool,
+    'recommendation_code': np.uint8,
+}
+
+SENSITIVITY_COLUMNS = {
+    'run_id': np.int64,
+    'parameter': object,
+    'value': np.float64,
+    'slr': np.float64,
+    'change_pct': np.float64,
+}
+
+
+def _columns(rows: List[tuple], dtypes: Dict[str, type]) -> Dict[str, np.ndarray]:
+    """查询结果的行列表 -> 列式数组（NULL 浮点为 NaN）"""
+    names = list(dtypes)
+    if not rows:
+        return {name: np.empty(0, dtype=dtypes[name]) for name in names}
+    data = {}
+    for name, values in zip(names, zip(*rows)):
+        dtype = dtypes[name]
+        if dtype is object:
+            data[name] = np.array(values, dtype=object)
+        else:
+            data[name] = np.array(values, dtype=dtype)
+    return data
+
+
+def _nullable(values) -> list:
+    """浮点数组 -> 列表，NaN / inf 写为 NULL"""
+    values = np.asarray(values, dtype=np.float64).ravel()
+    out = values.tolist()
+    for i in np.flatnonzero(~np.isfinite(values)).tolist():
+        out[i] = None
+    return out
+
+
+class ResultsStore:
+    """SQLite 分析结果库"""
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        """
+        打开或创建结果库
+
+        Args:
+            path: 数据库文件路径（':memory:' 为内存库）
+            timeout: 等待其他连接释放写锁的秒数
+        """
+        self.path = str(path)
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=timeout)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            self.conn.close()
+            raise ValueError(f'不支持的结果库结构版本: {version}')
+        with self.conn:
+            self.conn.executescript(_SCHEMA)
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def __enter__(self) -> 'ResultsStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def create_run(self, kind: str, unit: str = None, area: float = None, source: str = None,
+                   output_file: str = None, created=None, meta: dict = None) -> int:
+        """
+        登记一次报告生成
+
+        Args:
+            kind: 'analysis'、'comparison' 或 'sensitivity'
+            unit: 处理单元编号
+            area: 计算所用面积 (m²)
+            source: 输入文件
+            output_file: 输出的 Excel 文件
+            created: 生成时间（见 to_epoch_seconds），默认当前时间
+            meta: 其他信息（以 JSON 保存）
+
+        Returns:
+            run_id
+        """
+        if kind not in RUN_KINDS:
+            raise ValueError(f'未知报告类型: {kind}')
+        created = int(time.time()) if created is None else int(to_epoch_seconds(created))
+        with self.conn:
+            cursor = self.conn.execute(
+                'INSERT INTO runs (kind, created, unit, area, source, output_file, meta) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (kind, created, unit, area, source, output_file,
+                 json.dumps(meta, ensure_ascii=False) if meta else None))
+        return cursor.lastrowid
+
+    def add_results(self, run_id: int, result: dict, timestamps=None, unit=None,
+                    labels: Iterable[str] = None, slr=None) -> int:
+        """
+        批量写入运行点检查结果（单个事务，executemany）
+
+        Args:
+            run_id: create_run 返回的编号
+            result: check_operating_points 的列式结果
+            timestamps: 各行时间（标量或数组，见 to_epoch_seconds），默认为该次运行的时间
+            unit: 单元编号（标量或数组），默认为该次运行的单元
+            labels: 各行标签（如对比分析的场景名）
+            slr: 写入的 SLR 数组，默认为 result['calculated_slr']（如分析报告使用表格中的值）
+
+        Returns:
+            写入的行数
+        """
+        run = self.conn.execute('SELECT created, unit FROM runs WHERE id = ?', (run_id,)).fetchone()
+        if run is None:
+            raise KeyError(f'未知 run_id: {run_id}')
+        n = int(np.size(result['mlss']))
+        if n == 0:
+            return 0
+
+        ts = np.broadcast_to(
+            run[0] if timestamps is None else to_epoch_seconds(timestamps), (n,)).tolist()
+        unit = run[1] if unit is None else unit
+        if unit is None or isinstance(unit, str):
+            units = [unit] * n
+        else:
+            units = [None if u is None else str(u) for u in np.ravel(np.asarray(unit, dtype=object))]
+            if len(units) != n:
+                raise ValueError('unit 与结果行数不一致')
+        label_list = [None] * n if labels is None else list(labels)
+        if len(label_list) != n:
+            raise ValueError('labels 与结果行数不一致')
+        slr = result['calculated_slr'] if slr is None else slr
+        floats = [_nullable(result['mlss']), _nullable(result['equivalent_flow']),
+                  _nullable(np.broadcast_to(np.asarray(slr, dtype=np.float64), (n,)))]
+        safe = np.asarray(result['overall_safe']).ravel()
+        codes = result.get('recommendation_code')
+        if codes is None:
+            # 结果中没有建议编码时（如分析块）由三个状态推出
+            statuses = [np.ravel(result[name])
+                        for name in ('mlss_status', 'flow_status', 'slr_status')]
+            codes = np.where(statuses[0] == STATUS_CODES['invalid'], INVALID_RECOMMENDATION,
+                             recommendation_codes(*statuses))
+        rows = zip([run_id] * n, ts, units, label_list, *floats,
+                   np.ravel(result['mlss_status']).tolist(),
+                   np.ravel(result['flow_status']).tolist(),
+                   np.ravel(result['slr_status']).tolist(),
+                   safe.astype(np.int8).tolist(),
+                   np.ravel(codes).tolist())
+
+        unsafe = n - int(np.count_nonzero(safe))
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO results (run_id, ts, unit, label, mlss, equivalent_flow, slr, '
+                'mlss_status, flow_status, slr_status, overall_safe, recommendation_code) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.conn.execute('UPDATE runs SET rows = rows + ?, unsafe = unsafe + ? WHERE id = ?',
+                              (n, unsafe, run_id))
+        return n
+
+    def add_sensitivity(self, run_id: int, parameter: str, rows: Iterable[tuple]) -> int:
+        """
+        写入敏感性分析数据
+
+        Args:
+            run_id: create_run 返回的编号
+            parameter: 变化的参数（'mlss' 或 'equivalent_flow'）
+            rows: [(参数值, SLR, 相对变化 %)]
+
+        Returns:
+            写入的行数
+        """
+        rows = [(run_id, parameter, value, slr, change) for value, slr, change in rows]
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO sensitivity (run_id, parameter, value, slr, change_pct) '
+                'VALUES (?, ?, ?, ?, ?)', rows)
+            self.conn.execute('UPDATE runs SET rows = rows + ? WHERE id = ?', (len(rows), run_id))
+        return len(rows)
+
+    def record(self, kind: str, result: dict, unit: str = None, area: float = None,
+               source: str = None, output_file: str = None, labels: Iterable[str] = None,
+               slr=None, created=None) -> int:
+        """create_run + add_results 的便捷写法，返回 run_id"""
+        run_id = self.create_run(kind, unit, area, source, output_file, created)
+        self.add_results(run_id, result, labels=labels, slr=slr)
+        return run_id
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def query(self, start=None, end=None, unit: str = None, unsafe_only: bool = False,
+              kind: str = None, run_id: int = None, slr_status: str = None) -> Dict[str, np.ndarray]:
+        """
+        按条件查询运行点结果
+
+        Args:
+            start: 起始时间（含）
+            end: 结束时间（不含）
+            unit: 单元编号
+            unsafe_only: 只返回不安全的行
+            kind: 报告类型
+            run_id: 某次运行
+            slr_status: SLR 状态名称（见 STATUS_NAMES）
+
+        Returns:
+            {列名: 数组}，列见 RESULT_COLUMNS，按时间排序
+        """
+        where, params = [], []
+        if start is not None:
+            where.append('r.ts >= ?')
+            params.append(int(to_epoch_seconds(start)))
+        if end is not None:
+            where.append('r.ts < ?')
+            params.append(int(to_epoch_seconds(end)))
+        if unit is not None:
+            where.append('r.unit = ?')
+            params.append(unit)
+        if unsafe_only:
+            where.append('r.overall_safe = 0')
+        if run_id is not None:
+            where.append('r.run_id = ?')
+            params.append(run_id)
+        if slr_status is not None:
+            where.append('r.slr_status = ?')
+            params.append(STATUS_CODES[slr_status])
+        join = ''
+        if kind is not None:
+            join = ' JOIN runs ON runs.id = r.run_id'
+            where.append('runs.kind = ?')
+            params.append(kind)
+
+        sql = 'SELECT {} FROM results r{}'.format(
+            ', '.join(f'r.{name}' for name in RESULT_COLUMNS), join)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY r.ts, r.rowid'
+        data = _columns(self.conn.execute(sql, params).fetchall(), RESULT_COLUMNS)
+        data['timestamp'] = data.pop('ts')
+        return data
+
+    def unsafe_units(self, start=None, end=None, kind: str = None) -> Dict[str, int]:
+        """
+        时间范围内各单元的不安全点数（只列出有不安全点的单元）
+
+        Returns:
+            {单元编号: 不安全点数}，按点数从多到少排序
+        """
+        where, params = ['r.overall_safe = 0'], []
+        if start is not None:
+            where.append('r.ts >= ?')
+            params.append(int(to_epoch_seconds(start)))
+        if end is not None:
+            where.append('r.ts < ?')
+            params.append(int(to_epoch_seconds(end)))
+        join = ''
+        if kind is not None:
+            join = ' JOIN runs ON runs.id = r.run_id'
+            where.append('runs.kind = ?')
+            params.append(kind)
+        sql = (f'SELECT r.unit, COUNT(*) FROM results r{join} WHERE ' + ' AND '.join(where)
+               + ' GROUP BY r.unit ORDER BY COUNT(*) DESC')
+        return {unit: count for unit, count in self.conn.execute(sql, params)}
+
+    def sensitivity(self, run_id: int = None) -> Dict[str, np.ndarray]:
+        """
+        敏感性分析数据，默认为最近一次
+
+        Returns:
+            {列名: 数组}，列见 SENSITIVITY_COLUMNS
+        """
+        if run_id is None:
+            row = self.conn.execute(
+                "SELECT id FROM runs WHERE kind = 'sensitivity' ORDER BY created DESC, id DESC "
+                "LIMIT 1").fetchone()
+            if row is None:
+                return _columns([], SENSITIVITY_COLUMNS)
+            run_id = row[0]
+        rows = self.conn.execute(
+            'SELECT {} FROM sensitivity WHERE run_id = ? ORDER BY rowid'.format(
+                ', '.join(SENSITIVITY_COLUMNS)), (run_id,)).fetchall()
+        return _columns(rows, SENSITIVITY_COLUMNS)
+
+    def runs(self, kind: str = None, limit: int = None) -> List[dict]:
+        """
+        已登记的报告生成记录，最近的在前
+
+        Returns:
+            [{'id', 'kind', 'created', 'unit', 'area', 'source', 'output_file',
+              'rows', 'unsafe', 'meta'}]
+        """
+        sql = ('SELECT id, kind, created, unit, area, source, output_file, rows, unsafe, meta '
+               'FROM runs')
+        params = []
+        if kind is not None:
+            sql += ' WHERE kind = ?'
+            params.append(kind)
+        sql += ' ORDER BY created DESC, id DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        keys = ('id', 'kind', 'created', 'unit', 'area', 'source', 'output_file',
+                'rows', 'unsafe', 'meta')
+        runs = []
+        for row in self.conn.execute(sql, params):
+            run = dict(zip(keys, row))
+            run['meta'] = json.loads(run['meta']) if run['meta'] else None
+            runs.append(run)
+        return runs
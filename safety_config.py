@@ -0,0 +1,415 @@
+"""
+安全范围配置 - 按厂、单元、季节加载，支持热更新
+
+安全范围从配置文件（JSON / TOML / YAML）读取，不再写死在 WastewaterCalculator
+中。配置按层级覆盖，越具体的层级优先（逐参数、逐键合并）：
+
+    内置默认值 < 全局 < 全局季节 < 厂 < 厂季节 < 单元 < 单元季节
+
+配置文件结构（JSON 示例，TOML / YAML 结构相同）：
+
+    {
+        "seasons": {"winter": [12, 1, 2], "summer": [6, 7, 8]},
+        "ranges": {"slr": {"min": 3.0, "max": 24.0, "optimal": [8.0, 16.0]}},
+        "season_ranges": {"winter": {"slr": {"max": 20.0}}},
+        "plants": {
+            "A厂": {
+                "ranges": {"mlss": {"optimal": [3200, 4200]}},
+                "season_ranges": {"summer": {...}},
+                "units": {
+                    "1#": {"ranges": {...}, "season_ranges": {...}}
+                }
+            }
+        }
+    }
+
+加载时对所有 (厂, 单元, 季节) 组合一次性合并并校验，编译为查找表：
+按组合取字典（resolve）为 O(1)，批量数据可用 bounds_table / lookup_index
+按行取边界数组。
+
+热更新：SafetyConfigWatcher 监视文件修改时间，变化后重新加载；新配置校验
+通过后整体替换（单次引用赋值），校验失败时保留旧配置。通过 watcher 创建的
+计算器会在替换时同步更新安全范围，订阅者（如结果缓存）会收到通知以便失效。
+
+使用示例：
+    watcher = SafetyConfigWatcher('safety_ranges.toml')
+    watcher.start()                      # 后台轮询，或定期调用 watcher.check()
+    calc = watcher.calculator('A厂', unit='1#', season='winter', area=141)
+    watcher.subscribe(lambda config: cache.clear())
+"""
+
+import json
+import threading
+import weakref
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from wastewater_treatment_calc import WastewaterCalculator
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+PARAMETERS = ('mlss', 'slr', 'equivalent_flow')
+RANGE_KEYS = ('min', 'max', 'optimal')
+
+# bounds_table 的列顺序
+BOUND_COLUMNS = ('min', 'max', 'optimal_low', 'optimal_high')
+
+# 未指定季节时使用的名称
+DEFAULT_SEASON = None
+
+
+def load_config_file(path) -> dict:
+    """
+    按扩展名读取配置文件
+
+    Args:
+        path: .json / .toml / .yaml / .yml 文件
+
+    Returns:
+        配置字典
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    if suffix == '.toml':
+        if tomllib is None:
+            raise ImportError('读取 TOML 配置需要 Python 3.11+ 或安装 tomli')
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    if suffix in ('.yaml', '.yml'):
+        if yaml is None:
+            raise ImportError('读取 YAML 配置需要安装 PyYAML')
+        with open(path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    raise ValueError(f'不支持的配置文件格式: {path.suffix}')
+
+
+def _merge(base: Dict[str, dict], override: Optional[dict], where: str) -> Dict[str, dict]:
+    """逐参数、逐键合并安全范围"""
+    if not override:
+        return base
+    if not isinstance(override, dict):
+        raise ValueError(f'{where}: 安全范围必须是字典')
+    merged = {name: dict(ranges) for name, ranges in base.items()}
+    for name, ranges in override.items():
+        if name not in PARAMETERS:
+            raise ValueError(f'{where}: 未知参数 {name}')
+        if not isinstance(ranges, dict):
+            raise ValueError(f'{where}.{name}: 必须是字典')
+        unknown = set(ranges) - set(RANGE_KEYS)
+        if unknown:
+            raise ValueError(f'{where}.{name}: 未知键 {sorted(unknown)}')
+        merged[name].update(ranges)
+    return merged
+
+
+def validate_ranges(ranges: Dict[str, dict], where: str = '配置') -> Dict[str, dict]:
+    """
+    校验并规范化一组安全范围
+
+    Args:
+        ranges: {参数: {'min', 'max', 'optimal'}}
+        where: 出错时提示的位置
+
+    Returns:
+        规范化后的安全范围（数值为 float，optimal 为元组）
+    """
+    result = {}
+    for name in PARAMETERS:
+        entry = ranges.get(name)
+        if entry is None:
+            raise ValueError(f'{where}: 缺少参数 {name}')
+        try:
+            low, high = (float(v) for v in entry['optimal'])
+            minimum, maximum = float(entry['min']), float(entry['max'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'{where}.{name}: 需要数值 min、max 和两个元素的 optimal')
+        if not all(np.isfinite([minimum, low, high, maximum])):
+            raise ValueError(f'{where}.{name}: 数值必须有限')
+        if not minimum <= low <= high <= maximum:
+            raise ValueError(f'{where}.{name}: 需满足 min ≤ optimal 下限 ≤ optimal 上限 ≤ max')
+        result[name] = {'min': minimum, 'max': maximum, 'optimal': (low, high)}
+    return result
+
+
+class SafetyConfig:
+    """编译后的安全范围配置（只读）"""
+
+    def __init__(self, data: dict, source: str = None, generation: int = 0):
+        """
+        Args:
+            data: 配置字典（见模块说明）
+            source: 配置来源（文件路径），仅用于提示
+            generation: 配置版本号，每次热更新加 1，可用作缓存键的一部分
+        """
+        self.source = source
+        self.generation = generation
+
+        unknown = set(data) - {'seasons', 'ranges', 'season_ranges', 'plants'}
+        if unknown:
+            raise ValueError(f'配置含未知键: {sorted(unknown)}')
+
+        # 月份 -> 季节编码（0 表示未指定季节）
+        self.seasons: List[Optional[str]] = [DEFAULT_SEASON]
+        self._month_season = np.zeros(13, dtype=np.int16)
+        for season, months in (data.get('seasons') or {}).items():
+            self.seasons.append(season)
+            for month in months:
+                if not 1 <= int(month) <= 12:
+                    raise ValueError(f'季节 {season}: 无效月份 {month}')
+                if self._month_season[int(month)]:
+                    raise ValueError(f'月份 {month} 属于多个季节')
+                self._month_season[int(month)] = len(self.seasons) - 1
+
+        # 编译所有组合：键 (厂, 单元, 季节)，厂/单元为 None 表示上一级的默认值
+        self._keys: List[Tuple] = []
+        self._index: Dict[Tuple, int] = {}
+        self._ranges: List[Dict[str, dict]] = []
+
+        scopes = [((None, None), [('', data)])]
+        for plant, plant_data in (data.get('plants') or {}).items():
+            plant_layers = [('', data), (f'plants.{plant}.', plant_data or {})]
+            scopes.append(((plant, None), plant_layers))
+            for unit, unit_data in ((plant_data or {}).get('units') or {}).items():
+                scopes.append(((plant, str(unit)),
+                               plant_layers + [(f'plants.{plant}.units.{unit}.', unit_data or {})]))
+
+        builtin = {name: dict(ranges) for name, ranges in WastewaterCalculator.SAFETY_RANGES.items()}
+        for (plant, unit), layers in scopes:
+            prefix, own = layers[-1]
+            unknown = set(own.get('season_ranges') or {}) - set(self.seasons[1:])
+            if unknown:
+                raise ValueError(f'{prefix}season_ranges: 未定义的季节 {sorted(unknown)}')
+            for season in self.seasons:
+                ranges = builtin
+                for where, layer in layers:
+                    ranges = _merge(ranges, layer.get('ranges'), f'{where}ranges')
+                    if season is not None:
+                        season_ranges = (layer.get('season_ranges') or {}).get(season)
+                        ranges = _merge(ranges, season_ranges, f'{where}season_ranges.{season}')
+                where = prefix + (f'season_ranges.{season}' if season else 'ranges')
+                self._add((plant, unit, season), validate_ranges(ranges, where))
+
+        # 按组合编号排列的边界表 {参数: (组合数, 4) 数组}
+        self._tables = {
+            name: np.array([[r[name]['min'], r[name]['max'], *r[name]['optimal']]
+                            for r in self._ranges], dtype=np.float64)
+            for name in PARAMETERS
+        }
+
+    def _add(self, key: Tuple, ranges: Dict[str, dict]) -> None:
+        self._index[key] = len(self._keys)
+        self._keys.append(key)
+        self._ranges.append(ranges)
+
+    @classmethod
+    def from_file(cls, path, generation: int = 0) -> 'SafetyConfig':
+        """从配置文件加载并编译"""
+        return cls(load_config_file(path), source=str(path), generation=generation)
+
+    # ------------------------------------------------------------------
+    # 查找
+    # ------------------------------------------------------------------
+
+    def season_for_month(self, months) -> np.ndarray:
+        """
+        月份 -> 季节编码（下标对应 self.seasons，0 表示未指定季节）
+
+        Args:
+            months: 1-12 的整数或数组
+        """
+        return self._month_season[np.asarray(months, dtype=np.int64)]
+
+    def key_index(self, plant: str = None, unit: str = None, season: str = None) -> int:
+        """
+        (厂, 单元, 季节) 对应的组合编号
+
+        厂和单元必须在配置中声明；声明但没有单独安全范围的厂 / 单元（如 "2#": {}）
+        使用上一级的值。未声明的厂、单元或季节抛出 KeyError，不会静默回退到全局默认值。
+        """
+        index = self._index.get((plant, unit, season))
+        if index is not None:
+            return index
+        if season not in self.seasons:
+            raise KeyError(f'未定义的季节: {season}')
+        if (plant, None, DEFAULT_SEASON) not in self._index:
+            raise KeyError(f'未定义的厂: {plant}')
+        if plant is None:
+            raise KeyError(f'单元 {unit} 未指定所属的厂')
+        raise KeyError(f'厂 {plant} 未定义单元: {unit}')
+
+    def resolve(self, plant: str = None, unit: str = None, season: str = None) -> Dict[str, dict]:
+        """
+        取 (厂, 单元, 季节) 生效的安全范围
+
+        Returns:
+            与 WastewaterCalculator.SAFETY_RANGES 结构相同的字典（共享，勿修改）
+        """
+        return self._ranges[self.key_index(plant, unit, season)]
+
+    def lookup_index(self, plants, units, seasons) -> np.ndarray:
+        """
+        批量取每行对应的组合编号
+
+        Args:
+            plants: 厂名数组（或单个值）
+            units: 单元编号数组（或单个值）
+            seasons: 季节名称数组（或单个值）
+
+        Returns:
+            int32 组合编号数组
+        """
+        plants, units, seasons = np.broadcast_arrays(
+            np.asarray(plants, dtype=object), np.asarray(units, dtype=object),
+            np.asarray(seasons, dtype=object))
+        # 按唯一组合查找，行数多时只查找少量不同组合
+        keys = list(zip(plants.ravel().tolist(), units.ravel().tolist(), seasons.ravel().tolist()))
+        cache = {}
+        out = np.empty(len(keys), dtype=np.int32)
+        for i, (plant, unit, season) in enumerate(keys):
+            index = cache.get((plant, unit, season))
+            if index is None:
+                index = cache[(plant, unit, season)] = self.key_index(
+                    plant, None if unit is None else str(unit), season)
+            out[i] = index
+        return out.reshape(plants.shape)
+
+    def bounds_table(self, param_name: str) -> np.ndarray:
+        """
+        参数的边界表，形状为 (组合数, 4)，列见 BOUND_COLUMNS
+
+        与 lookup_index 配合可按行取边界：table[index]
+        """
+        table = self._tables.get(param_name)
+        if table is None:
+            raise ValueError(f'未知参数: {param_name}')
+        return table
+
+    def calculator(self, plant: str = None, unit: str = None, season: str = None,
+                   area: float = 1.0) -> WastewaterCalculator:
+        """创建使用该组合安全范围的计算器"""
+        calc = WastewaterCalculator(area=area)
+        calc.SAFETY_RANGES = self.resolve(plant, unit, season)
+        return calc
+
+    @property
+    def plants(self) -> List[str]:
+        """已配置的厂"""
+        return list(dict.fromkeys(plant for plant, _, _ in self._keys if plant is not None))
+
+
+class SafetyConfigWatcher:
+    """监视配置文件并热更新"""
+
+    def __init__(self, path, poll_interval: float = 2.0):
+        """
+        Args:
+            path: 配置文件路径
+            poll_interval: 后台轮询间隔（秒）
+        """
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self.last_error: Optional[Exception] = None
+        self._signature = self._stat()
+        self.config = SafetyConfig.from_file(self.path)
+        self._lock = threading.Lock()
+        self._bound = weakref.WeakKeyDictionary()  # 计算器 -> (厂, 单元, 季节)
+        self._listeners: List[Callable[[SafetyConfig], None]] = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stat(self) -> Optional[tuple]:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def calculator(self, plant: str = None, unit: str = None, season: str = None,
+                   area: float = 1.0) -> WastewaterCalculator:
+        """
+        创建随配置热更新的计算器
+
+        重新加载后，计算器的 SAFETY_RANGES 会被替换为新配置中对应组合的安全范围。
+        """
+        calc = self.config.calculator(plant, unit, season, area)
+        with self._lock:
+            self._bound[calc] = (plant, unit, season)
+        return calc
+
+    def subscribe(self, callback: Callable[[SafetyConfig], None]) -> None:
+        """注册配置更新回调（如清空依赖安全范围的结果缓存）"""
+        self._listeners.append(callback)
+
+    def check(self) -> bool:
+        """
+        检查文件是否变化，变化则重新加载
+
+        Returns:
+            是否加载了新配置
+        """
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        return self.reload()
+
+    def reload(self) -> bool:
+        """
+        重新加载配置；校验失败时保留旧配置
+
+        Returns:
+            是否加载了新配置
+        """
+        with self._lock:
+            try:
+                config = SafetyConfig.from_file(self.path, generation=self.config.generation + 1)
+                # 已绑定的计算器在新配置中必须仍有对应的厂 / 单元 / 季节
+                bound = [(calc, config.resolve(*key)) for calc, key in list(self._bound.items())]
+            except Exception as e:
+                self.last_error = e
+                print(f"⚠️ 安全范围配置加载失败，继续使用旧配置: {e}")
+                return False
+            self.config = config
+            for calc, ranges in bound:
+                calc.SAFETY_RANGES = ranges
+        self.last_error = None
+        for callback in list(self._listeners):
+            callback(config)
+        print(f"✓ 安全范围配置已重新加载: {self.path}（版本 {config.generation}）")
+        return True
+
+    def start(self) -> None:
+        """启动后台轮询线程"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='safety-config-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止后台轮询"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.check()
@@ -0,0 +1,533 @@
+"""
+情景分析引擎 - 大批量 what-if 情景的编译、批量评估与风险排序
+
+情景定义为字典，可以是单个情景，也可以是参数化的情景族（参数取多个值时
+按笛卡尔积展开）。所有情景先编译成列式数组，再一次性批量评估，
+最后按风险排序，只把前 N 个情景和汇总写入 Excel。
+
+情景定义的键：
+    'name':        情景（族）名称，必填
+    'mlss':        基准 MLSS (mg/L)
+    'flow':        基准流量 (L/s)；配置了 PlantModel 时为全厂流量
+    'flow_factor': 流量冲击倍数，默认 1
+    'mlss_factor': 排泥调整后的 MLSS 倍数，默认 1
+    'mlss_delta':  排泥调整后的 MLSS 增量 (mg/L)，默认 0
+    'offline':     停运单元编号列表（需要 PlantModel）；
+                   {'values': [[...], [...]]} 为多种停运组合，'each' 为逐个停运每个单元
+
+数值参数的取值方式：
+    3500                                    单个值
+    [3000, 3500, 4000]                      多个值
+    {'start': 100, 'stop': 200, 'step': 10} 等差序列（含终点）
+    {'linspace': [100, 200, 11]}            等分序列
+
+风险评分按参数位置连续计算：最优区间内为 0，在最优区间与安全边界之间线性
+增至 1，超出安全范围后继续增大；情景风险取所有参数（和在运单元）中的最大值，
+因此风险 > 1 即不安全。
+
+使用示例：
+    engine = ScenarioEngine(WastewaterCalculator(area=100))
+    results = engine.run([
+        {'name': '基准', 'mlss': 3500, 'flow': 100},
+        {'name': '流量冲击', 'mlss': 3500, 'flow': 100,
+         'flow_factor': {'start': 1.0, 'stop': 1.8, 'step': 0.05}},
+        {'name': '排泥调整', 'mlss': [3000, 3500, 4000], 'flow': 100,
+         'mlss_factor': {'linspace': [0.8, 1.2, 9]}},
+    ])
+    results.top(10)
+    results.to_excel('情景分析.xlsx', top_n=50)
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from openpyxl import Workbook
+from openpyxl.styles import PatternFill, Font, Alignment
+from openpyxl.utils import get_column_letter
+
+from plant_model import PlantModel
+from profiling import stage
+from wastewater_treatment_calc import STATUS_NAMES, WastewaterCalculator
+
+# 数值参数及其默认值
+NUMERIC_PARAMS = {
+    'mlss': None,
+    'flow': None,
+    'flow_factor': 1.0,
+    'mlss_factor': 1.0,
+    'mlss_delta': 0.0,
+}
+
+SCENARIO_KEYS = ('name', 'offline') + tuple(NUMERIC_PARAMS)
+
+
+def expand_values(spec) -> np.ndarray:
+    """
+    展开数值参数的取值
+
+    Args:
+        spec: 单个值、值列表、{'start', 'stop', 'step'}、{'linspace': [起, 止, 个数]}
+              或 {'values': [...]}
+
+    Returns:
+        float64 数组
+    """
+    if isinstance(spec, dict):
+        if 'values' in spec:
+            values = np.asarray(spec['values'], dtype=np.float64)
+        elif 'linspace' in spec:
+            start, stop, num = spec['linspace']
+            values = np.linspace(start, stop, int(num))
+        elif {'start', 'stop', 'step'} <= spec.keys():
+            start, stop, step = float(spec['start']), float(spec['stop']), float(spec['step'])
+            if step <= 0:
+                raise ValueError(f'步长必须为正数: {step}')
+            count = int(np.floor((stop - start) / step + 1e-9)) + 1
+            # 取整消除累积的浮点误差（如 1.0 + 0.05 × 14）
+            values = np.round(start + step * np.arange(max(count, 0)), 12)
+        else:
+            raise ValueError(f'无法识别的取值定义: {spec}')
+    else:
+        values = np.atleast_1d(np.asarray(spec, dtype=np.float64))
+
+    if values.ndim != 1 or len(values) == 0:
+        raise ValueError(f'取值必须为非空的一维序列: {spec}')
+    return values
+
+
+def risk_score(calculator: WastewaterCalculator, param_name: str, values) -> np.ndarray:
+    """
+    参数的连续风险评分
+
+    最优区间内为 0，到安全边界时为 1，超出安全范围后按同一斜率继续增大；
+    NaN 视为无穷大风险。
+
+    Args:
+        calculator: 提供安全范围的计算器
+        param_name: 参数名称
+        values: 参数值数组
+
+    Returns:
+        float64 数组
+    """
+    ranges = calculator.SAFETY_RANGES.get(param_name)
+    if not ranges:
+        raise ValueError(f'未知参数: {param_name}')
+
+    values = np.asarray(values, dtype=np.float64)
+    low, high = ranges['optimal']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        below = (low - values) / (low - ranges['min'])
+        above = (values - high) / (ranges['max'] - high)
+    risk = np.fmax(np.fmax(below, above), 0.0)
+    return np.where(np.isnan(values), np.inf, risk)
+
+
+@dataclass
+class ScenarioBatch:
+    """编译后的情景批（列式）"""
+    families: List[str]               # 情景族名称
+    varying: List[List[str]]          # 每个情景族中取多个值的参数
+    family: np.ndarray                # int32，情景所属情景族的下标
+    params: Dict[str, np.ndarray]     # 数值参数列
+    outages: List[tuple]              # 停运组合（单元编号元组）
+    outage: np.ndarray                # int32，情景对应的停运组合下标
+
+    def __len__(self) -> int:
+        return len(self.family)
+
+    def name(self, i: int) -> str:
+        """第 i 个情景的名称：情景族名称加上取多个值的参数"""
+        f = int(self.family[i])
+        parts = []
+        for key in self.varying[f]:
+            if key == 'offline':
+                outage = self.outages[int(self.outage[i])]
+                parts.append(f"停运={'/'.join(outage) if outage else '无'}")
+            else:
+                parts.append(f'{key}={self.params[key][i]:g}')
+        return f"{self.families[f]} [{', '.join(parts)}]" if parts else self.families[f]
+
+
+class ScenarioEngine:
+    """情景分析引擎"""
+
+    def __init__(self, calculator: WastewaterCalculator = None, plant: PlantModel = None):
+        """
+        Args:
+            calculator: 提供面积和安全范围的计算器，默认 WastewaterCalculator()；
+                        配置了 plant 时使用 plant 的计算器
+            plant: 多单元模型；配置后 'flow' 为全厂流量，并支持 'offline' 停运情景
+        """
+        self.plant = plant
+        if plant is not None:
+            self.calculator = plant.calculator
+        else:
+            self.calculator = calculator or WastewaterCalculator(area=1.0)
+
+    # ------------------------------------------------------------------
+    # 编译
+    # ------------------------------------------------------------------
+
+    def compile(self, definitions: Sequence[dict]) -> ScenarioBatch:
+        """
+        将情景定义编译成列式数组
+
+        Args:
+            definitions: 情景定义列表（见模块说明）
+
+        Returns:
+            ScenarioBatch
+        """
+        families, varying = [], []
+        family_cols, outage_cols = [], []
+        param_cols = {key: [] for key in NUMERIC_PARAMS}
+        outages, outage_index = [], {}
+
+        for f, definition in enumerate(definitions):
+            name = definition.get('name')
+            if not name:
+                raise ValueError(f'第 {f + 1} 个情景缺少名称')
+            unknown = set(definition) - set(SCENARIO_KEYS)
+            if unknown:
+                raise ValueError(f'情景 {name} 含未知参数: {sorted(unknown)}')
+
+            axes = {}
+            for key, default in NUMERIC_PARAMS.items():
+                spec = definition.get(key, default)
+                if spec is None:
+                    raise ValueError(f'情景 {name} 缺少参数: {key}')
+                axes[key] = expand_values(spec)
+
+            outage_ids = []
+            for outage in self._expand_outages(name, definition.get('offline')):
+                if outage not in outage_index:
+                    outage_index[outage] = len(outages)
+                    outages.append(outage)
+                outage_ids.append(outage_index[outage])
+            axes['offline'] = np.asarray(outage_ids, dtype=np.int32)
+
+            # 笛卡尔积展开
+            grids = np.meshgrid(*axes.values(), indexing='ij')
+            columns = dict(zip(axes, (grid.ravel() for grid in grids)))
+            count = len(columns['offline'])
+
+            families.append(name)
+            varying.append([key for key, values in axes.items() if len(values) > 1])
+            family_cols.append(np.full(count, f, dtype=np.int32))
+            outage_cols.append(columns.pop('offline').astype(np.int32))
+            for key in NUMERIC_PARAMS:
+                param_cols[key].append(columns[key])
+
+        if not families:
+            raise ValueError('没有情景定义')
+
+        return ScenarioBatch(
+            families=families,
+            varying=varying,
+            family=np.concatenate(family_cols),
+            params={key: np.concatenate(cols) for key, cols in param_cols.items()},
+            outages=outages,
+            outage=np.concatenate(outage_cols),
+        )
+
+    def _expand_outages(self, name: str, spec) -> List[tuple]:
+        if spec is None:
+            return [()]
+        if self.plant is None:
+            raise ValueError(f'情景 {name} 含停运单元，需要配置 PlantModel')
+
+        unit_ids = self.plant.unit_ids
+        if spec == 'each':
+            combos = [(unit_id,) for unit_id in unit_ids]
+        elif isinstance(spec, dict):
+            combos = [tuple(combo) for combo in spec.get('values', [])]
+        else:
+            combos = [tuple(spec)]
+
+        if not combos:
+            raise ValueError(f'情景 {name} 的停运组合为空')
+        for combo in combos:
+            unknown = set(combo) - set(unit_ids)
+            if unknown:
+                raise KeyError(f'情景 {name} 含未知处理单元: {sorted(unknown)}')
+        return [tuple(sorted(combo, key=unit_ids.index)) for combo in combos]
+
+    # ------------------------------------------------------------------
+    # 评估
+    # ------------------------------------------------------------------
+
+    def evaluate(self, batch: ScenarioBatch) -> 'ScenarioResults':
+        """
+        一次性批量评估所有情景
+
+        Args:
+            batch: compile 的返回值
+
+        Returns:
+            ScenarioResults
+        """
+        calc = self.calculator
+        p = batch.params
+        mlss = p['mlss'] * p['mlss_factor'] + p['mlss_delta']
+        flow = p['flow'] * p['flow_factor']
+
+        with stage('scenario_evaluate', category='analyse', rows=len(batch)):
+            if self.plant is None:
+                check = calc.check_operating_points(mlss, flow)
+                risk = np.max([
+                    risk_score(calc, 'mlss', mlss),
+                    risk_score(calc, 'equivalent_flow', flow),
+                    risk_score(calc, 'slr', check['calculated_slr']),
+                ], axis=0)
+                columns = {
+                    'mlss': mlss,
+                    'flow': flow,
+                    'slr': check['calculated_slr'],
+                    'mlss_status': check['mlss_status'],
+                    'flow_status': check['flow_status'],
+                    'slr_status': check['slr_status'],
+                    'safe': check['overall_safe'],
+                    'risk': risk,
+                }
+            else:
+                columns = self._evaluate_plant(batch, mlss, flow)
+
+        return ScenarioResults(batch, columns, unit_ids=None if self.plant is None
+                               else self.plant.unit_ids)
+
+    def _evaluate_plant(self, batch: ScenarioBatch, mlss: np.ndarray,
+                        flow: np.ndarray) -> Dict[str, np.ndarray]:
+        plant = self.plant
+        calc = self.calculator
+
+        # 停运组合 -> 运行状态矩阵（在当前运行状态基础上再停运）
+        offline = np.zeros((len(batch.outages), len(plant.units)), dtype=bool)
+        index = {unit_id: i for i, unit_id in enumerate(plant.unit_ids)}
+        for k, outage in enumerate(batch.outages):
+            offline[k, [index[unit_id] for unit_id in outage]] = True
+        in_service = (~offline & plant.in_service)[batch.outage]
+
+        result = plant.evaluate(flow, mlss, in_service=in_service)
+        unit_mlss = np.broadcast_to(mlss[:, None], result['unit_flow'].shape)
+        unit_risk = np.max([
+            risk_score(calc, 'mlss', unit_mlss),
+            risk_score(calc, 'equivalent_flow', result['unit_flow']),
+            risk_score(calc, 'slr', result['slr']),
+        ], axis=0)
+        # 停运单元不参与评分；全部停运视为无穷大风险
+        unit_risk = np.where(in_service, unit_risk, -np.inf)
+        worst = np.argmax(unit_risk, axis=1)
+        risk = np.take_along_axis(unit_risk, worst[:, None], axis=1)[:, 0]
+        risk = np.where(in_service.any(axis=1), risk, np.inf)
+
+        def at_worst(values):
+            return np.take_along_axis(values, worst[:, None], axis=1)[:, 0]
+
+        return {
+            'mlss': mlss,
+            'flow': flow,
+            'slr': at_worst(result['slr']),
+            'mlss_status': at_worst(result['mlss_status']),
+            'flow_status': at_worst(result['flow_status']),
+            'slr_status': at_worst(result['slr_status']),
+            'safe': result['plant_safe'],
+            'risk': risk,
+            'worst_unit': worst.astype(np.int32),
+            'worst_flow': at_worst(result['unit_flow']),
+            'units_in_service': in_service.sum(axis=1).astype(np.int32),
+        }
+
+    def run(self, definitions: Sequence[dict]) -> 'ScenarioResults':
+        """编译并评估情景定义"""
+        with stage('scenario_compile', category='analyse'):
+            batch = self.compile(definitions)
+        return self.evaluate(batch)
+
+
+class ScenarioResults:
+    """情景评估结果（列式），支持风险排序、取前 N 个和按情景族汇总"""
+
+    def __init__(self, batch: ScenarioBatch, columns: Dict[str, np.ndarray],
+                 unit_ids: Optional[List[str]] = None):
+        self.batch = batch
+        self.columns = columns
+        self.unit_ids = unit_ids
+        self._order = None
+
+    def __len__(self) -> int:
+        return len(self.batch)
+
+    @property
+    def order(self) -> np.ndarray:
+        """按风险从高到低排序的情景下标（风险相同时保持定义顺序）"""
+        if self._order is None:
+            self._order = np.argsort(-self.columns['risk'], kind='stable')
+        return self._order
+
+    def row(self, i: int) -> dict:
+        """第 i 个情景的结果"""
+        c = self.columns
+        row = {
+            'scenario': self.batch.name(i),
+            'family': self.batch.families[int(self.batch.family[i])],
+            'mlss': float(c['mlss'][i]),
+            'flow': float(c['flow'][i]),
+            'slr': float(c['slr'][i]),
+            'mlss_status': STATUS_NAMES[c['mlss_status'][i]],
+            'flow_status': STATUS_NAMES[c['flow_status'][i]],
+            'slr_status': STATUS_NAMES[c['slr_status'][i]],
+            'safe': bool(c['safe'][i]),
+            'risk': float(c['risk'][i]),
+        }
+        if self.unit_ids is not None:
+            row['worst_unit'] = self.unit_ids[int(c['worst_unit'][i])]
+            row['worst_flow'] = float(c['worst_flow'][i])
+            row['units_in_service'] = int(c['units_in_service'][i])
+        return row
+
+    def top(self, n: int = 10, unsafe_only: bool = False) -> List[dict]:
+        """
+        风险最高的 n 个情景
+
+        Args:
+            n: 个数
+            unsafe_only: 只返回不安全的情景
+        """
+        order = self.order
+        if unsafe_only:
+            order = order[~self.columns['safe'][order]]
+        return [self.row(i) for i in order[:n].tolist()]
+
+    def summary(self) -> List[dict]:
+        """
+        按情景族汇总
+
+        Returns:
+            [{'family', 'scenarios', 'unsafe', 'optimal', 'max_risk', 'mean_risk', 'worst'}]
+        """
+        batch = self.batch
+        c = self.columns
+        n_families = len(batch.families)
+        family = batch.family
+
+        counts = np.bincount(family, minlength=n_families)
+        unsafe = np.bincount(family, weights=~c['safe'], minlength=n_families)
+        optimal = np.bincount(family, weights=c['risk'] == 0, minlength=n_families)
+        finite = np.isfinite(c['risk'])
+        risk_sum = np.bincount(family, weights=np.where(finite, c['risk'], 0.0),
+                               minlength=n_families)
+        finite_count = np.bincount(family, weights=finite, minlength=n_families)
+
+        # 每个情景族中风险最高的情景：排序后每族第一次出现的位置
+        ranked_family = family[self.order]
+        _, first = np.unique(ranked_family, return_index=True)
+        worst = dict(zip(ranked_family[first].tolist(), self.order[first].tolist()))
+
+        rows = []
+        for f, name in enumerate(batch.families):
+            i = worst[f]
+            rows.append({
+                'family': name,
+                'scenarios': int(counts[f]),
+                'unsafe': int(unsafe[f]),
+                'optimal': int(optimal[f]),
+                'max_risk': float(c['risk'][i]),
+                'mean_risk': float(risk_sum[f] / finite_count[f]) if finite_count[f] else float('inf'),
+                'worst': batch.name(i),
+            })
+        return rows
+
+    def to_excel(self, output_file: str, top_n: int = 50, unsafe_only: bool = False) -> None:
+        """
+        只把前 N 个情景和汇总写入 Excel
+
+        Args:
+            output_file: 输出文件路径
+            top_n: 写出的情景数
+            unsafe_only: 只写出不安全的情景
+        """
+        top_rows = self.top(top_n, unsafe_only=unsafe_only)
+        with stage('scenario_excel', category='export', rows=len(top_rows)):
+            write_scenario_workbook(output_file, top_rows, self.summary(),
+                                    with_units=self.unit_ids is not None)
+        print(f"✓ 情景分析 Excel 已保存: {output_file}（{len(self)} 个情景，写出前 {len(top_rows)} 个）")
+
+
+def _write_header(ws, headers: list) -> None:
+    for col_idx, header in enumerate(headers, start=1):
+        cell = ws.cell(row=1, column=col_idx, value=header)
+        cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+
+
+def write_scenario_workbook(output_file: str, top_rows: List[dict], summary_rows: List[dict],
+                            with_units: bool = False) -> None:
+    """
+    写出情景分析 Excel（风险排序 + 情景族汇总）
+
+    Args:
+        output_file: 输出文件路径
+        top_rows: ScenarioResults.top 的返回值
+        summary_rows: ScenarioResults.summary 的返回值
+        with_units: 是否包含多单元列（最不利单元、在运单元数）
+    """
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "风险排序"
+
+    if with_units:
+        keys = ['scenario', 'mlss', 'flow', 'units_in_service', 'worst_unit', 'worst_flow']
+        headers = ['场景', 'MLSS (mg/L)', '全厂流量 (L/s)', '在运单元数', '最不利单元',
+                   '单元流量 (L/s)']
+    else:
+        keys = ['scenario', 'mlss', 'flow']
+        headers = ['场景', 'MLSS (mg/L)', 'Equivalent (L/s)']
+    keys += ['slr', 'mlss_status', 'flow_status', 'slr_status', 'risk', 'safe']
+    headers += ['SLR (kg/h/m²)', 'MLSS 状态', 'Flow 状态', 'SLR 状态', '风险', '整体安全']
+    _write_header(ws, ['排名'] + headers)
+
+    safe_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+    unsafe_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+    for row_idx, row in enumerate(top_rows, start=2):
+        values = [row_idx - 1] + [row[key] for key in keys]
+        for col_idx, value in enumerate(values, start=1):
+            key = keys[col_idx - 2] if col_idx > 1 else None
+            if key == 'safe':
+                value = '✓' if value else '✗'
+            elif key in ('slr', 'worst_flow', 'risk') and np.isfinite(value):
+                value = round(value, 2)
+            elif isinstance(value, float) and not np.isfinite(value):
+                value = str(value)
+            cell = ws.cell(row=row_idx, column=col_idx, value=value)
+            cell.alignment = Alignment(horizontal="center")
+            if key == 'safe':
+                cell.fill = safe_fill if row['safe'] else unsafe_fill
+
+    ws.column_dimensions['A'].width = 8
+    ws.column_dimensions['B'].width = 40
+    for col in range(3, len(headers) + 2):
+        ws.column_dimensions[get_column_letter(col)].width = 16
+    ws.freeze_panes = 'A2'
+
+    # 汇总
+    ws = wb.create_sheet("汇总")
+    summary_keys = ['family', 'scenarios', 'unsafe', 'optimal', 'max_risk', 'mean_risk', 'worst']
+    _write_header(ws, ['情景族', '情景数', '不安全', '最优', '最高风险', '平均风险', '最不利情景'])
+    for row_idx, row in enumerate(summary_rows, start=2):
+        for col_idx, key in enumerate(summary_keys, start=1):
+            value = row[key]
+            if isinstance(value, float):
+                value = round(value, 2) if np.isfinite(value) else str(value)
+            cell = ws.cell(row=row_idx, column=col_idx, value=value)
+            cell.alignment = Alignment(horizontal="center")
+
+    ws.column_dimensions['A'].width = 20
+    for col in range(2, 7):
+        ws.column_dimensions[get_column_letter(col)].width = 12
+    ws.column_dimensions['G'].width = 40
+
+    wb.save(output_file)
@@ -0,0 +1,245 @@
+"""
+传感器数据质量预检 - 在批量检查前标记异常读数
+
+在数据进入 calculate_slr / check_operating_points 之前，对每个单元的每个传感器
+（MLSS、流量）按时间顺序检查：
+- missing：缺失（NaN）
+- out_of_range：超出物理量程
+- zero：读数为零（流量计掉线）
+- flatline：读数长时间完全不变（传感器卡死）
+- rate_of_change：相对上一个正常读数的变化率超限（尖峰、跳变）
+
+每个传感器只保存常数大小的状态（上一个读数、上一个正常读数、不变段起点），
+批内按 (传感器, 时间) 排序后全部向量化计算，可直接串在数据入口处。
+输出的质量掩码可传给 check_operating_points(valid=...)，异常读数不会产生误报，
+也不会被当作安全。
+
+使用示例：
+    quality = SensorQualityFilter()
+    flags = quality.check(unit_ids, timestamps, mlss=mlss, equivalent_flow=flow)
+    result = calc.check_operating_points(mlss, flow, valid=flags['valid'])
+    describe_flags(flags['mlss'][0])      # ['flatline']
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from historian import to_epoch_seconds
+
+# 质量标志位（uint8，可组合）
+QUALITY_FLAGS = {
+    'missing': 1,
+    'out_of_range': 2,
+    'zero': 4,
+    'flatline': 8,
+    'rate_of_change': 16,
+}
+
+@dataclass
+class SensorLimits:
+    """单个传感器类型的检查阈值"""
+    low: float                          # 物理量程下限
+    high: float                         # 物理量程上限
+    max_rate: float                     # 最大变化率（单位/秒）
+    flatline_seconds: float             # 读数不变超过该时长判为卡死（秒）
+    flatline_tolerance: float = 0.0     # 视为“不变”的最大差值
+    zero_is_fault: bool = False         # 读数为 0 是否视为故障
+
+
+DEFAULT_LIMITS = {
+    # MLSS 探头：0-20000 mg/L，每分钟变化不超过 100 mg/L，1 小时读数完全不变视为卡死
+    'mlss': SensorLimits(low=0.0, high=20000.0, max_rate=100.0 / 60, flatline_seconds=3600.0),
+    # 流量计：0-1000 L/s，每分钟变化不超过 30 L/s，2 小时不变视为卡死，读数为 0 视为掉线
+    'equivalent_flow': SensorLimits(low=0.0, high=1000.0, max_rate=30.0 / 60,
+                                    flatline_seconds=7200.0, zero_is_fault=True),
+}
+
+
+def describe_flags(flags: int) -> List[str]:
+    """质量标志位 -> 名称列表"""
+    return [name for name, bit in QUALITY_FLAGS.items() if int(flags) & bit]
+
+
+def _last_index(mask: np.ndarray, group_start: np.ndarray, exclusive: bool = False) -> np.ndarray:
+    """
+    每个位置之前（exclusive 时不含自身）同组内最近一个 mask 为真的位置，没有则为 -1
+    """
+    pos = np.arange(len(mask))
+    last = np.maximum.accumulate(np.where(mask, pos, -1)) if len(mask) else pos
+    if exclusive:
+        last = np.concatenate([[-1], last[:-1]]).astype(pos.dtype)
+    return np.where(last >= group_start, last, -1)
+
+
+class SensorQualityFilter:
+    """流式传感器质量检查（每个传感器常数大小的状态）"""
+
+    def __init__(self, limits: Optional[Dict[str, SensorLimits]] = None):
+        """
+        Args:
+            limits: {变量名: SensorLimits}，默认 DEFAULT_LIMITS
+        """
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self._index: Dict[str, int] = {}
+        self.unit_ids: List[str] = []
+        # 每个变量的状态数组，按单元下标存放
+        self._state = {name: self._empty_state(0) for name in self.limits}
+
+    @staticmethod
+    def _empty_state(n: int) -> Dict[str, np.ndarray]:
+        return {
+            'last_value': np.full(n, np.nan),    # 上一个非缺失读数
+            'good_value': np.full(n, np.nan),    # 上一个正常读数
+            'good_time': np.full(n, np.nan),
+            'run_start': np.full(n, np.nan),     # 当前不变段的起始时间
+        }
+
+    def _unit_indices(self, unit_ids) -> np.ndarray:
+        # 只对不同的单元编号做字典查找
+        uniques, inverse = np.unique(np.atleast_1d(np.asarray(unit_ids)), return_inverse=True)
+        uniques = [str(u) for u in uniques.tolist()]
+        new = [u for u in uniques if u not in self._index]
+        if new:
+            for unit in new:
+                self._index[unit] = len(self.unit_ids)
+                self.unit_ids.append(unit)
+            grow = self._empty_state(len(new))
+            for state in self._state.values():
+                for key in state:
+                    state[key] = np.concatenate([state[key], grow[key]])
+        return np.array([self._index[u] for u in uniques], dtype=np.intp)[inverse.ravel()]
+
+    def reset(self, unit_id: str = None) -> None:
+        """清除某个单元（默认全部）的状态，如传感器校准或更换后"""
+        if unit_id is None:
+            self._index.clear()
+            self.unit_ids = []
+            self._state = {name: self._empty_state(0) for name in self.limits}
+            return
+        idx = self._index.get(str(unit_id))
+        if idx is None:
+            raise KeyError(f'未知处理单元: {unit_id}')
+        for state in self._state.values():
+            for values in state.values():
+                values[idx] = np.nan
+
+    def snapshot(self) -> Dict:
+        """当前各传感器状态的副本（大小与单元数成正比），供 restore 回滚"""
+        return {
+            'index': dict(self._index),
+            'unit_ids': list(self.unit_ids),
+            'state': {name: {key: values.copy() for key, values in state.items()}
+                      for name, state in self._state.items()},
+        }
+
+    def restore(self, snapshot: Dict) -> None:
+        """恢复到 snapshot 时的状态（如检查后的数据未能写入时）"""
+        self._index = dict(snapshot['index'])
+        self.unit_ids = list(snapshot['unit_ids'])
+        self._state = {name: {key: values.copy() for key, values in state.items()}
+                       for name, state in snapshot['state'].items()}
+
+    def check(self, unit_ids, timestamps, **columns) -> Dict[str, np.ndarray]:
+        """
+        检查一批读数并更新各传感器状态
+
+        同一单元的读数须按时间先后送入（批内可乱序，批与批之间按时间递增）。
+
+        Args:
+            unit_ids: 单元编号（单个值或与数据等长的数组）
+            timestamps: 时间戳数组（见 historian.to_epoch_seconds）
+            **columns: 变量名（如 mlss、equivalent_flow）-> 读数数组
+
+        Returns:
+            {变量名: uint8 质量标志数组, 'valid': 所有变量都无异常的 bool 数组}
+        """
+        unknown = set(columns) - set(self.limits)
+        if unknown:
+            raise ValueError(f'没有检查阈值的变量: {sorted(unknown)}')
+
+        t = np.atleast_1d(to_epoch_seconds(timestamps)).astype(np.float64)
+        n = len(t)
+        units = np.broadcast_to(self._unit_indices(unit_ids), (n,))
+
+        # 按 (单元, 时间) 稳定排序，组内顺序即时间顺序
+        order = np.lexsort((t, units))
+        sensor = units[order]
+        t_sorted = t[order]
+        pos = np.arange(n)
+        boundary = np.ones(n, dtype=bool)
+        boundary[1:] = sensor[1:] != sensor[:-1]
+        group_start = np.maximum.accumulate(np.where(boundary, pos, 0)) if n else pos
+        group_end = np.flatnonzero(np.append(boundary[1:], True)) if n else pos
+
+        result = {}
+        valid = np.ones(n, dtype=bool)
+        for name, values in columns.items():
+            values = np.broadcast_to(np.asarray(values, dtype=np.float64), (n,))[order]
+            flags = self._check_variable(name, sensor, t_sorted, values, group_start, group_end)
+            out = np.empty(n, dtype=np.uint8)
+            out[order] = flags
+            result[name] = out
+            valid &= out == 0
+        result['valid'] = valid
+        return result
+
+    def _check_variable(self, name: str, sensor: np.ndarray, t: np.ndarray, v: np.ndarray,
+                        group_start: np.ndarray, group_end: np.ndarray) -> np.ndarray:
+        limits = self.limits[name]
+        state = self._state[name]
+        pos = np.arange(len(v))
+
+        missing = ~np.isfinite(v)
+        with np.errstate(invalid='ignore'):
+            out_of_range = ~missing & ((v < limits.low) | (v > limits.high))
+            zero = ~missing & (v == 0) if limits.zero_is_fault else np.zeros(len(v), dtype=bool)
+        base_ok = ~(missing | out_of_range | zero)
+
+        # 变化率：相对同一传感器上一个正常读数（批首取状态中的读数）。
+        # 参照点取决于前面读数的判定，迭代到判定不再变化为止：每轮至少多确定每组的一个读数，
+        # 不动点与逐个样本顺序检查的结果相同，通常几轮即收敛
+        ok = base_ok
+        while True:
+            prev = _last_index(ok, group_start, exclusive=True)
+            ref_v = np.where(prev >= 0, v[prev], state['good_value'][sensor])
+            ref_t = np.where(prev >= 0, t[prev], state['good_time'][sensor])
+            dt = t - ref_t
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rate = np.abs(v - ref_v) / dt
+                rate_violation = base_ok & (dt > 0) & (rate > limits.max_rate)
+            new_ok = base_ok & ~rate_violation
+            if np.array_equal(new_ok, ok):
+                break
+            ok = new_ok
+
+        # 卡死：与上一个非缺失读数相同的连续段持续时间
+        prev = _last_index(~missing, group_start, exclusive=True)
+        prev_v = np.where(prev >= 0, v[prev], state['last_value'][sensor])
+        with np.errstate(invalid='ignore'):
+            same = missing | (np.abs(v - prev_v) <= limits.flatline_tolerance)
+        start = np.where(same, state['run_start'][sensor], t)
+        anchor = ~same | (pos == group_start)
+        run_start = start[np.maximum.accumulate(np.where(anchor, pos, -1))] if len(v) else start
+        with np.errstate(invalid='ignore'):
+            flatline = ~missing & same & (t - run_start >= limits.flatline_seconds)
+
+        # 更新状态：取每个传感器批内最后一个位置
+        units = sensor[group_end]
+        last = _last_index(~missing, group_start)[group_end]
+        has = last >= 0
+        state['last_value'][units[has]] = v[last[has]]
+        run_at_end = run_start[group_end]
+        state['run_start'][units] = np.where(has, run_at_end, state['run_start'][units])
+        good = _last_index(ok, group_start)[group_end]
+        has = good >= 0
+        state['good_value'][units[has]] = v[good[has]]
+        state['good_time'][units[has]] = t[good[has]]
+
+        flags = (missing * QUALITY_FLAGS['missing']
+                 | out_of_range * QUALITY_FLAGS['out_of_range']
+                 | zero * QUALITY_FLAGS['zero']
+                 | flatline * QUALITY_FLAGS['flatline']
+                 | rate_violation * QUALITY_FLAGS['rate_of_change'])
+        return flags.astype(np.uint8)
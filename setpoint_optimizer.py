@@ -0,0 +1,178 @@
+"""
+运行设定值优化 - 求回到最优区间所需的最小调整
+
+对每个运行点，在可调变量（MLSS 和/或流量）范围内，求使 MLSS、流量和 SLR
+同时落入目标区间（默认最优区间）的最小调整量；无解时标记为不可行。
+
+由于 SLR = k × MLSS × 流量（k = 3.6 / (1000 × 面积)），取对数后约束全部是线性的：
+    ln MLSS ∈ [a1, b1]，ln 流量 ∈ [a2, b2]，ln MLSS + ln 流量 ∈ [c1 - ln k, c2 - ln k]
+以对数距离（即相对变化）为目标，问题变为平面上到凸多边形的投影，
+可以对整批数据用闭式解一次求出：
+1. 先投影到矩形区域（逐变量截断）；若 SLR 约束已满足即为最优解；
+2. 否则最优解在越界一侧的 SLR 边界线上，沿该直线投影并截断到矩形内；
+   截断区间为空时不可行。
+
+使用示例：
+    optimizer = SetpointOptimizer(WastewaterCalculator(area=100))
+    result = optimizer.optimize(mlss_array, flow_array, controls=('mlss',))
+    result['target_mlss'], result['feasible']
+"""
+
+from typing import Dict, Sequence
+
+import numpy as np
+
+from wastewater_treatment_calc import STATUS_CODES, WastewaterCalculator
+
+CONTROLS = ('mlss', 'flow')
+
+# 计算目标值时将区间向内收缩的相对量，避免舍入误差使结果恰好落在区间外
+_BAND_MARGIN = 1e-9
+
+
+class SetpointOptimizer:
+    """批量设定值优化器"""
+
+    def __init__(self, calculator: WastewaterCalculator = None):
+        """
+        Args:
+            calculator: 提供面积和安全范围的计算器，默认 WastewaterCalculator()
+        """
+        self.calculator = calculator or WastewaterCalculator(area=1.0)
+
+    def _band(self, param_name: str, band: str) -> tuple:
+        ranges = self.calculator.SAFETY_RANGES[param_name]
+        if band == 'optimal':
+            low, high = ranges['optimal']
+        elif band == 'safe':
+            low, high = ranges['min'], ranges['max']
+        else:
+            raise ValueError(f'未知目标区间: {band}')
+        return float(low), float(high)
+
+    def _log_band(self, param_name: str, band: str) -> tuple:
+        low, high = self._band(param_name, band)
+        return np.log(low * (1 + _BAND_MARGIN)), np.log(high * (1 - _BAND_MARGIN))
+
+    def optimize(self, mlss, equivalent_flow, controls: Sequence[str] = CONTROLS,
+                 band: str = 'optimal', weights: Sequence[float] = (1.0, 1.0)) -> Dict[str, np.ndarray]:
+        """
+        批量求目标设定值
+
+        Args:
+            mlss: 当前 MLSS 数组 (mg/L)
+            equivalent_flow: 当前等效流量数组 (L/s)
+            controls: 可调变量，'mlss'、'flow' 或两者
+            band: 目标区间，'optimal'（最优区间）或 'safe'（安全范围）
+            weights: 同时调整两者时 MLSS 与流量相对变化的代价权重
+
+        Returns:
+            列式结果字典：
+                {
+                    'target_mlss': 目标 MLSS（不可行时为 NaN）,
+                    'target_flow': 目标流量（不可行时为 NaN）,
+                    'target_slr': 目标 SLR（不可行时为 NaN）,
+                    'delta_mlss': MLSS 调整量,
+                    'delta_flow': 流量调整量,
+                    'feasible': 是否可行,
+                    'changed': 是否需要调整,
+                }
+        """
+        controls = tuple(dict.fromkeys(controls))
+        unknown = [c for c in controls if c not in CONTROLS]
+        if unknown or not controls:
+            raise ValueError(f'可调变量必须是 {CONTROLS} 中的一个或多个: {list(controls)}')
+        w_mlss, w_flow = (float(w) for w in weights)
+        if w_mlss <= 0 or w_flow <= 0:
+            raise ValueError('权重必须为正数')
+
+        calc = self.calculator
+        mlss, flow = np.broadcast_arrays(np.asarray(mlss, dtype=np.float64),
+                                         np.asarray(equivalent_flow, dtype=np.float64))
+        positive = (mlss > 0) & (flow > 0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x0 = np.log(mlss)
+            y0 = np.log(flow)
+
+        a1, b1 = self._log_band('mlss', band)
+        a2, b2 = self._log_band('equivalent_flow', band)
+        # ln SLR = ln k + x + y
+        log_k = np.log(3.6 / 1000 / calc.area)
+        c1, c2 = (v - log_k for v in self._log_band('slr', band))
+
+        # 非正值的对数为 -inf/NaN，这些点最后统一标记为不可行
+        with np.errstate(invalid='ignore'):
+            if 'mlss' in controls and 'flow' in controls:
+                x, y, feasible = _project_both(x0, y0, a1, b1, a2, b2, c1, c2, w_mlss, w_flow)
+            elif 'mlss' in controls:
+                # 流量固定：必须已在区间内，MLSS 的可行区间由 SLR 约束收窄
+                lo = np.maximum(a1, c1 - y0)
+                hi = np.minimum(b1, c2 - y0)
+                feasible = (y0 >= a2) & (y0 <= b2) & (lo <= hi)
+                x, y = np.clip(x0, lo, hi), y0
+            else:
+                lo = np.maximum(a2, c1 - x0)
+                hi = np.minimum(b2, c2 - x0)
+                feasible = (x0 >= a1) & (x0 <= b1) & (lo <= hi)
+                x, y = x0, np.clip(y0, lo, hi)
+
+        feasible = feasible & positive
+
+        # 已在目标区间内的点保持原值
+        in_band = self._in_band(mlss, flow, band)
+        with np.errstate(over='ignore', invalid='ignore'):
+            target_mlss = np.where(in_band, mlss, np.exp(x))
+            target_flow = np.where(in_band, flow, np.exp(y))
+        feasible = feasible | in_band
+        target_mlss = np.where(feasible, target_mlss, np.nan)
+        target_flow = np.where(feasible, target_flow, np.nan)
+
+        return {
+            'target_mlss': target_mlss,
+            'target_flow': target_flow,
+            'target_slr': calc.calculate_slr_batch(target_mlss, target_flow),
+            'delta_mlss': target_mlss - mlss,
+            'delta_flow': target_flow - flow,
+            'feasible': feasible,
+            'changed': feasible & ~in_band,
+        }
+
+    def _in_band(self, mlss: np.ndarray, flow: np.ndarray, band: str) -> np.ndarray:
+        calc = self.calculator
+        if band == 'safe':
+            return (calc.safe_mask_batch('mlss', mlss)
+                    & calc.safe_mask_batch('equivalent_flow', flow)
+                    & calc.safe_mask_batch('slr', calc.calculate_slr_batch(mlss, flow)))
+        optimal = STATUS_CODES['optimal']
+        return ((calc.classify_batch('mlss', mlss) == optimal)
+                & (calc.classify_batch('equivalent_flow', flow) == optimal)
+                & (calc.classify_batch('slr', calc.calculate_slr_batch(mlss, flow)) == optimal))
+
+
+def _project_both(x0, y0, a1, b1, a2, b2, c1, c2, w1, w2):
+    """
+    加权投影到 {a1≤x≤b1, a2≤y≤b2, c1≤x+y≤c2}
+
+    Returns:
+        (x, y, 是否可行)
+    """
+    # 1. 投影到矩形
+    x = np.clip(x0, a1, b1)
+    y = np.clip(y0, a2, b2)
+    s = x + y
+
+    # 2. SLR 约束越界时，最优解在越界一侧的边界线 x + y = c 上
+    c = np.where(s > c2, c2, c1)
+    on_line = (s > c2) | (s < c1)
+
+    # 沿直线的加权投影：x = x0 + t / w1²，y = y0 + t / w2²
+    t = (c - x0 - y0) / (1 / w1 ** 2 + 1 / w2 ** 2)
+    lo = np.maximum(a1, c - b2)
+    hi = np.minimum(b1, c - a2)
+    x_line = np.clip(x0 + t / w1 ** 2, lo, hi)
+
+    x = np.where(on_line, x_line, x)
+    y = np.where(on_line, c - x_line, y)
+    feasible = ~on_line | (lo <= hi)
+    return x, y, feasible
@@ -62,10 +62,23 @@ setup(
     # 包查找
     packages=find_packages(exclude=["tests", "docs", "examples"]),
 
+    # 顶层模块（wastewater-tool 命令行入口及其依赖的模块）
+    py_modules=[
+        "wastewater_cli",
+        "wastewater_treatment_calc",
+        "historian",
+        "profiling",
+        "safety_config",
+        "sensor_quality",
+        "setpoint_optimizer",
+        "units",
+    ],
+
     # 必需依赖
     install_requires=[
         "openpyxl>=3.0.0",
         "xlwings>=0.27.0",
+        "numpy>=1.17",
     ],
 
     # 可选依赖
@@ -94,11 +107,11 @@ setup(
         "Excel分析",
     ],
 
-    # 入口点 (可选)
+    # 入口点
     entry_points={
         "console_scripts": [
             # 可在命令行中运行: wastewater-tool
-            # "wastewater-tool=wastewater_tool.cli:main",
+            "wastewater-tool=wastewater_cli:main",
         ],
     },
 
@@ -0,0 +1,395 @@
+"""
+MLSS 浓度表版本对比 - 按坐标轴对齐后逐格求差
+
+参考表重新标定后，比较新旧两个版本的差异：
+
+    - 两张表都用 parse_mlss_table 解析，按 MLSS（列）和流量（行）坐标对齐，
+      分辨率不同时把旧表双线性插值到新表的网格上，并舍入到表格的小数位数
+    - 一次向量化计算所有单元格的差值、相对差值和 SLR 状态
+    - 报告新增 / 删除的行和列，以及安全状态发生变化的单元格；插值单元格的差值
+      不超过表格舍入误差时不算变化，其状态变化（边界附近的舍入）单独统计
+
+使用示例：
+    diff = diff_mlss_files('MLSS浓度表_旧.xlsx', 'MLSS浓度表.xlsx')      # 内置安全范围
+    # 按厂的 SLR 安全范围判定状态（表中已是 SLR，面积不影响结果）
+    calc = SafetyConfig.from_file('safety_ranges.toml').calculator('A厂')
+    diff = diff_mlss_files('MLSS浓度表_旧.xlsx', 'MLSS浓度表.xlsx', calc)
+    print(diff['summary'])
+    for flip in status_flips(diff):
+        print(flip)
+    write_diff_workbook('浓度表差异.xlsx', diff)
+
+命令行：
+    python table_diff.py 旧表.xlsx 新表.xlsx -o 差异.xlsx --config safety_ranges.toml --plant A厂
+"""
+
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import PatternFill, Font, Alignment
+from openpyxl.utils import get_column_letter
+
+from profiling import stage
+from reference_table import FLOW_TITLE
+from safety_config import SafetyConfig
+from wastewater_treatment_calc import STATUS_CODES, STATUS_NAMES, WastewaterCalculator
+
+DIFF_SHEET = 'SLR差值'
+FLIPS_SHEET = '状态变化'
+AXES_SHEET = '行列增删'
+
+# 坐标轴取值视为相同的容差
+AXIS_TOLERANCE = 1e-6
+# 差值绝对值超过该值才算“变化”（参考表保留两位小数）
+DEFAULT_TOLERANCE = 0.005
+# 推断表格小数位数时检查的最大位数
+MAX_DECIMALS = 6
+
+
+def table_grid(table_info: Dict) -> tuple:
+    """
+    把 parse_mlss_table 的结果整理为按坐标排序的网格
+
+    重复的 MLSS 或流量取第一次出现的列 / 行，缺失的单元格为 NaN。
+
+    Returns:
+        (MLSS 坐标, 流量坐标, SLR 网格 (流量数, MLSS 数))
+    """
+    if 'error' in table_info:
+        raise ValueError(f"无法解析 MLSS 浓度表: {table_info['error']}")
+    mlss = np.asarray(table_info['mlss_values'], dtype=np.float64)
+    rows = table_info['slr_data']
+    flow = np.asarray(table_info['equivalent_values'][:len(rows)], dtype=np.float64)
+
+    grid = np.full((len(flow), len(mlss)), np.nan)
+    for i, row in enumerate(rows[:len(flow)]):
+        grid[i, :len(row)] = row[:len(mlss)]
+
+    mlss_sorted, col_idx = np.unique(mlss, return_index=True)
+    flow_sorted, row_idx = np.unique(flow, return_index=True)
+    return mlss_sorted, flow_sorted, grid[np.ix_(row_idx, col_idx)]
+
+
+def _interp_weights(axis: np.ndarray, points: np.ndarray) -> tuple:
+    """
+    线性插值的左右下标和权重
+
+    Returns:
+        (左下标, 右下标, 右侧权重, 是否在坐标范围内, 是否与坐标点重合)
+    """
+    exact = np.isclose(points[:, None], axis[None, :], rtol=0, atol=AXIS_TOLERANCE)
+    is_exact = exact.any(axis=1)
+    if len(axis) < 2:
+        zeros = np.zeros(len(points), dtype=np.intp)
+        return zeros, zeros, np.zeros(len(points)), is_exact, is_exact
+
+    right = np.clip(np.searchsorted(axis, points), 1, len(axis) - 1)
+    left = right - 1
+    weight = (points - axis[left]) / (axis[right] - axis[left])
+    inside = (points >= axis[0] - AXIS_TOLERANCE) & (points <= axis[-1] + AXIS_TOLERANCE)
+
+    # 与坐标点重合时直接取该点，不做插值
+    exact_idx = exact.argmax(axis=1)
+    left = np.where(is_exact, exact_idx, left)
+    right = np.where(is_exact, exact_idx, right)
+    weight = np.where(is_exact, 0.0, np.clip(weight, 0.0, 1.0))
+    return left, right, weight, inside, is_exact
+
+
+def resample(mlss: np.ndarray, flow: np.ndarray, grid: np.ndarray,
+             new_mlss: np.ndarray, new_flow: np.ndarray) -> tuple:
+    """
+    把网格双线性插值到新的坐标上
+
+    Returns:
+        (插值后的网格，超出原坐标范围处为 NaN, 是否经过插值的掩码)
+    """
+    c0, c1, cw, c_in, c_exact = _interp_weights(mlss, new_mlss)
+    r0, r1, rw, r_in, r_exact = _interp_weights(flow, new_flow)
+    if not grid.size:
+        values = np.full((len(new_flow), len(new_mlss)), np.nan)
+    else:
+        cw = cw[None, :]
+        rw = rw[:, None]
+        top = grid[np.ix_(r0, c0)] * (1 - cw) + grid[np.ix_(r0, c1)] * cw
+        bottom = grid[np.ix_(r1, c0)] * (1 - cw) + grid[np.ix_(r1, c1)] * cw
+        values = top * (1 - rw) + bottom * rw
+        values[~(r_in[:, None] & c_in[None, :])] = np.nan
+    interpolated = ~(r_exact[:, None] & c_exact[None, :])
+    return values, interpolated
+
+
+def _axis_changes(old: np.ndarray, new: np.ndarray) -> tuple:
+    """(新增的坐标, 删除的坐标)"""
+    same = np.isclose(new[:, None], old[None, :], rtol=0, atol=AXIS_TOLERANCE)
+    return new[~same.any(axis=1)], old[~same.any(axis=0)]
+
+
+def table_decimals(*grids: np.ndarray) -> int:
+    """
+    表格数值的小数位数（所有有限值都是该位数的整数倍时的最小位数）
+
+    Returns:
+        0 到 MAX_DECIMALS 之间的位数
+    """
+    values = np.concatenate([g[np.isfinite(g)].ravel() for g in grids]) if grids else np.empty(0)
+    for decimals in range(MAX_DECIMALS):
+        if np.allclose(values, np.round(values, decimals), rtol=0, atol=1e-9):
+            return decimals
+    return MAX_DECIMALS
+
+
+def _slr_status(calculator: WastewaterCalculator, values: np.ndarray) -> np.ndarray:
+    status = calculator.classify_batch('slr', values)
+    status[~np.isfinite(values)] = STATUS_CODES['invalid']
+    return status
+
+
+def diff_mlss_tables(old: Dict, new: Dict, calculator: WastewaterCalculator = None,
+                     tolerance: float = DEFAULT_TOLERANCE, decimals: int = None) -> Dict:
+    """
+    对比两个版本的 MLSS 浓度表
+
+    旧表插值到新网格的值先舍入到表格的小数位数。两张表各自的舍入误差经插值后最多相差
+    一个末位，因此插值单元格的差值超过 tolerance 加一个末位才算变化；插值单元格的状态
+    变化只在数值确有变化时计入 status_changed，其余（安全边界附近的舍入）计入
+    interpolated_status_changed。
+
+    Args:
+        old: 旧表，parse_mlss_table 的返回值
+        new: 新表，parse_mlss_table 的返回值
+        calculator: 提供 SLR 安全范围的计算器，默认 WastewaterCalculator()；
+            只用到 SLR 安全范围，面积不影响结果
+        tolerance: 差值绝对值超过该值才算变化
+        decimals: 表格的小数位数，默认由两张表的数值推断
+
+    Returns:
+        以新表网格为基准的对比结果：
+        {'mlss_values', 'flow_values', 'old_slr'（插值到新网格）, 'new_slr', 'delta',
+         'relative'（%）, 'interpolated', 'comparable', 'changed', 'old_status', 'new_status',
+         'status_changed', 'interpolated_status_changed', 'added_mlss', 'removed_mlss',
+         'added_flow', 'removed_flow', 'summary'}
+    """
+    calculator = calculator or WastewaterCalculator(area=1.0)
+    old_mlss, old_flow, old_grid = table_grid(old)
+    new_mlss, new_flow, new_grid = table_grid(new)
+    if decimals is None:
+        decimals = table_decimals(old_grid, new_grid)
+
+    with stage('diff_mlss_tables', category='analyse', rows=new_grid.size):
+        old_slr, interpolated = resample(old_mlss, old_flow, old_grid, new_mlss, new_flow)
+        old_slr = np.where(interpolated, np.round(old_slr, decimals), old_slr)
+        comparable = np.isfinite(old_slr) & np.isfinite(new_grid)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = new_grid - old_slr
+            relative = np.where(old_slr != 0, delta / old_slr * 100, np.nan)
+        limit = np.where(interpolated, tolerance + 10.0 ** -decimals, tolerance)
+        changed = comparable & (np.abs(delta) > limit)
+
+        old_status = _slr_status(calculator, old_slr)
+        new_status = _slr_status(calculator, new_grid)
+        flipped = comparable & (old_status != new_status)
+        status_changed = flipped & (~interpolated | changed)
+        interpolated_status_changed = flipped & ~status_changed
+
+        added_mlss, removed_mlss = _axis_changes(old_mlss, new_mlss)
+        added_flow, removed_flow = _axis_changes(old_flow, new_flow)
+
+    abs_delta = np.abs(delta[comparable])
+    summary = {
+        'cells': int(new_grid.size),
+        'comparable': int(comparable.sum()),
+        'interpolated': int((interpolated & comparable).sum()),
+        'changed': int(changed.sum()),
+        'status_changed': int(status_changed.sum()),
+        'interpolated_status_changed': int(interpolated_status_changed.sum()),
+        'max_abs_delta': float(abs_delta.max()) if abs_delta.size else 0.0,
+        'mean_abs_delta': float(abs_delta.mean()) if abs_delta.size else 0.0,
+        'added_mlss': len(added_mlss),
+        'removed_mlss': len(removed_mlss),
+        'added_flow': len(added_flow),
+        'removed_flow': len(removed_flow),
+    }
+    return {
+        'mlss_values': new_mlss,
+        'flow_values': new_flow,
+        'old_slr': old_slr,
+        'new_slr': new_grid,
+        'delta': delta,
+        'relative': relative,
+        'interpolated': interpolated,
+        'comparable': comparable,
+        'changed': changed,
+        'old_status': old_status,
+        'new_status': new_status,
+        'status_changed': status_changed,
+        'interpolated_status_changed': interpolated_status_changed,
+        'added_mlss': added_mlss,
+        'removed_mlss': removed_mlss,
+        'added_flow': added_flow,
+        'removed_flow': removed_flow,
+        'summary': summary,
+    }
+
+
+def diff_mlss_files(old_path: str, new_path: str, calculator: WastewaterCalculator = None,
+                    tolerance: float = DEFAULT_TOLERANCE) -> Dict:
+    """读取两个 MLSS 浓度表文件并对比（参数同 diff_mlss_tables）"""
+    from excel_handler import ExcelDataHandler
+
+    old = ExcelDataHandler(old_path).parse_mlss_table()
+    new = ExcelDataHandler(new_path).parse_mlss_table()
+    return diff_mlss_tables(old, new, calculator, tolerance)
+
+
+def status_flips(diff: Dict) -> List[Dict]:
+    """
+    安全状态发生变化的单元格
+
+    Returns:
+        [{'equivalent_flow', 'mlss', 'old_slr', 'new_slr', 'old_status', 'new_status'}]
+    """
+    rows, cols = np.nonzero(diff['status_changed'])
+    flow = diff['flow_values'][rows].tolist()
+    mlss = diff['mlss_values'][cols].tolist()
+    old_slr = diff['old_slr'][rows, cols].tolist()
+    new_slr = diff['new_slr'][rows, cols].tolist()
+    old_status = diff['old_status'][rows, cols].tolist()
+    new_status = diff['new_status'][rows, cols].tolist()
+    return [
+        {'equivalent_flow': flow[i], 'mlss': mlss[i], 'old_slr': old_slr[i],
+         'new_slr': new_slr[i], 'old_status': STATUS_NAMES[old_status[i]],
+         'new_status': STATUS_NAMES[new_status[i]]}
+        for i in range(len(rows))
+    ]
+
+
+def _header(ws, value) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws, value=value)
+    cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    cell.font = Font(bold=True, color="FFFFFF")
+    cell.alignment = Alignment(horizontal="center", vertical="center")
+    return cell
+
+
+def write_diff_workbook(output_file: str, diff: Dict, decimals: int = 2) -> None:
+    """
+    写出对比结果
+
+    工作表：
+        SLR差值：新表网格上的差值（新 - 旧），布局与 MLSS 浓度表相同，增减以条件格式着色
+        状态变化：安全状态发生变化的单元格
+        行列增删：新增 / 删除的 MLSS 列和流量行
+
+    Args:
+        output_file: 输出文件路径
+        diff: diff_mlss_tables 的返回值
+        decimals: 差值保留的小数位数
+    """
+    mlss_values, flow_values = diff['mlss_values'], diff['flow_values']
+    flips = status_flips(diff)
+
+    with stage('write_diff_workbook', category='export', rows=diff['delta'].size):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(DIFF_SHEET)
+        ws.column_dimensions['A'].width = 20
+        ws.freeze_panes = 'B3'
+        if len(mlss_values) and len(flow_values):
+            cell_range = f'B3:{get_column_letter(len(mlss_values) + 1)}{len(flow_values) + 2}'
+            ws.conditional_formatting.add(cell_range, CellIsRule(
+                operator='greaterThan', formula=['0'],
+                fill=PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")))
+            ws.conditional_formatting.add(cell_range, CellIsRule(
+                operator='lessThan', formula=['0'],
+                fill=PatternFill(start_color="BDD7EE", end_color="BDD7EE", fill_type="solid")))
+        ws.append([_header(ws, 'SLR 差值（新 - 旧）')]
+                  + [_header(ws, m) for m in mlss_values.tolist()])
+        ws.append([FLOW_TITLE])
+        # 无法比较的单元格留空
+        delta = np.where(diff['comparable'], np.round(diff['delta'], decimals), np.nan)
+        for flow, row in zip(flow_values.tolist(), delta.tolist()):
+            ws.append([flow] + [None if v != v else v for v in row])
+
+        ws2 = wb.create_sheet(FLIPS_SHEET)
+        ws2.append([_header(ws2, h) for h in ('Equivalent (L/s)', 'MLSS (mg/L)', '旧 SLR',
+                                               '新 SLR', '旧状态', '新状态')])
+        for flip in flips:
+            ws2.append([flip['equivalent_flow'], flip['mlss'], round(flip['old_slr'], decimals),
+                        round(flip['new_slr'], decimals), flip['old_status'], flip['new_status']])
+
+        ws3 = wb.create_sheet(AXES_SHEET)
+        ws3.append([_header(ws3, h) for h in ('新增 MLSS', '删除 MLSS', '新增流量', '删除流量')])
+        columns = [diff['added_mlss'].tolist(), diff['removed_mlss'].tolist(),
+                   diff['added_flow'].tolist(), diff['removed_flow'].tolist()]
+        for i in range(max(map(len, columns))):
+            ws3.append([col[i] if i < len(col) else None for col in columns])
+        wb.save(str(output_file))
+
+    print(f"✓ 浓度表差异已保存: {output_file}（{len(flips)} 个单元格状态变化）")
+
+
+def print_diff_summary(diff: Dict) -> None:
+    """在控制台输出对比摘要"""
+    summary = diff['summary']
+    print(f"单元格: {summary['cells']}，可比较: {summary['comparable']}"
+          f"（其中插值 {summary['interpolated']}）")
+    print(f"数值变化: {summary['changed']}，最大差值: {summary['max_abs_delta']:.4f}，"
+          f"平均差值: {summary['mean_abs_delta']:.4f}")
+    if summary['interpolated_status_changed']:
+        print(f"插值单元格在舍入误差内的状态变化（不计入）: {summary['interpolated_status_changed']}")
+    for key, label in (('added_mlss', '新增 MLSS 列'), ('removed_mlss', '删除 MLSS 列'),
+                       ('added_flow', '新增流量行'), ('removed_flow', '删除流量行')):
+        if len(diff[key]):
+            print(f"{label}: {', '.join(f'{v:g}' for v in diff[key].tolist())}")
+    flips = status_flips(diff)
+    if flips:
+        print(f"⚠️ 安全状态变化 {len(flips)} 处:")
+        for flip in flips:
+            print(f"  流量 {flip['equivalent_flow']:g} L/s, MLSS {flip['mlss']:g} mg/L: "
+                  f"{flip['old_slr']:.2f} ({flip['old_status']}) → "
+                  f"{flip['new_slr']:.2f} ({flip['new_status']})")
+    else:
+        print("✓ 没有安全状态变化")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='对比两个版本的 MLSS 浓度表')
+    parser.add_argument('old', help='旧表')
+    parser.add_argument('new', help='新表')
+    parser.add_argument('-o', '--output', help='差异工作簿输出路径（可选）')
+    parser.add_argument('--config', help='安全范围配置文件（JSON / TOML / YAML），默认使用内置安全范围')
+    parser.add_argument('--plant', help='配置文件中的厂名')
+    parser.add_argument('--unit', help='配置文件中的单元编号')
+    parser.add_argument('--season', help='配置文件中的季节名称')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'差值超过该值才算变化（默认 {DEFAULT_TOLERANCE}）')
+    args = parser.parse_args(argv)
+
+    calculator = None
+    if args.config:
+        try:
+            calculator = SafetyConfig.from_file(args.config).calculator(
+                args.plant, args.unit, args.season)
+        except (OSError, ImportError, ValueError, KeyError) as e:
+            parser.error(f'安全范围配置无效: {e}')
+    elif args.plant or args.unit or args.season:
+        parser.error('--plant / --unit / --season 需要配合 --config 使用')
+
+    try:
+        diff = diff_mlss_files(args.old, args.new, calculator, args.tolerance)
+    except ValueError as e:
+        parser.error(str(e))
+    print_diff_summary(diff)
+    if args.output:
+        write_diff_workbook(args.output, diff)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
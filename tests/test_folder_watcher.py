@@ -0,0 +1,51 @@
+"""文件夹监视：新工作簿被处理一次，内容未变时重启后跳过"""
+
+import contextlib
+import io
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+from folder_watcher import FolderWatcher, process_workbook
+from reference_table import write_reference_table
+
+
+def _watcher(tmp_path, processor=None):
+    return FolderWatcher(tmp_path / 'data', tmp_path / 'output', processor=processor,
+                         workers=1, debounce=0.05, poll_interval=0.05, use_inotify=False)
+
+
+def test_processes_once_and_skips_unchanged(tmp_path):
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'data' / 'a.xlsx').write_bytes(b'one')
+    (tmp_path / 'data' / '~$a.xlsx').write_bytes(b'lock')
+    calls = []
+
+    def processor(path):
+        calls.append(Path(path).name)
+        return {'report': None, 'rows': 1}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        watcher = _watcher(tmp_path, processor)
+        with watcher:
+            assert watcher.wait_idle(10)
+        assert calls == ['a.xlsx']
+        assert watcher.stats()['processed'] == 1
+
+        watcher = _watcher(tmp_path, processor)
+        with watcher:
+            assert watcher.wait_idle(10)
+        assert calls == ['a.xlsx']
+        assert watcher.stats()['skipped'] == 1
+
+
+def test_process_workbook_writes_report(tmp_path):
+    table = tmp_path / 'table.xlsx'
+    with contextlib.redirect_stdout(io.StringIO()):
+        write_reference_table(str(table), 141, mlss=(3000, 3500, 100), flow=(90, 100, 5))
+        result = process_workbook(table, tmp_path, area=141)
+        again = process_workbook(table, tmp_path, area=141)
+    rows = list(load_workbook(result['report']).active.iter_rows(values_only=True))
+    assert len(rows) == 1 + 6 * 3
+    assert result['rows'] == 18
+    assert again['rows'] == 0
@@ -0,0 +1,46 @@
+"""SLR 短期预测：平稳序列的预测保持不变，上升趋势给出越界时间"""
+
+import numpy as np
+import pytest
+
+from forecasting import SLRForecaster
+from wastewater_treatment_calc import STATUS_CODES, WastewaterCalculator
+
+
+@pytest.fixture
+def calc():
+    return WastewaterCalculator(area=141)
+
+
+def test_constant_series_forecast(calc):
+    forecaster = SLRForecaster(calc, interval=60)
+    forecaster.update_series('1#', [3500] * 50, [100] * 50)
+    forecast = forecaster.forecast(10)
+    np.testing.assert_allclose(forecast['mlss'], 3500)
+    np.testing.assert_allclose(forecast['slr'], calc.calculate_slr(3500, 100))
+    np.testing.assert_array_equal(forecast['seconds'], np.arange(1, 11) * 60)
+
+    exit_time = forecaster.time_to_exit(10)
+    assert exit_time['exit_step'].tolist() == [-1]
+    assert np.isinf(exit_time['seconds_to_exit'][0])
+
+
+def test_rising_mlss_reaches_upper_limit(calc):
+    forecaster = SLRForecaster(calc, interval=60, phi=1.0)
+    forecaster.update_series('1#', np.linspace(3000, 4500, 60), [100] * 60)
+    forecaster.update(['2#'], 3500, 100)
+    result = forecaster.time_to_exit(500)
+    assert result['unit_ids'] == ['1#', '2#']
+    assert result['exit_step'][0] > 0
+    assert result['exit_status'][0] == STATUS_CODES['too_high']
+    assert result['exit_step'][1] == -1
+
+
+def test_uninitialized_unit_and_parameter_checks(calc):
+    forecaster = SLRForecaster(calc)
+    forecaster.update(['1#'], np.nan, np.nan)
+    assert np.isnan(forecaster.forecast(3)['slr']).all()
+    with pytest.raises(ValueError):
+        SLRForecaster(calc, alpha=1.5)
+    with pytest.raises(ValueError):
+        forecaster.forecast(0)
@@ -0,0 +1,33 @@
+"""pandas / Arrow 互操作：缺失值按无效数据处理，结果与批量计算一致"""
+
+import numpy as np
+import pytest
+
+from frame_interop import check_columns
+from wastewater_treatment_calc import STATUS_CODES, WastewaterCalculator
+
+
+def test_missing_values_are_invalid():
+    calc = WastewaterCalculator(area=141)
+    result = check_columns([3500, None, 3600], [100, 100, np.nan], calc)
+    assert result['valid'].tolist() == [True, False, False]
+    assert result['slr_status'][1] == STATUS_CODES['invalid']
+    expected = calc.check_operating_points([3500], [100])
+    assert result['calculated_slr'][0] == expected['calculated_slr'][0]
+
+
+def test_from_frame_matches_batch():
+    pd = pytest.importorskip('pandas')
+    from frame_interop import from_frame
+
+    calc = WastewaterCalculator(area=141)
+    df = pd.DataFrame({'MLSS': [3500.0, 4200.0], 'EQ': [100.0, 150.0]})
+    frame = from_frame(df, calc, mlss='MLSS', flow='EQ')
+    expected = calc.check_operating_points(df['MLSS'].to_numpy(), df['EQ'].to_numpy())
+    np.testing.assert_allclose(frame['calculated_slr'].to_numpy(), expected['calculated_slr'])
+
+
+def test_arrow_columns():
+    pa = pytest.importorskip('pyarrow')
+    result = check_columns(pa.array([3500, None], pa.int64()), pa.array([100.0, 100.0]))
+    assert result['valid'].tolist() == [True, False]
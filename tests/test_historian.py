@@ -0,0 +1,49 @@
+"""运行点历史库：追加失败时不留下数据，也不推进质量预检的状态"""
+
+import numpy as np
+import pytest
+
+from historian import OperatingHistorian
+from sensor_quality import SensorQualityFilter
+
+T0 = 1_700_000_000
+
+
+def _batch(start, n=10):
+    t = T0 + 60 * np.arange(start, start + n)
+    mlss = np.full(n, 3000.0) + np.arange(n)
+    flow = np.full(n, 100.0)
+    return t, mlss, flow
+
+
+def test_failed_append_restores_quality_state(tmp_path, monkeypatch):
+    store = OperatingHistorian(tmp_path / 'h', quality_filter=SensorQualityFilter())
+    t, mlss, flow = _batch(0)
+    store.append(t, '1#', mlss, flow)
+    before = store.quality_filter.snapshot()
+
+    def fail():
+        raise OSError('disk full')
+
+    monkeypatch.setattr(store, '_write_meta', fail)
+    t2, mlss2, flow2 = _batch(10)
+    mlss2[:] = 8000.0
+    with pytest.raises(OSError):
+        store.append(t2, ['1#'] * 5 + ['2#'] * 5, mlss2, flow2)
+    monkeypatch.undo()
+
+    after = store.quality_filter.snapshot()
+    assert after['unit_ids'] == before['unit_ids']
+    for name, state in before['state'].items():
+        for key, values in state.items():
+            np.testing.assert_array_equal(after['state'][name][key], values)
+    assert len(store) == 10
+    assert store.units == ['1#']
+
+    # 重试时的判定与从未失败过一致
+    store.append(t2, ['1#'] * 5 + ['2#'] * 5, mlss2, flow2)
+    reference = OperatingHistorian(tmp_path / 'ref', quality_filter=SensorQualityFilter())
+    reference.append(t, '1#', mlss, flow)
+    reference.append(t2, ['1#'] * 5 + ['2#'] * 5, mlss2, flow2)
+    np.testing.assert_array_equal(store.column('mlss_status'), reference.column('mlss_status'))
+    np.testing.assert_array_equal(store.column('overall_safe'), reference.column('overall_safe'))
@@ -0,0 +1,102 @@
+"""增量报告：修补工作表 XML 的结果与整体重新生成一致，修补不划算时整体重新生成"""
+
+import contextlib
+import io
+
+import pytest
+from openpyxl import load_workbook
+
+import incremental_reports
+from excel_handler import (ExcelDataHandler, _comparison_values, write_analysis_workbook,
+                           write_comparison_workbook, write_sensitivity_workbook)
+from incremental_reports import patch_workbook
+from reference_table import write_reference_table
+
+
+def _values(path):
+    return [list(ws.iter_rows(values_only=True)) for ws in load_workbook(path).worksheets]
+
+
+@pytest.fixture
+def handler(tmp_path):
+    table = tmp_path / 'table.xlsx'
+    with contextlib.redirect_stdout(io.StringIO()):
+        write_reference_table(str(table), 141, mlss=(2000, 5400, 100), flow=(60, 170, 5))
+        return ExcelDataHandler(str(table))
+
+
+def _report(handler, path, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return handler.generate_analysis_report(str(path), **kwargs)
+
+
+def _bump(handler, row_idx):
+    row = list(handler.df[row_idx])
+    row[1:] = [value + 0.5 for value in row[1:]]
+    handler.df[row_idx] = tuple(row)
+
+
+def test_patched_analysis_report_matches_rebuild(handler, tmp_path):
+    report = tmp_path / 'report.xlsx'
+    _report(handler, report, incremental=True)
+    assert handler.last_update['mode'] == 'full'
+
+    _bump(handler, 3)
+    rows = _report(handler, report, incremental=True, changed_only=True)
+    n_mlss = len(handler.df[0]) - 1
+    assert handler.last_update['mode'] == 'patch'
+    assert handler.last_update['rows']['analysis'] == list(range(n_mlss, 2 * n_mlss))
+    assert len(rows) == n_mlss
+
+    _report(handler, tmp_path / 'rebuild.xlsx')
+    assert _values(report) == _values(tmp_path / 'rebuild.xlsx')
+
+    _report(handler, report, incremental=True)
+    assert handler.last_update['changed'] == 0
+
+
+def test_rebuilds_when_patch_is_not_cheaper(handler, tmp_path, monkeypatch):
+    report = tmp_path / 'report.xlsx'
+    _report(handler, report, incremental=True)
+    monkeypatch.setattr(incremental_reports, 'REBUILD_SECONDS_PER_CELL', 0.0)
+    _bump(handler, 2)
+    assert len(_report(handler, report, incremental=True, changed_only=True)) > 0
+    assert handler.last_update['mode'] == 'full'
+
+
+def test_patch_grows_and_shrinks_comparison_sheet(tmp_path):
+    rows = [(f's{i}', 3000 + i, 100, 3.1, 'optimal', 'normal', 'optimal', i % 2 == 0)
+            for i in range(5)]
+    new = rows[:3] + [('x <&>', 1, 2, 3.3, 'too_low', 'normal', 'optimal', False),
+                      ('y', 1, 2.5, 3.3, 'too_low', 'normal', 'optimal', True),
+                      ('z', 9, 9, 9.9, 'too_low', 'normal', 'optimal', True)]
+    report = tmp_path / 'comparison.xlsx'
+    write_comparison_workbook(str(report), rows)
+    assert patch_workbook(report, [(0, 2, [3, 4, 5], [_comparison_values(r) for r in new[3:]],
+                                    5, 6)])
+    write_comparison_workbook(str(tmp_path / 'rebuild.xlsx'), new)
+    assert _values(report) == _values(tmp_path / 'rebuild.xlsx')
+    ws = load_workbook(report).active
+    assert [str(cf.sqref) for cf in ws.conditional_formatting] == ['H2:H7']
+    assert ws['A7'].alignment.horizontal == 'center'
+
+    assert patch_workbook(report, [(0, 2, [], [], 6, 2)])
+    ws = load_workbook(report).active
+    assert ws.max_row == 3
+    assert [str(cf.sqref) for cf in ws.conditional_formatting] == ['H2:H3']
+
+
+def test_patch_refuses_rows_after_data_when_count_changes(tmp_path):
+    report = tmp_path / 'sensitivity.xlsx'
+    write_sensitivity_workbook(str(report), [(2000, 1.0, 0.0)] * 3, [(100, 1.0, 0.0)] * 3)
+    before = report.read_bytes()
+    assert not patch_workbook(report, [(0, 4, [3], [[2500, 1.2, 20.0]], 3, 4)])
+    assert report.read_bytes() == before
+
+
+def test_analysis_workbook_round_trip(tmp_path):
+    rows = [{'a': 1, 'b': 2.5, 'c': ' x '}]
+    report = tmp_path / 'a.xlsx'
+    write_analysis_workbook(str(report), rows)
+    assert patch_workbook(report, [(0, 2, [0], [[2, float('nan'), 'y & z']], 1, 1)])
+    assert _values(report) == [[('a', 'b', 'c'), (2, 'nan', 'y & z')]]
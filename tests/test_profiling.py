@@ -0,0 +1,25 @@
+"""阶段剖析：嵌套阶段的行数只计入一次"""
+
+from profiling import profile, stage
+
+
+def test_nested_rows_are_counted_once():
+    with profile() as recorder:
+        with stage('generate_reports', category='analyse', rows=100):
+            with stage('check_operating_points', category='analyse', rows=100):
+                pass
+            with stage('write', category='export') as s:
+                s.rows = 100
+        with stage('parse_mlss_table', category='parse', rows=40):
+            with stage('helper', category='parse'):
+                pass
+    summary = recorder.summary()
+    assert summary['analyse']['rows'] == 100
+    assert summary['analyse']['count'] == 2
+    assert summary['export']['rows'] == 100
+    # 嵌套阶段没有记录行数时仍计入外层阶段的行数
+    assert summary['parse']['rows'] == 40
+
+
+def test_disabled_stage_is_shared_null_object():
+    assert stage('a') is stage('b')
@@ -0,0 +1,92 @@
+"""QuantizedResultCache 与计算器完整检查的一致性（特别是安全范围边界附近）"""
+
+import numpy as np
+import pytest
+
+from result_cache import QuantizedResultCache
+from wastewater_treatment_calc import STATUS_CODES, WastewaterCalculator
+
+AREA = 141
+
+
+@pytest.fixture(scope='module')
+def calc():
+    return WastewaterCalculator(area=AREA)
+
+
+@pytest.fixture(scope='module')
+def cache(calc):
+    return QuantizedResultCache(calc)
+
+
+def _edges(ranges):
+    return [ranges['min'], ranges['max'], *ranges['optimal']]
+
+
+def _boundary_points(calc, cache):
+    """每条 MLSS / 流量 / SLR 边界两侧若干个量化步长内的细分点"""
+    ranges = calc.SAFETY_RANGES
+    m_res, f_res = cache.mlss_resolution, cache.flow_resolution
+    offsets = np.linspace(-3, 3, 61)
+    flows = np.arange(50.0, 190.0, 2.3)
+    mlss_values = np.arange(2000.0, 7000.0, 37.0)
+    points = []
+    for edge in _edges(ranges['mlss']):
+        m = edge + offsets * m_res
+        points.append(np.stack(np.broadcast_arrays(m[:, None], flows[None, :]), -1).reshape(-1, 2))
+    for edge in _edges(ranges['equivalent_flow']):
+        f = edge + offsets * f_res
+        points.append(np.stack(np.broadcast_arrays(mlss_values[:, None], f[None, :]), -1)
+                      .reshape(-1, 2))
+    for edge in _edges(ranges['slr']):
+        # 按流量反解出恰好落在 SLR 边界上的 MLSS
+        m = edge * AREA * 1000 / (flows * 3.6)
+        m = m[None, :] + offsets[:, None] * m_res
+        points.append(np.stack(np.broadcast_arrays(m, flows[None, :]), -1).reshape(-1, 2))
+    return np.concatenate(points)
+
+
+def test_reported_false_safe_points(calc, cache):
+    for mlss in (5400.1, 5400.2, 5400.3, 5400.4):
+        for flow in np.arange(100.0, 120.5, 0.5):
+            expected = calc.check_operating_point(mlss, flow)
+            assert cache.is_safe(mlss, flow) == expected['overall_safe']
+            assert cache.slr_status(mlss, flow) == expected['slr']['status']
+
+
+def test_scalar_accessors_match_calculator_near_edges(calc, cache):
+    points = _boundary_points(calc, cache)
+    for mlss, flow in points[::7]:
+        expected = calc.check_operating_point(mlss, flow)
+        assert cache.is_safe(mlss, flow) == expected['overall_safe'], (mlss, flow)
+        assert cache.slr_status(mlss, flow) == expected['slr']['status'], (mlss, flow)
+        assert list(cache.recommendations(mlss, flow)) == expected['recommendations']
+        result = cache.check_operating_point(mlss, flow)
+        for name in ('mlss', 'equivalent_flow', 'slr'):
+            assert result[name]['status'] == expected[name]['status'], (name, mlss, flow)
+        assert result['calculated_slr'] == pytest.approx(expected['calculated_slr'])
+
+
+def test_batch_matches_calculator_near_edges(calc, cache):
+    points = _boundary_points(calc, cache)
+    rng = np.random.default_rng(0)
+    random = np.column_stack([rng.uniform(2000, 7000, 20000), rng.uniform(40, 200, 20000)])
+    points = np.concatenate([points, random])
+    mlss, flow = points[:, 0], points[:, 1]
+    expected = calc.check_operating_points(mlss, flow)
+    result = cache.check_operating_points(mlss, flow)
+    for name in ('mlss_status', 'flow_status', 'slr_status', 'recommendation_code',
+                 'overall_safe'):
+        np.testing.assert_array_equal(result[name], expected[name], err_msg=name)
+    np.testing.assert_array_equal(result['mlss'], mlss)
+    np.testing.assert_allclose(result['calculated_slr'], expected['calculated_slr'])
+
+
+def test_interior_cells_still_hit_table(calc, cache):
+    cache.hits = cache.misses = 0
+    low, high = calc.SAFETY_RANGES['mlss']['optimal']
+    mlss = np.full(100, (low + high) / 2)
+    flow = np.full(100, float(np.mean(calc.SAFETY_RANGES['equivalent_flow']['optimal'])))
+    result = cache.check_operating_points(mlss, flow)
+    assert cache.misses == 0
+    assert (result['mlss_status'] == STATUS_CODES['optimal']).all()
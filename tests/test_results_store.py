@@ -0,0 +1,42 @@
+"""分析结果库：写入后按运行、单元、状态查询"""
+
+import numpy as np
+import pytest
+
+from results_store import ResultsStore
+from wastewater_treatment_calc import WastewaterCalculator
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ResultsStore(tmp_path / 'results.db') as store:
+        yield store
+
+
+def test_record_and_query(store):
+    calc = WastewaterCalculator(area=141)
+    result = calc.check_operating_points([3500, 3500, 9000], [100, 100, 100])
+    run_a = store.record('analysis', result, unit='1#', area=141, created='2024-06-01')
+    store.record('comparison', result, unit='2#', labels=['a', 'b', 'c'], created='2024-06-02')
+
+    data = store.query(run_id=run_a)
+    np.testing.assert_allclose(data['mlss'], [3500, 3500, 9000])
+    assert data['overall_safe'].tolist() == result['overall_safe'].tolist()
+
+    unsafe = int((~result['overall_safe']).sum())
+    assert store.unsafe_units() == {'1#': unsafe, '2#': unsafe}
+    assert store.unsafe_units(kind='analysis') == {'1#': unsafe}
+    assert len(store.query(unit='2#', unsafe_only=True)['mlss']) == unsafe
+
+    runs = store.runs()
+    assert [r['kind'] for r in runs] == ['comparison', 'analysis']
+    assert runs[1]['rows'] == 3
+
+
+def test_sensitivity_and_unknown_kind(store):
+    run_id = store.create_run('sensitivity')
+    store.add_sensitivity(run_id, 'mlss', [(3000, 2.1, -10.0), (3500, 2.4, 0.0)])
+    data = store.sensitivity()
+    np.testing.assert_allclose(data['value'], [3000, 3500])
+    with pytest.raises(ValueError):
+        store.create_run('bogus')
@@ -0,0 +1,69 @@
+"""传感器质量预检：批量检查与逐个样本送入的结果一致"""
+
+import numpy as np
+
+from sensor_quality import QUALITY_FLAGS, SensorQualityFilter
+
+RATE = QUALITY_FLAGS['rate_of_change']
+
+
+def _series(n=100, step=60):
+    t = np.arange(n, dtype=np.int64) * step + 1_700_000_000
+    mlss = 3000 + 5 * np.sin(np.arange(n))
+    flow = 100 + np.cos(np.arange(n))
+    return t, mlss, flow
+
+
+def _streamed(unit_ids, t, **columns):
+    quality = SensorQualityFilter()
+    flags = {name: [] for name in columns}
+    for i in range(len(t)):
+        out = quality.check(unit_ids[i:i + 1], t[i:i + 1],
+                            **{name: values[i:i + 1] for name, values in columns.items()})
+        for name in columns:
+            flags[name].append(out[name][0])
+    return {name: np.array(values, dtype=np.uint8) for name, values in flags.items()}
+
+
+def test_spike_batch_matches_streaming():
+    t, mlss, flow = _series()
+    mlss[50:53] = [6000, 6050, 6100]
+    units = np.array(['A'] * len(t))
+
+    batch = SensorQualityFilter().check(units, t, mlss=mlss, equivalent_flow=flow)
+    streamed = _streamed(units, t, mlss=mlss, equivalent_flow=flow)
+
+    assert np.flatnonzero(batch['mlss'] & RATE).tolist() == [50, 51, 52]
+    np.testing.assert_array_equal(batch['mlss'], streamed['mlss'])
+    np.testing.assert_array_equal(batch['equivalent_flow'], streamed['equivalent_flow'])
+
+
+def test_repeated_spikes_across_units_match_streaming():
+    rng = np.random.default_rng(7)
+    t, mlss, flow = _series(300)
+    units = np.array(['A', 'B', 'C'])[rng.integers(0, 3, len(t))]
+    spikes = rng.random(len(t)) < 0.15
+    mlss[spikes] += rng.choice([-1, 1], spikes.sum()) * rng.uniform(200, 2000, spikes.sum())
+    flow[rng.random(len(t)) < 0.05] = 0
+    mlss[rng.random(len(t)) < 0.05] = np.nan
+
+    batch = SensorQualityFilter().check(units, t, mlss=mlss, equivalent_flow=flow)
+    streamed = _streamed(units, t, mlss=mlss, equivalent_flow=flow)
+    np.testing.assert_array_equal(batch['mlss'], streamed['mlss'])
+    np.testing.assert_array_equal(batch['equivalent_flow'], streamed['equivalent_flow'])
+
+
+def test_missing_zero_and_flatline_flags():
+    t, mlss, flow = _series(260)
+    mlss[10] = np.nan
+    flow[20] = 0
+    mlss[100:] = 3050.0
+    flow[100:] = 100.0
+    flags = SensorQualityFilter().check('A', t, mlss=mlss, equivalent_flow=flow)
+
+    assert flags['mlss'][10] == QUALITY_FLAGS['missing']
+    assert flags['equivalent_flow'][20] == QUALITY_FLAGS['zero']
+    # MLSS 不变 1 小时、流量不变 2 小时后判为卡死
+    assert np.flatnonzero(flags['mlss'] & QUALITY_FLAGS['flatline'])[0] == 160
+    assert np.flatnonzero(flags['equivalent_flow'] & QUALITY_FLAGS['flatline'])[0] == 220
+    assert not flags['valid'][10] and flags['valid'][50]
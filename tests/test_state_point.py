@@ -0,0 +1,35 @@
+"""状态点分析：极限通量与总通量曲线的数值极小值一致"""
+
+import numpy as np
+import pytest
+
+from state_point import limiting_flux, state_point_analysis, vesilind_from_svi
+
+
+@pytest.mark.parametrize('v0, k, u', [(7.8, 0.4, 0.3), (7.8, 0.6, 0.05), (12.0, 0.3, 1.0)])
+def test_limiting_flux_is_minimum_of_total_flux(v0, k, u):
+    flux, x_limit = limiting_flux(v0, k, u)
+    x = np.linspace(2 / k, 40 / k, 400001)
+    total = x * (u + v0 * np.exp(-k * x))
+    assert float(flux) == pytest.approx(total.min(), rel=1e-8)
+    assert float(x_limit) == pytest.approx(x[total.argmin()], rel=1e-3)
+
+
+def test_unlimited_and_invalid_inputs():
+    flux, x_limit = limiting_flux(7.8, 0.4, [7.8 * np.exp(-2) * 1.01, 0.0])
+    assert np.isinf(flux[0]) and np.isnan(x_limit[0])
+    assert np.isnan(flux[1])
+    v0, k = vesilind_from_svi([120, -1])
+    assert v0[0] == 7.8 and np.isnan(k[1])
+
+
+def test_margins():
+    result = state_point_analysis(mlss=[2500, 3500], equivalent_flow=[100, 100], area=141,
+                                  svi=120)
+    overflow = np.array([100, 100]) * 3.6 / 141
+    settling = result['settling_velocity']
+    np.testing.assert_allclose(result['clarification_margin'], 1 - overflow / settling)
+    np.testing.assert_allclose(result['capacity_margin'],
+                               np.minimum(result['thickening_margin'],
+                                          result['clarification_margin']))
+    assert result['state_point_ok'].tolist() == [True, False]
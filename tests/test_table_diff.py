@@ -0,0 +1,55 @@
+"""浓度表对比：分辨率不同但物理相同的两张表没有变化"""
+
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from excel_handler import ExcelDataHandler
+from reference_table import write_reference_table
+from table_diff import diff_mlss_tables, status_flips, table_decimals
+
+
+def _table(path, mlss, flow, area=141):
+    with contextlib.redirect_stdout(io.StringIO()):
+        write_reference_table(str(path), area, mlss=mlss, flow=flow)
+        return ExcelDataHandler(str(path)).parse_mlss_table()
+
+
+@pytest.fixture(scope='module')
+def tables(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('tables')
+    coarse = _table(tmp / 'coarse.xlsx', (2000, 5400, 100), (60, 170, 2.5))
+    fine = _table(tmp / 'fine.xlsx', (2000, 5400, 50), (60, 170, 1))
+    return coarse, fine
+
+
+def test_same_physics_at_different_resolution_has_no_changes(tables):
+    coarse, fine = tables
+    diff = diff_mlss_tables(coarse, fine)
+    assert diff['summary']['interpolated'] > 0
+    assert diff['summary']['changed'] == 0
+    assert diff['summary']['status_changed'] == 0
+    assert status_flips(diff) == []
+
+
+def test_real_change_is_reported_on_interpolated_cells(tmp_path, tables):
+    coarse, _ = tables
+    fine = _table(tmp_path / 'fine.xlsx', (2000, 5400, 50), (60, 170, 1), area=120)
+    diff = diff_mlss_tables(coarse, fine)
+    assert diff['summary']['changed'] > 0.9 * diff['summary']['comparable']
+    assert diff['summary']['status_changed'] > 0
+
+
+def test_identical_tables(tables):
+    coarse, _ = tables
+    diff = diff_mlss_tables(coarse, coarse)
+    assert diff['summary']['interpolated'] == 0
+    assert diff['summary']['changed'] == 0
+    assert not diff['status_changed'].any()
+
+
+def test_table_decimals():
+    assert table_decimals(np.array([[1.25, 2.5], [np.nan, 3.0]])) == 2
+    assert table_decimals(np.array([1.0, 2.0])) == 0
@@ -0,0 +1,39 @@
+"""单位换算：换算往返一致，量级检查能发现 1000 倍错误"""
+
+import numpy as np
+import pytest
+
+from units import InputUnits, MagnitudeError, convert
+from wastewater_treatment_calc import WastewaterCalculator
+
+
+def test_convert_round_trip():
+    values = np.array([1.0, 2.5, 100.0])
+    m3h = convert(values, 'equivalent_flow', 'L/s', 'm3/h')
+    np.testing.assert_allclose(m3h, values * 3.6)
+    np.testing.assert_allclose(convert(m3h, 'equivalent_flow', 'm3/h', 'L/s'), values)
+    assert convert(3.5, 'mlss', 'g/L') == pytest.approx(3500)
+
+
+def test_unknown_unit_is_rejected():
+    with pytest.raises(ValueError):
+        InputUnits(mlss='furlongs')
+
+
+def test_normalize_and_report_round_trip():
+    units = InputUnits(mlss='g/L', equivalent_flow='m3/h')
+    data = units.normalize(mlss=[3.5, 4.0], equivalent_flow=[360.0, 432.0])
+    np.testing.assert_allclose(data['mlss'], [3500, 4000])
+    np.testing.assert_allclose(data['equivalent_flow'], [100, 120])
+
+    calc = WastewaterCalculator(area=141)
+    result = units.report(calc.check_operating_points(data['mlss'], data['equivalent_flow']))
+    np.testing.assert_allclose(result['mlss'], [3.5, 4.0])
+    np.testing.assert_allclose(result['equivalent_flow'], [360.0, 432.0])
+
+
+def test_normalize_detects_wrong_declaration():
+    with pytest.raises(MagnitudeError):
+        InputUnits(mlss='mg/L').normalize(mlss=[3.5, 3.6, 3.4])
+    data = InputUnits(mlss='mg/L').normalize(check=False, mlss=[3.5])
+    assert data['mlss'][0] == 3.5
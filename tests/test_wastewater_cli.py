@@ -0,0 +1,91 @@
+"""命令行工具：单位声明的量级检查"""
+
+import csv
+import io
+
+import pytest
+
+import wastewater_cli
+from units import MagnitudeError, check_magnitude
+from wastewater_cli import EXIT_INPUT_ERROR, EXIT_OK, EXIT_UNSAFE, main
+
+
+def _write_csv(path, rows, fields=('timestamp', 'mlss', 'flow')):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        writer.writerows(rows)
+    return str(path)
+
+
+def _run(capsys, argv):
+    code = main(argv)
+    out, err = capsys.readouterr()
+    return code, list(csv.DictReader(io.StringIO(out))), err
+
+
+def test_zero_flow_readings_do_not_trip_magnitude_guard(tmp_path, capsys):
+    path = _write_csv(tmp_path / 'points.csv',
+                      [(i * 60, 3000, flow) for i, flow in enumerate([0, 0, 0, 100])])
+    code, rows, err = _run(capsys, ['--quality', '--area', '141', path])
+    assert code in (EXIT_OK, EXIT_UNSAFE)
+    assert len(rows) == 4
+    assert rows[0]['flow_quality'] == 'zero'
+
+
+def test_guard_only_applies_to_declared_units(tmp_path, capsys):
+    # g/L 数据按默认 mg/L 读入：未声明单位时不检查
+    path = _write_csv(tmp_path / 'points.csv', [(0, 3.5, 100), (60, 3.6, 100)])
+    code, rows, _ = _run(capsys, ['--area', '141', path])
+    assert len(rows) == 2
+
+    code, rows, err = _run(capsys, ['--area', '141', '--mlss-unit', 'mg/L', path])
+    assert code == EXIT_INPUT_ERROR
+    assert rows == []
+    assert '数据量级异常' in err
+
+    code, rows, _ = _run(capsys, ['--area', '141', '--mlss-unit', 'g/L', path])
+    assert code in (EXIT_OK, EXIT_UNSAFE)
+    assert len(rows) == 2
+
+
+def test_no_magnitude_check_option(tmp_path, capsys):
+    path = _write_csv(tmp_path / 'points.csv', [(0, 3.5, 100)])
+    code, rows, err = _run(capsys, ['--area', '141', '--mlss-unit', 'mg/L',
+                                    '--no-magnitude-check', path])
+    assert len(rows) == 1
+    assert '数据量级异常' not in err
+
+
+@pytest.mark.parametrize('values', [[0, 0, 0, 3500], [float('nan'), -1, 3500]])
+def test_check_magnitude_ignores_zero_and_invalid_readings(values):
+    check_magnitude(values, 'mlss', 'mg/L')
+
+
+def test_magnitude_error_is_a_value_error():
+    with pytest.raises(MagnitudeError):
+        check_magnitude([3.5, 3.6], 'mlss', 'mg/L')
+    assert issubclass(MagnitudeError, ValueError)
+
+
+def test_other_value_errors_propagate(tmp_path, monkeypatch):
+    path = _write_csv(tmp_path / 'points.csv', [(0, 3500, 100)])
+
+    def broken(self, *args, **kwargs):
+        raise ValueError('bug')
+
+    monkeypatch.setattr(wastewater_cli.BatchRunner, '_process_chunk', broken)
+    with pytest.raises(ValueError, match='bug'):
+        main(['--area', '141', path])
+
+
+def test_jsonl_flow_alias_is_resolved_per_record(tmp_path, capsys):
+    path = tmp_path / 'points.jsonl'
+    path.write_text('{"mlss": 3000, "flow": 100}\n'
+                    '{"mlss": 3000, "equivalent_flow": 110}\n'
+                    '{"mlss": 3000, "eq": 120}\n', encoding='utf-8')
+    code = main(['--area', '141', '--format', 'jsonl', str(path)])
+    out, err = capsys.readouterr()
+    assert code in (EXIT_OK, EXIT_UNSAFE)
+    assert len(out.splitlines()) == 3
+    assert '无法解析 0 行' in err
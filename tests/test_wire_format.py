@@ -0,0 +1,82 @@
+"""检查结果传输格式：二进制帧和 JSON Lines 往返无损"""
+
+import io
+
+import numpy as np
+import pytest
+
+from wastewater_treatment_calc import WastewaterCalculator
+from wire_format import (RECORD_FIELDS, decode_header, decode_jsonl, decode_results,
+                         encode_jsonl, encode_results, iter_frames, write_frame)
+
+FIELDS = [name for name in RECORD_FIELDS if name != 'flags'] + ['overall_safe', 'valid']
+
+
+@pytest.fixture(scope='module')
+def calc():
+    return WastewaterCalculator(area=141)
+
+
+@pytest.fixture(scope='module')
+def result(calc):
+    rng = np.random.default_rng(3)
+    mlss = rng.uniform(1000, 7000, 500)
+    flow = rng.uniform(40, 200, 500)
+    mlss[:3] = [np.nan, 3500, 0.1 + 0.2]
+    valid = np.ones(500, dtype=bool)
+    valid[5] = False
+    return calc.check_operating_points(mlss, flow, valid=valid)
+
+
+def _assert_same(decoded, result, exact=True):
+    for name in FIELDS:
+        expected = np.asarray(result[name])
+        if exact or expected.dtype.kind != 'f':
+            np.testing.assert_array_equal(decoded[name], expected, err_msg=name)
+        else:
+            np.testing.assert_allclose(decoded[name], expected, rtol=1e-6, err_msg=name)
+
+
+def test_binary_round_trip(result, calc):
+    data = encode_results(result, calc)
+    _assert_same(decode_results(data), result)
+    header = decode_header(data)
+    assert header['count'] == 500
+    assert header['area'] == calc.area
+
+
+def test_binary_f4_is_smaller_and_close(result, calc):
+    f8, f4 = encode_results(result, calc), encode_results(result, calc, precision='f4')
+    assert len(f4) < len(f8)
+    _assert_same(decode_results(f4), result, exact=False)
+
+
+def test_frames_in_one_stream(result, calc):
+    stream = io.BytesIO()
+    write_frame(stream, result, calc)
+    write_frame(stream, result, calc, precision='f4')
+    stream.seek(0)
+    frames = list(iter_frames(stream))
+    assert len(frames) == 2
+    _assert_same(frames[0][1], result)
+
+
+def test_truncated_frame_is_rejected(result, calc):
+    data = encode_results(result, calc)
+    with pytest.raises(ValueError):
+        decode_results(data[:-1])
+    with pytest.raises(ValueError):
+        list(iter_frames(io.BytesIO(data[:-1])))
+
+
+def test_jsonl_round_trip(result, calc):
+    text = encode_jsonl(result, calc)
+    _assert_same(decode_jsonl(text), result)
+    merged = decode_jsonl(text + text)
+    assert len(merged['mlss']) == 1000
+
+
+def test_jsonl_rejects_count_mismatch(result, calc):
+    lines = encode_jsonl(result, calc).splitlines()
+    with pytest.raises(ValueError):
+        decode_jsonl('\n'.join(lines[:-1]))
@@ -0,0 +1,258 @@
+"""
+单位换算 - 在数据入口处统一换算为计算器使用的单位
+
+计算器内部统一使用 mg/L、L/s、m² 和 kg/h/m²。数据源的单位在入口处按列声明一次，
+整列数组通过一次向量化乘法换算；结果可按调用方的单位换算回去。
+
+换算后还会检查量级：若某列的中位数偏离安全范围一个数量级以上（典型如 g/L 被当作
+mg/L，差 1000 倍），抛出 MagnitudeError（ValueError 的子类），避免批处理中悄悄出现
+1000 倍误差。
+
+使用示例：
+    units = InputUnits(mlss='g/L', equivalent_flow='m3/h', area='ft2')
+    calc = WastewaterCalculator(area=units.to_base('area', 1500))
+    data = units.normalize(mlss=mlss_g_per_l, equivalent_flow=flow_m3h)
+    result = calc.check_operating_points(data['mlss'], data['equivalent_flow'])
+    report = units.report(result)      # mlss / equivalent_flow / SLR 按调用方单位返回
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from wastewater_treatment_calc import WastewaterCalculator
+
+# 1 美制加仑 = 3.785411784 L；1 ft = 0.3048 m；1 lb = 0.45359237 kg
+_GALLON_L = 3.785411784
+_FT2_M2 = 0.09290304
+_LB_KG = 0.45359237
+
+# 各物理量的计算器单位
+BASE_UNITS = {
+    'mlss': 'mg/L',
+    'equivalent_flow': 'L/s',
+    'area': 'm²',
+    'slr': 'kg/h/m²',
+}
+
+# 物理量 -> {单位: 换算到计算器单位的系数}
+UNIT_FACTORS = {
+    'mlss': {
+        'mg/L': 1.0,
+        'g/L': 1000.0,
+        'g/m³': 1.0,
+        'kg/m³': 1000.0,
+        'ppm': 1.0,
+        '%': 10000.0,
+    },
+    'equivalent_flow': {
+        'L/s': 1.0,
+        'm³/s': 1000.0,
+        'm³/h': 1000.0 / 3600,
+        'm³/d': 1000.0 / 86400,
+        'L/min': 1.0 / 60,
+        'MGD': 1e6 * _GALLON_L / 86400,
+        'gpm': _GALLON_L / 60,
+    },
+    'area': {
+        'm²': 1.0,
+        'ft²': _FT2_M2,
+    },
+    'slr': {
+        'kg/h/m²': 1.0,
+        'kg/d/m²': 1.0 / 24,
+        'lb/d/ft²': _LB_KG / _FT2_M2 / 24,
+        'lb/h/ft²': _LB_KG / _FT2_M2,
+    },
+}
+
+# 单位的常见写法 -> 标准写法（比较时忽略大小写和空格）
+UNIT_ALIASES = {
+    'mg/l': 'mg/L', 'g/l': 'g/L', 'g/m3': 'g/m³', 'kg/m3': 'kg/m³',
+    'l/s': 'L/s', 'lps': 'L/s', 'm3/s': 'm³/s', 'm3/h': 'm³/h', 'cmh': 'm³/h',
+    'm3/d': 'm³/d', 'cmd': 'm³/d', 'l/min': 'L/min', 'mgd': 'MGD', 'gpm': 'gpm',
+    'm2': 'm²', 'ft2': 'ft²', 'sqft': 'ft²',
+    'kg/h/m2': 'kg/h/m²', 'kg/m2/h': 'kg/h/m²', 'kg/m²/h': 'kg/h/m²',
+    'kg/d/m2': 'kg/d/m²', 'kg/m2/d': 'kg/d/m²', 'kg/m²/d': 'kg/d/m²',
+    'lb/d/ft2': 'lb/d/ft²', 'lb/ft2/d': 'lb/d/ft²', 'lb/ft²/d': 'lb/d/ft²', 'ppd/sf': 'lb/d/ft²',
+    'lb/h/ft2': 'lb/h/ft²', 'lb/ft2/h': 'lb/h/ft²', 'lb/ft²/h': 'lb/h/ft²',
+}
+
+# 量级检查：中位数超出安全范围该倍数以上时视为单位声明错误
+PLAUSIBILITY_FACTOR = 10.0
+
+
+class MagnitudeError(ValueError):
+    """数据量级与声明单位不符"""
+
+
+def canonical_unit(quantity: str, unit: str) -> str:
+    """
+    取单位的标准写法
+
+    Args:
+        quantity: 物理量（见 UNIT_FACTORS）
+        unit: 单位，如 'm3/h'、'MGD'
+
+    Returns:
+        标准写法，如 'm³/h'
+    """
+    factors = UNIT_FACTORS.get(quantity)
+    if factors is None:
+        raise ValueError(f'未知物理量: {quantity}')
+    if unit in factors:
+        return unit
+    key = unit.replace(' ', '').lower()
+    name = UNIT_ALIASES.get(key)
+    if name is None:
+        name = next((u for u in factors if u.lower() == key), None)
+    if name not in factors:
+        raise ValueError(f'{quantity} 不支持单位 {unit}，可用单位: {list(factors)}')
+    return name
+
+
+def unit_factor(quantity: str, unit: str) -> float:
+    """单位换算到计算器单位的系数"""
+    return UNIT_FACTORS[quantity][canonical_unit(quantity, unit)]
+
+
+def convert(values, quantity: str, from_unit: str, to_unit: Optional[str] = None):
+    """
+    单位换算（整个数组一次乘法）
+
+    Args:
+        values: 数值或数组
+        quantity: 物理量
+        from_unit: 原单位
+        to_unit: 目标单位，默认为计算器单位
+
+    Returns:
+        换算后的 float64 数组（输入为标量时返回 float）
+    """
+    factor = unit_factor(quantity, from_unit)
+    if to_unit is not None:
+        factor /= unit_factor(quantity, to_unit)
+    result = np.asarray(values, dtype=np.float64) * factor
+    return float(result) if result.ndim == 0 else result
+
+
+class InputUnits:
+    """数据源各列的单位声明"""
+
+    # 结果字典中的列 -> 物理量（用于 report 换算回调用方单位）
+    RESULT_QUANTITIES = {
+        'mlss': 'mlss',
+        'equivalent_flow': 'equivalent_flow',
+        'calculated_slr': 'slr',
+        'slr': 'slr',
+        'target_mlss': 'mlss',
+        'target_flow': 'equivalent_flow',
+        'target_slr': 'slr',
+        'delta_mlss': 'mlss',
+        'delta_flow': 'equivalent_flow',
+    }
+
+    def __init__(self, mlss: str = 'mg/L', equivalent_flow: str = 'L/s',
+                 area: str = 'm²', slr: str = 'kg/h/m²'):
+        """
+        Args:
+            mlss: MLSS 列的单位
+            equivalent_flow: 流量列的单位
+            area: 面积的单位
+            slr: SLR 的单位（输入 SLR 列或结果中 SLR 的报告单位）
+        """
+        self.units = {
+            'mlss': canonical_unit('mlss', mlss),
+            'equivalent_flow': canonical_unit('equivalent_flow', equivalent_flow),
+            'area': canonical_unit('area', area),
+            'slr': canonical_unit('slr', slr),
+        }
+        self.factors = {quantity: UNIT_FACTORS[quantity][unit]
+                        for quantity, unit in self.units.items()}
+
+    def __repr__(self) -> str:
+        return 'InputUnits({})'.format(', '.join(f'{k}={v!r}' for k, v in self.units.items()))
+
+    @property
+    def is_base(self) -> bool:
+        """是否全部为计算器单位（无需换算）"""
+        return all(factor == 1.0 for factor in self.factors.values())
+
+    def to_base(self, quantity: str, values):
+        """将该物理量从声明单位换算到计算器单位"""
+        result = np.asarray(values, dtype=np.float64) * self.factors[quantity]
+        return float(result) if result.ndim == 0 else result
+
+    def from_base(self, quantity: str, values):
+        """将该物理量从计算器单位换算回声明单位"""
+        result = np.asarray(values, dtype=np.float64) / self.factors[quantity]
+        return float(result) if result.ndim == 0 else result
+
+    def normalize(self, calculator: WastewaterCalculator = None, check: bool = True,
+                  **columns) -> Dict[str, np.ndarray]:
+        """
+        将输入列换算到计算器单位
+
+        Args:
+            calculator: 提供安全范围的计算器，用于量级检查，默认内置安全范围
+            check: 是否做量级检查
+            **columns: 列名为 mlss / equivalent_flow / slr / area 的数组
+
+        Returns:
+            {列名: 计算器单位的 float64 数组}
+        """
+        result = {}
+        for name, values in columns.items():
+            if name not in self.factors:
+                raise ValueError(f'未知列: {name}')
+            result[name] = self.to_base(name, values)
+            if check and name in WastewaterCalculator.SAFETY_RANGES:
+                check_magnitude(result[name], name, self.units[name], calculator)
+        return result
+
+    def report(self, result: dict) -> dict:
+        """
+        将结果字典中的数值列换算回声明单位（其余列原样返回）
+
+        Args:
+            result: check_operating_points、SetpointOptimizer.optimize 等返回的列式字典
+        """
+        out = dict(result)
+        for name, quantity in self.RESULT_QUANTITIES.items():
+            if name in out and isinstance(out[name], (np.ndarray, float, int)):
+                out[name] = self.from_base(quantity, out[name])
+        return out
+
+
+def check_magnitude(values, quantity: str, unit: str = None,
+                    calculator: WastewaterCalculator = None) -> None:
+    """
+    检查换算后的数据量级是否合理
+
+    取有限正值的中位数，与安全范围比较；偏离 PLAUSIBILITY_FACTOR 倍以上时认为单位声明
+    有误并抛出 MagnitudeError。缺失、为零或为负的读数（仪表掉线等）不参与判断，由质量预检
+    或批量检查标记。
+
+    Args:
+        values: 计算器单位的数组
+        quantity: 物理量
+        unit: 声明的单位（仅用于提示）
+        calculator: 提供安全范围的计算器
+    """
+    ranges = (calculator or WastewaterCalculator).SAFETY_RANGES.get(quantity)
+    if ranges is None:
+        return
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        readings = values[np.isfinite(values) & (values > 0)]
+    if readings.size == 0:
+        return
+    median = float(np.median(readings))
+    low = ranges['min'] / PLAUSIBILITY_FACTOR
+    high = ranges['max'] * PLAUSIBILITY_FACTOR
+    if not low <= median <= high:
+        declared = f'（声明单位 {unit}）' if unit else ''
+        raise MagnitudeError(
+            f'{quantity} 数据量级异常{declared}：中位数 {median:g} {BASE_UNITS[quantity]}，'
+            f'安全范围 {ranges["min"]}-{ranges["max"]} {BASE_UNITS[quantity]}，请检查单位声明'
+        )
@@ -128,8 +128,8 @@ def demo_excel_analysis():
 
     print(f"\n✓ 找到数据文件: {excel_file}")
 
-    # 生成对比分析
-    print("\n生成对比分析...")
+    # 生成对比分析和敏感性分析（并发写出）
+    print("\n生成对比分析和敏感性分析...")
     variations = {
         '基准运行': {'mlss': 3500, 'flow': 100},
         '高流量运行': {'mlss': 3500, 'flow': 120},
@@ -138,15 +138,10 @@ def demo_excel_analysis():
         '低负荷': {'mlss': 2800, 'flow': 80},
     }
 
-    handler.create_comparison_excel(
-        str(output_dir / "参数对比分析.xlsx"),
-        variations
-    )
-
-    # 生成敏感性分析
-    print("生成敏感性分析...")
-    handler.create_sensitivity_analysis(
-        str(output_dir / "敏感性分析.xlsx"),
+    handler.generate_reports(
+        str(output_dir),
+        reports=('comparison', 'sensitivity'),
+        variations=variations,
         base_mlss=3500,
         base_flow=100
     )
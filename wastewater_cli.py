@@ -0,0 +1,510 @@
+"""
+污泥处理参数批量计算命令行工具
+
+从 CSV 或 JSON Lines 读取运行点（标准输入或文件），按块送入批量计算器，
+并将结果以流式方式写到标准输出。内存占用只与块大小有关，可用于处理
+数百万行数据的 shell 管道。
+
+使用方式：
+    wastewater-tool points.csv > results.csv
+    cat points.jsonl | wastewater-tool --input-format jsonl --format jsonl
+    wastewater-tool --area 141 --unsafe-only a.csv b.jsonl
+    wastewater-tool --config safety_ranges.toml --plant A厂 --season winter points.csv
+    wastewater-tool --quality --time-column time --unit-column unit points.csv
+    wastewater-tool --mlss-unit g/L --flow-unit m3/h --area 1500 --area-unit ft2 points.csv
+
+退出码：
+    0 - 所有运行点均安全
+    1 - 存在不安全的运行点
+    2 - 参数错误、文件无法读取或存在无法解析的行
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from itertools import chain, islice
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+
+from historian import to_epoch_seconds
+from profiling import stage
+from safety_config import SafetyConfig
+from sensor_quality import SensorQualityFilter, describe_flags
+from setpoint_optimizer import SetpointOptimizer
+from units import InputUnits, MagnitudeError, check_magnitude
+from wastewater_treatment_calc import (RECOMMENDATION_TABLE, STATUS_NAMES,
+                                       WastewaterCalculator)
+
+EXIT_OK = 0
+EXIT_UNSAFE = 1
+EXIT_INPUT_ERROR = 2
+
+INPUT_FORMATS = ('csv', 'jsonl')
+OUTPUT_FORMATS = ('csv', 'tsv', 'jsonl')
+
+# 输出时追加的计算列
+RESULT_COLUMNS = ['calculated_slr', 'mlss_status', 'flow_status', 'slr_status', 'overall_safe']
+
+# --setpoints 选项追加的目标设定值列
+SETPOINT_COLUMNS = ['target_mlss', 'target_flow', 'setpoint_feasible']
+SETPOINT_CONTROLS = {
+    'mlss': ('mlss',),
+    'flow': ('flow',),
+    'both': ('mlss', 'flow'),
+}
+
+# --recommendations 选项追加的建议列
+RECOMMENDATION_COLUMNS = ['recommendation_code', 'recommendations']
+
+# --quality 选项追加的传感器质量列
+QUALITY_COLUMNS = ['mlss_quality', 'flow_quality']
+
+# 流量列的常见别名（按顺序查找）
+FLOW_COLUMN_ALIASES = ('equivalent_flow', 'flow', 'eq')
+
+
+def detect_input_format(path: str, default: str = 'csv') -> str:
+    """根据文件扩展名推断输入格式"""
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    if suffix in ('.csv', '.txt'):
+        return 'csv'
+    return default
+
+
+def iter_records(stream: TextIO, input_format: str) -> Iterator[Tuple[int, Optional[dict]]]:
+    """
+    逐行读取输入记录
+
+    Args:
+        stream: 文本输入流
+        input_format: 'csv' 或 'jsonl'
+
+    Yields:
+        (行号, 记录字典)；JSON 解析失败时记录为 None
+    """
+    if input_format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_no, record if isinstance(record, dict) else None
+
+
+class BatchRunner:
+    """分块运行批量计算并流式写出结果"""
+
+    def __init__(self, calculator: WastewaterCalculator, output: TextIO,
+                 output_format: str = 'csv', mlss_column: str = 'mlss',
+                 flow_column: Optional[str] = None, precision: int = 4,
+                 unsafe_only: bool = False, errors: TextIO = None,
+                 setpoint_controls: Optional[tuple] = None,
+                 recommendation_language: Optional[str] = None,
+                 units: Optional[InputUnits] = None,
+                 quality_filter: Optional[SensorQualityFilter] = None,
+                 time_column: str = 'timestamp', unit_column: str = 'unit',
+                 magnitude_checks: tuple = ()):
+        self.calculator = calculator
+        self.output = output
+        self.output_format = output_format
+        self.mlss_column = mlss_column
+        self.flow_column = flow_column
+        self.precision = precision
+        self.unsafe_only = unsafe_only
+        self.errors = errors if errors is not None else sys.stderr
+        self.setpoint_controls = setpoint_controls
+        # 输入列的声明单位；units 为 None 表示已是计算器单位，无需换算
+        self.input_units = units if units is not None else InputUnits()
+        self.units = None if self.input_units.is_base else self.input_units
+        # 做量级检查的物理量（'mlss' / 'equivalent_flow'，通常为显式声明了单位的列）
+        self.magnitude_checks = tuple(magnitude_checks)
+        self.optimizer = SetpointOptimizer(calculator) if setpoint_controls else None
+        self.result_columns = RESULT_COLUMNS + (SETPOINT_COLUMNS if setpoint_controls else [])
+        # 建议文本按编码预先拼接，逐行只做查表
+        self.recommendation_texts = None
+        if recommendation_language:
+            self.recommendation_texts = [' | '.join(texts) for texts in
+                                         RECOMMENDATION_TABLE[recommendation_language]]
+            self.result_columns = self.result_columns + RECOMMENDATION_COLUMNS
+        # 传感器质量预检（按 unit_column 区分传感器，time_column 为采样时间）
+        self.quality_filter = quality_filter
+        self.time_column = time_column
+        self.unit_column = unit_column
+        if quality_filter is not None:
+            self.result_columns = self.result_columns + QUALITY_COLUMNS
+
+        self.total = 0
+        self.unsafe = 0
+        self.invalid = 0
+        self.bad_data = 0
+        self._writer = None
+
+    def _resolve_flow_column(self, record) -> Optional[str]:
+        """配置的流量列名，未配置时按别名在记录中查找（找不到返回 None）"""
+        if self.flow_column:
+            return self.flow_column
+        if isinstance(record, dict):
+            for name in FLOW_COLUMN_ALIASES:
+                if name in record:
+                    return name
+        return None
+
+    def validate(self, records: Iterable, source: str, chunk_size: int) -> List:
+        """
+        用输入源的第一块数据检查单位声明（数据量级），不写出任何结果
+
+        只检查 magnitude_checks 中的物理量；没有需要检查的物理量时只读取第一块。
+
+        Args:
+            records: iter_records 产生的 (行号, 记录) 迭代器
+            source: 输入源名称
+            chunk_size: 检查的行数
+
+        Returns:
+            读取的第一块记录（标准输入等不能重读的输入源可以接着交给 run）
+
+        Raises:
+            MagnitudeError: 数据量级与声明单位不符
+        """
+        chunk = list(islice(records, chunk_size))
+        if not self.magnitude_checks:
+            return chunk
+        rows, mlss, flow, _, _ = self._parse_chunk(chunk, source, report=False)
+        if rows:
+            self._check_magnitude(*self._to_base(mlss, flow))
+        return chunk
+
+    def run(self, records: Iterable, source: str, chunk_size: int) -> None:
+        """
+        处理一个输入源的全部记录
+
+        写出任何结果之前先用第一块数据检查单位声明（见 validate），
+        单位声明错误时抛出 MagnitudeError，此时该输入源没有输出。
+
+        Args:
+            records: iter_records 产生的 (行号, 记录) 迭代器
+            source: 输入源名称（用于错误提示）
+            chunk_size: 每块的行数
+        """
+        records = iter(records)
+        chunk = self.validate(records, source, chunk_size)
+        while chunk:
+            self._process_chunk(chunk, source)
+            chunk = list(islice(records, chunk_size))
+
+    def _to_base(self, mlss: np.ndarray, flow: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """整块一次换算到计算器单位（已是计算器单位时原样返回）"""
+        if self.units is None:
+            return mlss, flow
+        return self.units.to_base('mlss', mlss), self.units.to_base('equivalent_flow', flow)
+
+    def _check_magnitude(self, mlss: np.ndarray, flow: np.ndarray) -> None:
+        """检查换算后的数据量级（如按 mg/L 读入 g/L 数据时报错）"""
+        units = self.input_units.units
+        for quantity, values in (('mlss', mlss), ('equivalent_flow', flow)):
+            if quantity in self.magnitude_checks:
+                check_magnitude(values, quantity, units[quantity], self.calculator)
+
+    def _parse_chunk(self, chunk: List, source: str, report: bool = True) -> tuple:
+        """
+        解析一块记录
+
+        未配置流量列名时逐条记录按别名查找（JSON Lines 的各行可以使用不同的别名）。
+
+        Returns:
+            (有效记录, mlss, flow, times, sensors)；
+            report 为 False 时不统计、不提示无法解析的行
+        """
+        rows = []
+        mlss = np.empty(len(chunk), dtype=np.float64)
+        flow = np.empty(len(chunk), dtype=np.float64)
+        times = np.empty(len(chunk), dtype=np.int64)
+        sensors = []
+
+        for line_no, record in chunk:
+            flow_column = self._resolve_flow_column(record)
+            try:
+                mlss_val = float(record[self.mlss_column])
+                flow_val = float(record[flow_column])
+                if self.quality_filter is not None:
+                    times[len(rows)] = _parse_time(record[self.time_column])
+            except (TypeError, KeyError, ValueError):
+                if report:
+                    self.invalid += 1
+                    print(f"✗ {source}:{line_no}: 无法解析运行点", file=self.errors)
+                continue
+            mlss[len(rows)] = mlss_val
+            flow[len(rows)] = flow_val
+            if self.quality_filter is not None:
+                sensors.append(str(record.get(self.unit_column, '')))
+            rows.append(record)
+
+        n = len(rows)
+        return rows, mlss[:n], flow[:n], times[:n], sensors
+
+    def _process_chunk(self, chunk: List, source: str) -> None:
+        """处理一块记录"""
+        rows, mlss, flow, times, sensors = self._parse_chunk(chunk, source)
+        if not rows:
+            return
+        mlss, flow = self._to_base(mlss, flow)
+
+        quality = None
+        if self.quality_filter is not None:
+            with stage('sensor_quality', category='analyse', rows=len(rows)):
+                quality = self.quality_filter.check(sensors, times,
+                                                    mlss=mlss, equivalent_flow=flow)
+
+        with stage('check_operating_points', category='analyse', rows=len(rows)):
+            result = self.calculator.check_operating_points(
+                mlss, flow, valid=None if quality is None else quality['valid'])
+        safe = result['overall_safe']
+        valid = result['valid']
+        self.total += len(rows)
+        # 数据无效的行不计入不安全
+        self.unsafe += int(np.count_nonzero(~safe & valid))
+        self.bad_data += int(np.count_nonzero(~valid))
+
+        if self.optimizer is not None:
+            setpoints = self.optimizer.optimize(mlss, flow, controls=self.setpoint_controls)
+            if self.units is not None:
+                setpoints = self.units.report(setpoints)
+            target_mlss = np.round(setpoints['target_mlss'], self.precision).tolist()
+            target_flow = np.round(setpoints['target_flow'], self.precision).tolist()
+            feasible = setpoints['feasible'].tolist()
+
+        if self.units is not None:
+            result = self.units.report(result)
+        slr = np.round(result['calculated_slr'], self.precision).tolist()
+        mlss_status = result['mlss_status'].tolist()
+        flow_status = result['flow_status'].tolist()
+        slr_status = result['slr_status'].tolist()
+        recommendation_code = result['recommendation_code'].tolist()
+        safe = safe.tolist()
+        valid = valid.tolist()
+        if quality is not None:
+            mlss_quality = quality['mlss'].tolist()
+            flow_quality = quality['equivalent_flow'].tolist()
+
+        for i, record in enumerate(rows):
+            if self.unsafe_only and safe[i]:
+                continue
+            out = dict(record)
+            out['calculated_slr'] = slr[i] if valid[i] else None
+            out['mlss_status'] = STATUS_NAMES[mlss_status[i]]
+            out['flow_status'] = STATUS_NAMES[flow_status[i]]
+            out['slr_status'] = STATUS_NAMES[slr_status[i]]
+            out['overall_safe'] = safe[i]
+            if self.optimizer is not None:
+                out['target_mlss'] = target_mlss[i] if feasible[i] else None
+                out['target_flow'] = target_flow[i] if feasible[i] else None
+                out['setpoint_feasible'] = feasible[i]
+            if self.recommendation_texts is not None:
+                out['recommendation_code'] = recommendation_code[i]
+                out['recommendations'] = self.recommendation_texts[recommendation_code[i]]
+            if quality is not None:
+                out['mlss_quality'] = '|'.join(describe_flags(mlss_quality[i]))
+                out['flow_quality'] = '|'.join(describe_flags(flow_quality[i]))
+            self._write(out)
+
+    def _write(self, out: dict) -> None:
+        if self.output_format == 'jsonl':
+            self.output.write(json.dumps(out, ensure_ascii=False))
+            self.output.write('\n')
+            return
+
+        if self._writer is None:
+            fieldnames = [k for k in out if k not in self.result_columns] + self.result_columns
+            delimiter = '\t' if self.output_format == 'tsv' else ','
+            self._writer = csv.DictWriter(self.output, fieldnames=fieldnames, delimiter=delimiter,
+                                          restval='', extrasaction='ignore', lineterminator='\n')
+            self._writer.writeheader()
+        out['overall_safe'] = int(out['overall_safe'])
+        if 'setpoint_feasible' in out:
+            out['setpoint_feasible'] = int(out['setpoint_feasible'])
+        self._writer.writerow(out)
+
+
+def _parse_time(value) -> int:
+    """解析时间列：Unix 时间戳（秒）或 ISO 格式时间"""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return int(to_epoch_seconds(str(value).strip()))
+
+
+def _open_input(path: str) -> Optional[TextIO]:
+    """打开输入文件，失败时提示并返回 None"""
+    try:
+        return open(path, 'r', encoding='utf-8', newline='')
+    except OSError as e:
+        print(f"✗ 无法读取输入文件: {e}", file=sys.stderr)
+        return None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog='wastewater-tool',
+        description='批量检查污泥处理运行点（MLSS / 等效流量 / SLR）',
+    )
+    parser.add_argument('inputs', nargs='*', default=['-'],
+                        help='输入文件（CSV 或 JSON Lines），"-" 表示标准输入（默认）')
+    parser.add_argument('--input-format', choices=INPUT_FORMATS,
+                        help='输入格式，默认根据扩展名推断，标准输入默认为 csv')
+    parser.add_argument('-f', '--format', dest='output_format', choices=OUTPUT_FORMATS,
+                        default='csv', help='输出格式（默认 csv）')
+    parser.add_argument('--area', type=float, default=1.0, help='处理单元面积 m²（默认 1.0）')
+    parser.add_argument('--area-unit', default='m²', help='--area 的单位（m² / ft²，默认 m²）')
+    parser.add_argument('--mlss-unit',
+                        help='MLSS 列的单位（mg/L / g/L / kg/m3 等，默认 mg/L）；'
+                             '指定时检查数据量级是否与声明相符')
+    parser.add_argument('--flow-unit',
+                        help='流量列的单位（L/s / m3/h / m3/d / MGD / gpm 等，默认 L/s）；'
+                             '指定时检查数据量级是否与声明相符')
+    parser.add_argument('--no-magnitude-check', action='store_true',
+                        help='不检查数据量级与 --mlss-unit / --flow-unit 是否相符')
+    parser.add_argument('--slr-unit', default='kg/h/m²',
+                        help='输出 SLR 的单位（kg/h/m² / kg/d/m² / lb/ft2/d 等，默认 kg/h/m²）')
+    parser.add_argument('--config', help='安全范围配置文件（JSON / TOML / YAML），默认使用内置安全范围')
+    parser.add_argument('--plant', help='配置文件中的厂名')
+    parser.add_argument('--unit', help='配置文件中的单元编号')
+    parser.add_argument('--season', help='配置文件中的季节名称')
+    parser.add_argument('--chunk-size', type=int, default=65536, help='每块处理的行数（默认 65536）')
+    parser.add_argument('--mlss-column', default='mlss', help='MLSS 列名（默认 mlss）')
+    parser.add_argument('--flow-column',
+                        help='等效流量列名（默认依次查找 equivalent_flow / flow / eq）')
+    parser.add_argument('--precision', type=int, default=4, help='SLR 输出保留的小数位数（默认 4）')
+    parser.add_argument('--setpoints', choices=sorted(SETPOINT_CONTROLS),
+                        help='追加回到最优区间的目标设定值列，指定可调变量（mlss / flow / both）')
+    parser.add_argument('--recommendations', metavar='LANG', choices=sorted(RECOMMENDATION_TABLE),
+                        help='追加运行建议编码和建议文本列，指定语言（zh / en）')
+    parser.add_argument('--quality', action='store_true',
+                        help='检查前做传感器质量预检（卡死、跳变、超量程、读数为零），异常行不计入不安全')
+    parser.add_argument('--time-column', default='timestamp',
+                        help='--quality 使用的时间列（Unix 秒或 ISO 时间，默认 timestamp）')
+    parser.add_argument('--unit-column', default='unit',
+                        help='--quality 区分传感器的单元列（默认 unit，缺失时视为同一单元）')
+    parser.add_argument('--unsafe-only', action='store_true', help='只输出不安全的运行点')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不在标准错误输出汇总信息')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.chunk_size <= 0:
+        parser.error('--chunk-size 必须为正整数')
+    if args.area <= 0:
+        parser.error('--area 必须为正数')
+    try:
+        units = InputUnits(mlss=args.mlss_unit or 'mg/L', equivalent_flow=args.flow_unit or 'L/s',
+                           area=args.area_unit, slr=args.slr_unit)
+    except ValueError as e:
+        parser.error(str(e))
+    area = units.to_base('area', args.area)
+
+    if args.config:
+        try:
+            calculator = SafetyConfig.from_file(args.config).calculator(
+                args.plant, args.unit, args.season, area=area)
+        except (OSError, ImportError, ValueError, KeyError) as e:
+            print(f"✗ 安全范围配置无效: {e}", file=sys.stderr)
+            return EXIT_INPUT_ERROR
+    elif args.plant or args.unit or args.season:
+        parser.error('--plant / --unit / --season 需要配合 --config 使用')
+    else:
+        calculator = WastewaterCalculator(area=area)
+
+    runner = BatchRunner(
+        calculator,
+        sys.stdout,
+        output_format=args.output_format,
+        mlss_column=args.mlss_column,
+        flow_column=args.flow_column,
+        precision=args.precision,
+        unsafe_only=args.unsafe_only,
+        setpoint_controls=SETPOINT_CONTROLS.get(args.setpoints),
+        recommendation_language=args.recommendations,
+        units=units,
+        quality_filter=SensorQualityFilter() if args.quality else None,
+        time_column=args.time_column,
+        unit_column=args.unit_column,
+        magnitude_checks=() if args.no_magnitude_check else tuple(
+            quantity for quantity, unit in (('mlss', args.mlss_unit),
+                                            ('equivalent_flow', args.flow_unit)) if unit),
+    )
+
+    exit_code = EXIT_OK
+    stdin_records = None
+    unreadable = set()
+    try:
+        # 写出任何结果之前先检查所有输入源声明的单位（数据量级），
+        # 声明错误时不输出任何结果；标准输入已读取的第一块留待处理时使用
+        for path in args.inputs:
+            if path == '-':
+                if stdin_records is None:
+                    records = iter_records(sys.stdin, args.input_format or 'csv')
+                    head = runner.validate(records, '<stdin>', args.chunk_size)
+                    stdin_records = chain(head, records)
+                continue
+            stream = _open_input(path)
+            if stream is None:
+                unreadable.add(path)
+                exit_code = EXIT_INPUT_ERROR
+                continue
+            input_format = args.input_format or detect_input_format(path)
+            with stream:
+                runner.validate(iter_records(stream, input_format), path, args.chunk_size)
+
+        for path in args.inputs:
+            if path == '-':
+                runner.run(stdin_records, '<stdin>', args.chunk_size)
+                continue
+            if path in unreadable:
+                continue
+            stream = _open_input(path)
+            if stream is None:
+                exit_code = EXIT_INPUT_ERROR
+                continue
+            input_format = args.input_format or detect_input_format(path)
+            with stream:
+                runner.run(iter_records(stream, input_format), path, args.chunk_size)
+        sys.stdout.flush()
+    except MagnitudeError as e:
+        # 单位声明与数据量级不符
+        print(f"✗ {e}", file=sys.stderr)
+        return EXIT_INPUT_ERROR
+    except BrokenPipeError:
+        # 下游管道已关闭（如 `| head`），不再输出
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return EXIT_UNSAFE if runner.unsafe else EXIT_OK
+
+    if not args.quiet:
+        summary = f"处理 {runner.total} 行，不安全 {runner.unsafe} 行，无法解析 {runner.invalid} 行"
+        if args.quality:
+            summary += f"，数据无效 {runner.bad_data} 行"
+        print(summary, file=sys.stderr)
+
+    if exit_code != EXIT_OK or runner.invalid:
+        return EXIT_INPUT_ERROR
+    return EXIT_UNSAFE if runner.unsafe else EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -14,6 +14,93 @@
 from dataclasses import dataclass
 from typing import Optional
 
+import numpy as np
+
+# 批量接口使用的紧凑状态编码（int8），与 validate_parameter 返回的 status 字符串一一对应；
+# 'invalid' 只出现在 check_operating_points(valid=...) 中被质量掩码排除的行
+STATUS_NAMES = ('optimal', 'normal', 'too_low', 'too_high', 'invalid')
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+
+# 运行建议的紧凑编码：三个参数各自的偏离方向（0 安全范围内、1 过低、2 过高）组合，
+# code = MLSS 方向 × 9 + 流量方向 × 3 + SLR 方向，共 27 种，0 表示全部正常；
+# INVALID_RECOMMENDATION 表示传感器数据无效、未做检查
+RECOMMENDATION_PARAMS = ('mlss', 'equivalent_flow', 'slr')
+_STATUS_SIDE = np.array([{'too_low': 1, 'too_high': 2}.get(name, 0) for name in STATUS_NAMES],
+                        dtype=np.uint8)
+
+# 建议文本（按语言），键为 '<参数>_too_low' / '<参数>_too_high' / 'all_ok'
+RECOMMENDATION_MESSAGES = {
+    'zh': {
+        'mlss_too_low': '⚠️ MLSS 过低：污泥浓度不足，处理效率可能下降',
+        'mlss_too_high': '⚠️ MLSS 过高：污泥可能缺氧，沉降性差',
+        'equivalent_flow_too_low': '⚠️ 等效流量过低：设备未充分利用',
+        'equivalent_flow_too_high': '⚠️ 等效流量过高：设备可能过载',
+        'slr_too_low': '⚠️ 固体负荷过低：能耗浪费',
+        'slr_too_high': '⚠️ 固体负荷过高：处理不彻底，出水可能不达标',
+        'all_ok': '✓ 所有参数在安全范围内，运行状态良好',
+        'invalid': '⚠️ 传感器数据无效：已跳过检查，请核实仪表读数',
+    },
+    'en': {
+        'mlss_too_low': '⚠️ MLSS too low: insufficient sludge concentration, treatment efficiency may drop',
+        'mlss_too_high': '⚠️ MLSS too high: sludge may turn anoxic and settle poorly',
+        'equivalent_flow_too_low': '⚠️ Equivalent flow too low: equipment under-utilised',
+        'equivalent_flow_too_high': '⚠️ Equivalent flow too high: equipment may be overloaded',
+        'slr_too_low': '⚠️ Solids loading too low: energy wasted',
+        'slr_too_high': '⚠️ Solids loading too high: incomplete treatment, effluent may be off-spec',
+        'all_ok': '✓ All parameters within safe ranges, operation is healthy',
+        'invalid': '⚠️ Invalid sensor data: check skipped, verify the instrument readings',
+    },
+}
+DEFAULT_LANGUAGE = 'zh'
+INVALID_RECOMMENDATION = 27
+
+
+def _build_recommendation_table(messages: dict) -> tuple:
+    """预先生成 27 种编码（及数据无效）对应的建议文本"""
+    table = []
+    for code in range(27):
+        sides = (code // 9, code // 3 % 3, code % 3)
+        texts = tuple(messages[f"{param}_{'too_low' if side == 1 else 'too_high'}"]
+                      for param, side in zip(RECOMMENDATION_PARAMS, sides) if side)
+        table.append(texts or (messages['all_ok'],))
+    table.append((messages['invalid'],))
+    return tuple(table)
+
+
+RECOMMENDATION_TABLE = {lang: _build_recommendation_table(messages)
+                        for lang, messages in RECOMMENDATION_MESSAGES.items()}
+
+
+def recommendation_texts(code: int, language: str = DEFAULT_LANGUAGE) -> tuple:
+    """
+    按建议编码查找建议文本
+
+    Args:
+        code: 建议编码（0-26，或 INVALID_RECOMMENDATION）
+        language: 语言，见 RECOMMENDATION_MESSAGES
+
+    Returns:
+        建议文本元组
+    """
+    table = RECOMMENDATION_TABLE.get(language)
+    if table is None:
+        raise ValueError(f'不支持的语言: {language}')
+    return table[int(code)]
+
+
+def recommendation_codes(mlss_status, flow_status, slr_status) -> np.ndarray:
+    """
+    由 int8 状态编码批量计算建议编码
+
+    Args:
+        mlss_status / flow_status / slr_status: classify_batch 返回的状态编码数组
+
+    Returns:
+        uint8 建议编码数组
+    """
+    return (_STATUS_SIDE[mlss_status] * 9 + _STATUS_SIDE[flow_status] * 3
+            + _STATUS_SIDE[slr_status]).astype(np.uint8)
+
 
 @dataclass
 class WastewaterParams:
@@ -117,13 +204,15 @@ class WastewaterCalculator:
             'safe': ranges['min'] <= value <= ranges['max']
         }
 
-    def check_operating_point(self, mlss: float, equivalent_flow: float) -> dict:
+    def check_operating_point(self, mlss: float, equivalent_flow: float,
+                              language: str = DEFAULT_LANGUAGE) -> dict:
         """
         检查某个运行点是否在安全范围内
 
         Args:
             mlss: 混合液悬浮固体浓度 (mg/L)
             equivalent_flow: 等效流量 (L/s)
+            language: 运行建议的语言（默认中文）
 
         Returns:
             包含完整验证信息的字典
@@ -136,6 +225,7 @@ class WastewaterCalculator:
 
         # 判断整体状态
         all_safe = mlss_check['safe'] and flow_check['safe'] and slr_check['safe']
+        code = self._recommendation_code(mlss_check, flow_check, slr_check)
 
         return {
             'mlss': mlss_check,
@@ -143,35 +233,147 @@ class WastewaterCalculator:
             'slr': slr_check,
             'calculated_slr': slr,
             'overall_safe': all_safe,
-            'recommendations': self._generate_recommendations(mlss_check, flow_check, slr_check)
+            'recommendation_code': code,
+            'recommendations': list(recommendation_texts(code, language)),
         }
 
-    def _generate_recommendations(self, mlss_check: dict, flow_check: dict, slr_check: dict) -> list:
-        """生成运行建议"""
-        recommendations = []
+    @staticmethod
+    def _recommendation_code(mlss_check: dict, flow_check: dict, slr_check: dict) -> int:
+        """由三个参数的验证结果计算建议编码"""
+        code = 0
+        for check in (mlss_check, flow_check, slr_check):
+            side = 0
+            if not check['safe']:
+                side = 1 if check['status'] == 'too_low' else 2
+            code = code * 3 + side
+        return code
+
+    def _generate_recommendations(self, mlss_check: dict, flow_check: dict, slr_check: dict,
+                                  language: str = DEFAULT_LANGUAGE) -> list:
+        """生成运行建议（查预先生成的建议表）"""
+        code = self._recommendation_code(mlss_check, flow_check, slr_check)
+        return list(recommendation_texts(code, language))
+
+    def calculate_slr_batch(self, mlss, equivalent_flow) -> np.ndarray:
+        """
+        批量计算固体负荷率 (SLR)，公式与 calculate_slr 相同
 
-        if not mlss_check['safe']:
-            if mlss_check['status'] == 'too_low':
-                recommendations.append('⚠️ MLSS 过低：污泥浓度不足，处理效率可能下降')
-            else:
-                recommendations.append('⚠️ MLSS 过高：污泥可能缺氧，沉降性差')
+        Args:
+            mlss: MLSS 数组 (mg/L)
+            equivalent_flow: 等效流量数组 (L/s)，可与 mlss 广播
 
-        if not flow_check['safe']:
-            if flow_check['status'] == 'too_low':
-                recommendations.append('⚠️ 等效流量过低：设备未充分利用')
-            else:
-                recommendations.append('⚠️ 等效流量过高：设备可能过载')
+        Returns:
+            float64 数组，固体负荷率 (kg/h/m²)
+        """
+        mlss = np.asarray(mlss, dtype=np.float64)
+        equivalent_flow = np.asarray(equivalent_flow, dtype=np.float64)
+        return (mlss / 1000) * (equivalent_flow * 3.6) / self.area
 
-        if not slr_check['safe']:
-            if slr_check['status'] == 'too_low':
-                recommendations.append('⚠️ 固体负荷过低：能耗浪费')
-            else:
-                recommendations.append('⚠️ 固体负荷过高：处理不彻底，出水可能不达标')
+    def classify_batch(self, param_name: str, values) -> np.ndarray:
+        """
+        批量判定参数状态，规则与 validate_parameter 相同
 
-        if not recommendations:
-            recommendations.append('✓ 所有参数在安全范围内，运行状态良好')
+        Args:
+            param_name: 参数名称 ('mlss', 'slr', 'equivalent_flow')
+            values: 参数值数组
 
-        return recommendations
+        Returns:
+            int8 状态编码数组，编码含义见 STATUS_NAMES
+        """
+        ranges = self.SAFETY_RANGES.get(param_name)
+        if not ranges:
+            raise ValueError(f'未知参数: {param_name}')
+
+        values = np.asarray(values, dtype=np.float64)
+        low, high = ranges['optimal']
+
+        codes = np.full(values.shape, STATUS_CODES['normal'], dtype=np.int8)
+        codes[(values >= low) & (values <= high)] = STATUS_CODES['optimal']
+        codes[values < ranges['min']] = STATUS_CODES['too_low']
+        codes[values > ranges['max']] = STATUS_CODES['too_high']
+        return codes
+
+    def safe_mask_batch(self, param_name: str, values) -> np.ndarray:
+        """
+        批量判断参数是否在安全范围 [min, max] 内（NaN 视为不安全）
+
+        Args:
+            param_name: 参数名称
+            values: 参数值数组
+
+        Returns:
+            bool 数组
+        """
+        ranges = self.SAFETY_RANGES.get(param_name)
+        if not ranges:
+            raise ValueError(f'未知参数: {param_name}')
+
+        values = np.asarray(values, dtype=np.float64)
+        return (values >= ranges['min']) & (values <= ranges['max'])
+
+    def check_operating_points(self, mlss, equivalent_flow, valid=None) -> dict:
+        """
+        批量检查运行点，check_operating_point 的向量化版本
+
+        不生成建议文本，状态以 int8 编码返回，适合大批量数据。
+
+        Args:
+            mlss: MLSS 数组 (mg/L)
+            equivalent_flow: 等效流量数组 (L/s)
+            valid: 数据质量掩码（如 SensorQualityFilter 的输出），False 的行不做检查：
+                   SLR 为 NaN、状态为 'invalid'、overall_safe 为 False
+
+        Returns:
+            列式结果字典：
+                {
+                    'mlss': float64 数组,
+                    'equivalent_flow': float64 数组,
+                    'calculated_slr': float64 数组,
+                    'mlss_status': int8 数组,
+                    'flow_status': int8 数组,
+                    'slr_status': int8 数组,
+                    'overall_safe': bool 数组,
+                    'recommendation_code': uint8 建议编码数组（文本见 recommendation_texts）,
+                    'valid': bool 数组，数据是否有效（未传 valid 时全部为 True）,
+                }
+        """
+        mlss, equivalent_flow = np.broadcast_arrays(
+            np.asarray(mlss, dtype=np.float64),
+            np.asarray(equivalent_flow, dtype=np.float64),
+        )
+        slr = self.calculate_slr_batch(mlss, equivalent_flow)
+
+        overall_safe = (self.safe_mask_batch('mlss', mlss)
+                        & self.safe_mask_batch('equivalent_flow', equivalent_flow)
+                        & self.safe_mask_batch('slr', slr))
+        mlss_status = self.classify_batch('mlss', mlss)
+        flow_status = self.classify_batch('equivalent_flow', equivalent_flow)
+        slr_status = self.classify_batch('slr', slr)
+        recommendation_code = recommendation_codes(mlss_status, flow_status, slr_status)
+
+        if valid is None:
+            valid = np.ones(mlss.shape, dtype=bool)
+        else:
+            valid = np.broadcast_to(np.asarray(valid, dtype=bool), mlss.shape)
+            invalid = ~valid
+            if invalid.any():
+                slr = np.where(invalid, np.nan, slr)
+                overall_safe &= valid
+                for codes in (mlss_status, flow_status, slr_status):
+                    codes[invalid] = STATUS_CODES['invalid']
+                recommendation_code[invalid] = INVALID_RECOMMENDATION
+
+        return {
+            'mlss': mlss,
+            'equivalent_flow': equivalent_flow,
+            'calculated_slr': slr,
+            'mlss_status': mlss_status,
+            'flow_status': flow_status,
+            'slr_status': slr_status,
+            'overall_safe': overall_safe,
+            'recommendation_code': recommendation_code,
+            'valid': valid,
+        }
 
     def generate_operating_range_table(self) -> list:
         """生成完整的运行范围参考表"""
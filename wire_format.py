@@ -0,0 +1,367 @@
+"""
+检查结果的紧凑传输格式 - 定长二进制记录和 JSON Lines
+
+check_operating_point 返回的嵌套字典包含完整的安全范围和建议文本，序列化代价高。
+本模块把检查结果编码为固定结构的记录，安全范围、状态名称等元数据只在带版本号的
+头部出现一次，接收方无需重新检查、也无需传送 Excel 文件。
+
+二进制帧（小端序）：
+    b'WWCR'                 # 4 字节魔数
+    uint16 版本号
+    uint32 头部长度
+    头部 JSON (UTF-8)       # schema、version、fields、count、area、safety_ranges、status_names
+    记录 × count            # 定长结构体，字段见 fields（按精度为 f8 或 f4）
+
+每条记录：mlss、equivalent_flow、calculated_slr（浮点），mlss_status、flow_status、
+slr_status（int8，见 STATUS_NAMES），flags（uint8，bit0 overall_safe，bit1 valid），
+recommendation_code（uint8，见 recommendation_texts）。f8 精度每条 29 字节，f4 为 17 字节。
+
+多个帧可以首尾相接写入同一个流（管道、套接字），用 iter_frames 依次读出。
+
+JSON Lines：第一行为头部对象（含 "format": "jsonl"），之后每行一条记录，
+为按 fields 顺序排列的数组，NaN 写为 null。
+
+使用示例：
+    result = calc.check_operating_points(mlss, flow)
+    data = encode_results(result, calc)
+    decoded = decode_results(data)           # 与 check_operating_points 相同的列式字典
+
+    write_frame(sys.stdout.buffer, result, calc)
+    for header, result in iter_frames(sys.stdin.buffer): ...
+
+    text = encode_jsonl(result, calc)
+    decoded = decode_jsonl(text)
+"""
+
+import json
+import struct
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from wastewater_treatment_calc import STATUS_CODES, STATUS_NAMES, WastewaterCalculator
+
+MAGIC = b'WWCR'
+SCHEMA_NAME = 'wastewater.check_result'
+SCHEMA_VERSION = 1
+
+# 魔数、版本号、头部长度
+_PREAMBLE = struct.Struct('<4sHI')
+
+FLAG_OVERALL_SAFE = 1
+FLAG_VALID = 2
+
+FLOAT_FIELDS = ('mlss', 'equivalent_flow', 'calculated_slr')
+STATUS_FIELDS = ('mlss_status', 'flow_status', 'slr_status')
+RECORD_FIELDS = FLOAT_FIELDS + STATUS_FIELDS + ('flags', 'recommendation_code')
+
+PRECISIONS = ('f8', 'f4')
+
+
+def record_dtype(precision: str = 'f8') -> np.dtype:
+    """
+    定长记录的结构体类型（紧凑排列，无对齐填充）
+
+    Args:
+        precision: 浮点字段精度，'f8' 或 'f4'
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f'不支持的精度: {precision}，可选 {PRECISIONS}')
+    return np.dtype([(name, '<' + precision) for name in FLOAT_FIELDS]
+                    + [(name, 'i1') for name in STATUS_FIELDS]
+                    + [('flags', 'u1'), ('recommendation_code', 'u1')])
+
+
+def _make_header(count: int, calculator: WastewaterCalculator, precision: str,
+                 fmt: str) -> dict:
+    calculator = calculator or WastewaterCalculator(area=1.0)
+    dtype = record_dtype(precision)
+    return {
+        'schema': SCHEMA_NAME,
+        'version': SCHEMA_VERSION,
+        'format': fmt,
+        'fields': [[name, dtype.fields[name][0].str] for name in RECORD_FIELDS],
+        'count': int(count),
+        'area': float(calculator.area),
+        'safety_ranges': {name: {'min': r['min'], 'max': r['max'],
+                                 'optimal': list(r['optimal'])}
+                          for name, r in calculator.SAFETY_RANGES.items()},
+        'status_names': list(STATUS_NAMES),
+    }
+
+
+def _check_header(header: dict, fmt: str) -> None:
+    if header.get('schema') != SCHEMA_NAME:
+        raise ValueError(f"不是检查结果数据: schema={header.get('schema')}")
+    if header.get('version') != SCHEMA_VERSION:
+        raise ValueError(f"不支持的结构版本: {header.get('version')}")
+    if header.get('format') != fmt:
+        raise ValueError(f"格式不符: 期望 {fmt}，实际为 {header.get('format')}")
+    if [name for name, _ in header.get('fields', [])] != list(RECORD_FIELDS):
+        raise ValueError('字段定义与当前版本不一致')
+
+
+def _precision_of(header: dict) -> str:
+    return header['fields'][0][1][1:]
+
+
+def to_records(result: dict, precision: str = 'f8') -> np.ndarray:
+    """
+    列式检查结果 -> 定长记录数组
+
+    Args:
+        result: check_operating_points 的返回值（或 columns_from_checks 的结果）
+        precision: 浮点字段精度
+    """
+    n = np.shape(result['mlss'])[0] if np.ndim(result['mlss']) else 1
+    records = np.empty(n, dtype=record_dtype(precision))
+    for name in FLOAT_FIELDS + STATUS_FIELDS + ('recommendation_code',):
+        records[name] = np.ravel(result[name])
+    valid = result.get('valid')
+    valid = np.ones(n, dtype=bool) if valid is None else np.ravel(valid)
+    records['flags'] = (np.ravel(result['overall_safe']).astype(np.uint8) * FLAG_OVERALL_SAFE
+                        | valid.astype(np.uint8) * FLAG_VALID)
+    return records
+
+
+def from_records(records: np.ndarray) -> dict:
+    """定长记录数组 -> 与 check_operating_points 相同的列式字典"""
+    result = {name: records[name].astype(np.float64) for name in FLOAT_FIELDS}
+    for name in STATUS_FIELDS:
+        result[name] = records[name].astype(np.int8)
+    flags = records['flags']
+    result['overall_safe'] = (flags & FLAG_OVERALL_SAFE).astype(bool)
+    result['recommendation_code'] = records['recommendation_code'].astype(np.uint8)
+    result['valid'] = (flags & FLAG_VALID).astype(bool)
+    return result
+
+
+def columns_from_checks(checks: Iterable[dict]) -> dict:
+    """
+    把多个 check_operating_point 的嵌套结果合并为列式字典
+
+    Args:
+        checks: check_operating_point 的返回值序列
+
+    Returns:
+        与 check_operating_points 相同结构的列式字典
+    """
+    checks = list(checks)
+    result = {
+        'mlss': np.array([c['mlss']['value'] for c in checks], dtype=np.float64),
+        'equivalent_flow': np.array([c['equivalent_flow']['value'] for c in checks],
+                                    dtype=np.float64),
+        'calculated_slr': np.array([c['calculated_slr'] for c in checks], dtype=np.float64),
+        'overall_safe': np.array([c['overall_safe'] for c in checks], dtype=bool),
+        'recommendation_code': np.array([c['recommendation_code'] for c in checks],
+                                        dtype=np.uint8),
+        'valid': np.ones(len(checks), dtype=bool),
+    }
+    for field, param in zip(STATUS_FIELDS, ('mlss', 'equivalent_flow', 'slr')):
+        result[field] = np.array([STATUS_CODES[c[param]['status']] for c in checks],
+                                 dtype=np.int8)
+    return result
+
+
+# ----------------------------------------------------------------------
+# 二进制
+# ----------------------------------------------------------------------
+
+def encode_results(result: dict, calculator: WastewaterCalculator = None,
+                   precision: str = 'f8') -> bytes:
+    """
+    编码为一个二进制帧
+
+    Args:
+        result: check_operating_points 的列式结果
+        calculator: 产生结果的计算器（面积和安全范围写入头部），默认内置安全范围
+        precision: 浮点字段精度，'f8'（无损）或 'f4'（更紧凑）
+
+    Returns:
+        帧字节串
+    """
+    records = to_records(result, precision)
+    header = json.dumps(_make_header(len(records), calculator, precision, 'binary'),
+                        ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return _PREAMBLE.pack(MAGIC, SCHEMA_VERSION, len(header)) + header + records.tobytes()
+
+
+def _parse_preamble(data: bytes) -> int:
+    magic, version, header_len = _PREAMBLE.unpack(data)
+    if magic != MAGIC:
+        raise ValueError('不是检查结果二进制帧（魔数不符）')
+    if version != SCHEMA_VERSION:
+        raise ValueError(f'不支持的结构版本: {version}')
+    return header_len
+
+
+def decode_header(data: bytes) -> dict:
+    """只解析二进制帧的头部"""
+    header_len = _parse_preamble(bytes(data[:_PREAMBLE.size]))
+    header = json.loads(bytes(data[_PREAMBLE.size:_PREAMBLE.size + header_len]).decode('utf-8'))
+    _check_header(header, 'binary')
+    return header
+
+
+def decode_results(data: bytes) -> dict:
+    """
+    解码一个二进制帧（记录部分按结构体类型一次解析）
+
+    Args:
+        data: encode_results 产生的字节串
+
+    Returns:
+        与 check_operating_points 相同的列式字典
+    """
+    header = decode_header(data)
+    offset = _PREAMBLE.size + _parse_preamble(bytes(data[:_PREAMBLE.size]))
+    dtype = record_dtype(_precision_of(header))
+    expected = offset + header['count'] * dtype.itemsize
+    if len(data) < expected:
+        raise ValueError(f'数据不完整: 需要 {expected} 字节，实际 {len(data)} 字节')
+    records = np.frombuffer(data, dtype=dtype, count=header['count'], offset=offset)
+    return from_records(records)
+
+
+def write_frame(stream: BinaryIO, result: dict, calculator: WastewaterCalculator = None,
+                precision: str = 'f8') -> int:
+    """
+    向二进制流写入一个帧
+
+    Returns:
+        写入的字节数
+    """
+    data = encode_results(result, calculator, precision)
+    stream.write(data)
+    return len(data)
+
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def iter_frames(stream: BinaryIO) -> Iterator[Tuple[dict, dict]]:
+    """
+    依次读出流中的所有帧
+
+    Yields:
+        (头部字典, 列式结果字典)
+    """
+    while True:
+        preamble = _read_exact(stream, _PREAMBLE.size)
+        if not preamble:
+            return
+        if len(preamble) < _PREAMBLE.size:
+            raise ValueError('数据不完整: 帧头被截断')
+        header_bytes = _read_exact(stream, _parse_preamble(preamble))
+        header = json.loads(header_bytes.decode('utf-8'))
+        _check_header(header, 'binary')
+        dtype = record_dtype(_precision_of(header))
+        size = header['count'] * dtype.itemsize
+        body = _read_exact(stream, size)
+        if len(body) < size:
+            raise ValueError(f'数据不完整: 需要 {size} 字节，实际 {len(body)} 字节')
+        yield header, from_records(np.frombuffer(body, dtype=dtype))
+
+
+# ----------------------------------------------------------------------
+# JSON Lines
+# ----------------------------------------------------------------------
+
+# 小整数字段（int8 / uint8）的文本查找表，下标为值 + 128
+_INT_TEXT = np.array([str(i) for i in range(-128, 256)])
+
+
+def _column_text(values: np.ndarray) -> list:
+    """整列转换为 JSON 文本"""
+    if values.dtype.kind != 'f':
+        return _INT_TEXT[values.astype(np.int16) + 128].tolist()
+    # repr 为最短往返表示，保证无损；NaN / inf 不是合法 JSON，写为 null
+    text = list(map(repr, values.tolist()))
+    for i in np.flatnonzero(~np.isfinite(values)).tolist():
+        text[i] = 'null'
+    return text
+
+
+def encode_jsonl(result: dict, calculator: WastewaterCalculator = None) -> str:
+    """
+    编码为 JSON Lines 文本（头部一行 + 每条记录一行）
+
+    Args:
+        result: check_operating_points 的列式结果
+        calculator: 产生结果的计算器
+
+    Returns:
+        以换行结尾的文本
+    """
+    records = to_records(result, 'f8')
+    header = _make_header(len(records), calculator, 'f8', 'jsonl')
+    columns = [_column_text(records[name]) for name in RECORD_FIELDS]
+    row = '[' + ','.join(['{}'] * len(RECORD_FIELDS)) + ']'
+    lines = [json.dumps(header, ensure_ascii=False, separators=(',', ':'))]
+    lines.extend(map(row.format, *columns))
+    return '\n'.join(lines) + '\n'
+
+
+def decode_jsonl(text: str) -> dict:
+    """
+    解码 JSON Lines 文本
+
+    Args:
+        text: encode_jsonl 产生的文本（可为多段首尾相接）
+
+    Returns:
+        与 check_operating_points 相同的列式字典（多段时合并）
+    """
+    parts = []
+    for header, rows in _iter_jsonl_segments(text.splitlines()):
+        parts.append(_rows_to_result(header, rows))
+    if not parts:
+        raise ValueError('没有数据')
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+
+def _iter_jsonl_segments(lines: List[str]) -> Iterator[Tuple[dict, List[str]]]:
+    header, rows = None, []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('{'):
+            if header is not None:
+                yield header, rows
+            header = json.loads(line)
+            _check_header(header, 'jsonl')
+            rows = []
+        elif header is None:
+            raise ValueError('缺少头部行')
+        else:
+            rows.append(line)
+    if header is not None:
+        yield header, rows
+
+
+def _rows_to_result(header: dict, rows: List[str]) -> dict:
+    if len(rows) != header['count']:
+        raise ValueError(f"记录数不符: 头部为 {header['count']}，实际 {len(rows)}")
+    # 整段记录去掉括号后一次解析为数值
+    width = len(RECORD_FIELDS)
+    text = ','.join(rows).replace('[', '').replace(']', '').replace('null', 'nan')
+    values = np.fromstring(text, dtype=np.float64, sep=',') if rows else np.empty(0)
+    if values.size != len(rows) * width:
+        raise ValueError('记录格式错误: 字段数与头部定义不符')
+    values = values.reshape(len(rows), width)
+    records = np.empty(len(rows), dtype=record_dtype('f8'))
+    for i, name in enumerate(RECORD_FIELDS):
+        records[name] = values[:, i]
+    return from_records(records)
@@ -11,8 +11,12 @@ except ImportError:
     XLWINGS_AVAILABLE = False
     print("⚠️ xlwings 未安装，部分功能不可用")
 
+from result_cache import QuantizedResultCache
 from wastewater_treatment_calc import WastewaterCalculator
 
+# Excel 重算时反复送来几乎相同的输入，状态类函数按传感器分辨率量化后查表
+_CHECK_CACHE = QuantizedResultCache(WastewaterCalculator(area=1.0))
+
 
 class WastewaterExcelFunctions:
     """污泥处理 Excel 自定义函数类"""
@@ -72,9 +76,7 @@ class WastewaterExcelFunctions:
         Returns:
             "✓ 安全" 或 "✗ 需要调整"
         """
-        calculator = WastewaterCalculator(area=1.0)
-        check = calculator.check_operating_point(mlss, equivalent_flow)
-        return '✓ 安全' if check['overall_safe'] else '✗ 需要调整'
+        return '✓ 安全' if _CHECK_CACHE.is_safe(mlss, equivalent_flow) else '✗ 需要调整'
 
     @staticmethod
     def get_slr_status(mlss: float, equivalent_flow: float) -> str:
@@ -84,21 +86,20 @@ class WastewaterExcelFunctions:
         Returns:
             "optimal", "normal", "too_low", "too_high"
         """
-        calculator = WastewaterCalculator(area=1.0)
-        check = calculator.check_operating_point(mlss, equivalent_flow)
-        return check['slr']['status']
+        return _CHECK_CACHE.slr_status(mlss, equivalent_flow)
 
     @staticmethod
-    def get_recommendations(mlss: float, equivalent_flow: float) -> str:
+    def get_recommendations(mlss: float, equivalent_flow: float, language: str = 'zh') -> str:
         """
         Excel 函数：获取运行建议
 
+        Args:
+            language: 建议语言（'zh' 或 'en'）
+
         Returns:
             建议文本（用 | 分隔多条建议）
         """
-        calculator = WastewaterCalculator(area=1.0)
-        check = calculator.check_operating_point(mlss, equivalent_flow)
-        return ' | '.join(check['recommendations'])
+        return ' | '.join(_CHECK_CACHE.recommendations(mlss, equivalent_flow, language))
 
 
 def register_xlwings_functions():
@@ -140,9 +141,9 @@ def register_xlwings_functions():
         return WastewaterExcelFunctions.get_slr_status(mlss, equivalent_flow)
 
     @xw.func
-    def GetRecommendations(mlss, equivalent_flow):
+    def GetRecommendations(mlss, equivalent_flow, language='zh'):
         """获取建议"""
-        return WastewaterExcelFunctions.get_recommendations(mlss, equivalent_flow)
+        return WastewaterExcelFunctions.get_recommendations(mlss, equivalent_flow, language)
 
     print("✓ xlwings 自定义函数已注册")
 